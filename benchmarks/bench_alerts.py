@@ -0,0 +1,128 @@
+'''
+End to end alert benchmark: Handler, Manager and the paper_webull / webull clients
+against the fake server, through the same pipeline main.run uses.
+
+Every alert is an entry on its own strike, so they run concurrently up to --workers.
+alert to order: dispatch until the fake server received the order
+alert to done: dispatch until the alert was handled (paper waits for the fill)
+
+Results are appended to benchmarks/results/bench_alerts.jsonl with the commit,
+and compared with the last run with the same parameters.
+
+usage: python benchmarks/bench_alerts.py [--api paper|live] [--alerts 200] [--workers 4] [--latency 0.005]
+       [--jitter 0] [--error-rate 0] [--fill-delay 0.05] [--fill-rate 1] [--fills push|poll] [--no-save]
+'''
+import argparse, asyncio, json, logging, os, subprocess, sys, time
+
+from common import ROOT, setup, summary
+from fake_webull import FakeWebull
+
+RESULTS = os.path.join(ROOT, 'benchmarks', 'results')
+
+def commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def save(name, params, results):
+    '''
+    append a run and return the previous run with the same parameters
+    '''
+    os.makedirs(RESULTS, exist_ok=True)
+    path = os.path.join(RESULTS, f'{name}.jsonl')
+    previous = None
+    if os.path.exists(path):
+        with open(path) as file:
+            for line in file:
+                run = json.loads(line)
+                if run['params'] == params:
+                    previous = run
+    with open(path, 'a') as file:
+        file.write(json.dumps({'commit': commit(), 'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'params': params, 'results': results}) + '\n')
+    return previous
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='alerts through the pipeline against the fake server')
+    parser.add_argument('--api', choices=('paper', 'live'), default='paper')
+    parser.add_argument('--alerts', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.005)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--fill-delay', type=float, default=0.05)
+    parser.add_argument('--fill-rate', type=float, default=1.0)
+    parser.add_argument('--fills', choices=('push', 'poll'), default='push')
+    parser.add_argument('--no-save', action='store_true')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = FakeWebull(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, fill_delay=args.fill_delay, fill_rate=args.fill_rate, strikes=max(200, args.alerts * 2)).start()
+    setup(server.base_url, api_type=args.api, auto_cancel_order=True, frequency=[0.05, 20], workers=args.workers, tickers=['SPX'])
+
+    import main
+    main.logger.setLevel(logging.CRITICAL)
+    from modules.context import AppContext
+    from modules.pipeline import Pipeline
+    from api.utils.push import fake_broker
+
+    async def run():
+        handler = AppContext.get().handler
+        ledger = AppContext.get().ledger
+        if args.fills == 'push':
+            broker = fake_broker()
+            await handler.wb.events.start(broker)
+            loop = asyncio.get_running_loop()
+            server.on_fill = lambda order: loop.call_soon_threadsafe(broker.send, order)
+
+        # resolve the chain once so every run starts from the same warm state
+        expireDate = str((await handler.wb.aio.get_options_expiration_dates('SPX'))[0]['date'])
+        chain = await handler.wb.aio.get_option_chain('SPX', expireDate)
+
+        pipeline = Pipeline(handler, args.workers)
+        strikes = [int(server.price) + i - args.alerts // 2 for i in range(args.alerts)]
+        dispatched = {}
+        done = []
+
+        start = time.perf_counter()
+        tasks = []
+        for strike in strikes:
+            option_id = chain.find(strike, 'call')['call']['tickerId']
+            dispatched[option_id] = time.perf_counter()
+            task = pipeline.dispatch(f'buy spx {strike}c @ 1.0')
+            task.add_done_callback(lambda _, sent=dispatched[option_id]: done.append(time.perf_counter() - sent))
+            tasks.append(task)
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+        await handler.wb.events.stop()
+        await handler.wb.wb._aio.close()
+        ledger.close()
+        to_order = [server.received[i] - sent for i, sent in dispatched.items() if i in server.received]
+        return elapsed, to_order, done, ledger.stats()
+
+    elapsed, to_order, done, ledger = asyncio.run(run())
+    server.stop()
+
+    results = {
+        'alerts_per_sec': round(args.alerts / elapsed, 1),
+        'orders': len(to_order),
+        'server_errors': server.errors,
+        'alert_to_order': summary(to_order) if to_order else None,
+        'alert_to_done': summary(done),
+        'ledger_rows': ledger['written']
+    }
+    params = {k: v for k, v in vars(args).items() if k != 'no_save'}
+    print(json.dumps({'params': params, 'results': results}, indent=2))
+
+    if not args.no_save:
+        previous = save('bench_alerts', params, results)
+        if previous and previous['results'].get('alert_to_order') and results['alert_to_order']:
+            before, after = previous['results'], results
+            print(f"vs {previous['commit']}: {before['alerts_per_sec']} -> {after['alerts_per_sec']} alerts/s, "
+                  f"p50 {before['alert_to_order']['p50_ms']} -> {after['alert_to_order']['p50_ms']}ms, "
+                  f"p99 {before['alert_to_order']['p99_ms']} -> {after['alert_to_order']['p99_ms']}ms")
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,66 @@
+'''
+Bar parsing across bar counts: the old row by row DataFrame build vs parse_bars.
+
+usage: python benchmarks/bench_bars.py [repeat]
+'''
+import sys, time
+from datetime import datetime
+
+from common import setup
+
+def response(count, start=1700000000, step=60):
+    rows = []
+    for i in range(count):
+        ts = start - i * step
+        vwap = 'null' if i % 50 == 0 else f'{100 + i % 7:.2f}'
+        rows.append(f'{ts},{100 + i % 5:.2f},{101 + i % 3:.2f},{102 + i % 4:.2f},{99 + i % 2:.2f},{100:.2f},{1000 + i},{vwap}')
+    return [{'timeZone': 'America/New_York', 'data': rows}]
+
+def legacy(result):
+    from pandas import DataFrame, to_datetime
+    from pytz import timezone
+
+    df = DataFrame(columns=['open', 'high', 'low', 'close', 'volume', 'vwap'])
+    df.index.name = 'timestamp'
+    time_zone = timezone(result[0]['timeZone'])
+    for row in result[0]['data']:
+        row = row.split(',')
+        row = ['0' if value == 'null' else value for value in row]
+        data = {
+            'open': float(row[1]),
+            'high': float(row[3]),
+            'low': float(row[4]),
+            'close': float(row[2]),
+            'volume': float(row[6]),
+            'vwap': float(row[7])
+        }
+        df.loc[to_datetime(datetime.fromtimestamp(int(row[0])).astimezone(time_zone))] = data
+    return df.iloc[::-1]
+
+def best(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+def main(repeat=5):
+    setup('http://127.0.0.1:9')
+    from api.utils.bars import parse_bars
+
+    print(f'{"bars":>6} {"legacy ms":>10} {"frame ms":>10} {"lazy ms":>10} {"raw ms":>10} {"speedup":>8}')
+    for count in (10, 100, 1200, 5000):
+        result = response(count)
+        old = legacy(result)
+        new = parse_bars(result)
+        assert (old.astype(float).values == new.values).all() and (old.index == new.index).all()
+
+        legacy_ms = best(lambda: legacy(result), 1 if count > 1200 else repeat)
+        frame_ms = best(lambda: parse_bars(result), repeat)
+        lazy_ms = best(lambda: parse_bars(result, 'lazy'), repeat)
+        raw_ms = best(lambda: parse_bars(result, 'raw'), repeat)
+        print(f'{count:>6} {legacy_ms:>10.2f} {frame_ms:>10.2f} {lazy_ms:>10.2f} {raw_ms:>10.2f} {legacy_ms / frame_ms:>7.0f}x')
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,70 @@
+'''
+Requests made by a burst of lookups for the same underlying, from a cold cache.
+
+Every burst runs the lookups an entry makes (get_ticker, get_options, get_option_quote)
+for one contract, all at the same time. With coalescing the identical calls in flight
+share one request, without it each call makes its own.
+
+usage: python benchmarks/bench_coalesce.py [--burst 20] [--latency 0.02] [--rounds 5]
+'''
+import argparse, asyncio, json, logging, sys, time
+
+from common import setup, summary
+from fake_webull import FakeWebull
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='concurrent identical lookups, with and without coalescing')
+    parser.add_argument('--burst', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--rounds', type=int, default=5)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = FakeWebull(latency=args.latency).start()
+    setup(server.base_url, tickers=['SPX'])
+
+    import main
+    main.logger.setLevel(logging.CRITICAL)
+    from modules.context import AppContext
+    from api.utils.flight import single_flight
+
+    class uncoalesced(single_flight):
+        # every call runs on its own, the behaviour before coalescing
+        async def do(self, key, call, name=None):
+            return await call()
+
+    async def lookup(aio, strike):
+        await aio.get_ticker('SPX')
+        rows = await aio.get_options('SPX', direction='call')
+        row = next(row for row in rows if float(row['strikePrice']) == strike)
+        await aio.get_option_quote(stock='SPX', optionId=row['call']['tickerId'])
+
+    async def run():
+        aio = AppContext.get().client.aio
+        strike = float(int(server.price))
+        timings = {'uncoalesced': [], 'coalesced': []}
+        requests = {'uncoalesced': [], 'coalesced': []}
+        for _ in range(args.rounds):
+            for name in timings:
+                aio.flights = uncoalesced() if name == 'uncoalesced' else single_flight()
+                aio.wb._tickers._entries.clear()
+                aio.wb._chains.clear()
+                before = server.requests
+                start = time.perf_counter()
+                await asyncio.gather(*[lookup(aio, strike) for _ in range(args.burst)])
+                timings[name].append(time.perf_counter() - start)
+                requests[name].append(server.requests - before)
+        stats = aio.flights.stats()
+        await aio.wb._aio.close()
+        return timings, requests, stats
+
+    timings, requests, stats = asyncio.run(run())
+    server.stop()
+
+    results = {name: {**summary(samples), 'requests': round(sum(requests[name]) / len(requests[name]), 1)} for name, samples in timings.items()}
+    results['saved'] = stats
+    print(json.dumps({'params': vars(args), 'results': results}, indent=2))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
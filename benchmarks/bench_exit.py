@@ -0,0 +1,95 @@
+'''
+Exit path benchmark against the fake server: closing every open position.
+
+Each round ends when the fake server has no open position left.
+
+legacy: one exit per position, each downloading the positions and scanning them,
+        one sell order after the other (the exit path before the position index)
+index:  Handler.sell_all, one positions download and the sells placed concurrently,
+        at most --workers at a time
+
+usage: python benchmarks/bench_exit.py [--api paper|live] [--positions 50] [--workers 4] [--latency 0.005] [--fill-delay 0.05] [--rounds 3]
+'''
+import argparse, asyncio, json, logging, re, sys, time
+
+from common import setup, summary
+from fake_webull import FakeWebull
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='close all positions, legacy scan vs position index')
+    parser.add_argument('--api', choices=('paper', 'live'), default='paper')
+    parser.add_argument('--positions', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.005)
+    parser.add_argument('--fill-delay', type=float, default=0.05)
+    parser.add_argument('--rounds', type=int, default=3)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = FakeWebull(latency=args.latency, fill_delay=args.fill_delay, strikes=max(200, args.positions * 2)).start()
+    setup(server.base_url, api_type=args.api, auto_cancel_order=True, frequency=[0.05, 20], workers=args.workers, tickers=['SPX'])
+
+    import main
+    main.logger.setLevel(logging.CRITICAL)
+    from modules.context import AppContext
+    from api.utils.push import fake_broker
+
+    ticker_id = server.ticker_id('SPX')
+    expire_date = server.expire_dates()[0]
+    contracts = [server.contract(ticker_id, expire_date, int(server.price) + i, 'call')['tickerId'] for i in range(args.positions)]
+
+    def seed():
+        with server._lock:
+            server.positions = {option_id: 2 for option_id in contracts}
+
+    async def legacy_exit(handler, option_id):
+        # the exit path before the position index
+        for each in await handler.wb.aio.get_positions(max_age=0):
+            if int(option_id) != int(each['ticker']['tickerId']):
+                continue
+            symbol = re.match(r'^[A-Z]+', each['ticker']['symbol']).group(0)
+            contract = f"{symbol} {'/'.join(each['optionExpireDate'].split('-')[1:])} {round(float(each['optionExercisePrice']))}{each['optionType'][:1]}"
+            await handler.manager.mkt_order(ticker_id=option_id, action='SELL', quant=int(each['position']), contract=contract)
+
+    async def run():
+        handler = AppContext.get().handler
+        broker = fake_broker()
+        await handler.wb.events.start(broker)
+        loop = asyncio.get_running_loop()
+        server.on_fill = lambda order: loop.call_soon_threadsafe(broker.send, order)
+
+        timings = {'legacy': [], 'index': []}
+        requests = {'legacy': [], 'index': []}
+        for _ in range(args.rounds):
+            for name in timings:
+                seed()
+                handler.wb.aio.invalidate_account()
+                before = server.requests
+                start = time.perf_counter()
+                if name == 'legacy':
+                    for option_id in contracts:
+                        await legacy_exit(handler, option_id)
+                else:
+                    await handler.sell_all()
+                # live sells return once placed, the round ends when the last one filled
+                deadline = time.perf_counter() + 10
+                while server.positions and time.perf_counter() < deadline:
+                    await asyncio.sleep(0.001)
+                timings[name].append(time.perf_counter() - start)
+                requests[name].append(server.requests - before)
+                assert not server.positions, f'{name} left {len(server.positions)} positions open'
+
+        await handler.wb.events.stop()
+        await handler.wb.wb._aio.close()
+        return timings, requests
+
+    timings, requests = asyncio.run(run())
+    server.stop()
+
+    results = {name: {**summary(samples), 'requests': round(sum(requests[name]) / len(requests[name]))} for name, samples in timings.items()}
+    results['speedup'] = round(results['legacy']['mean_ms'] / results['index']['mean_ms'], 1)
+    print(json.dumps({'params': vars(args), 'results': results}, indent=2))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
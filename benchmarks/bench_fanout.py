@@ -0,0 +1,105 @@
+'''
+Wall time of one entry alert copied to 1, 5 and 20 paper accounts against the fake server.
+
+fanout: the contract is resolved once, then every account places its order at the same time (Fanout)
+sequential: the same orders placed one account after the other
+
+An alert is done when every account's order has filled (auto_cancel_order follows each order).
+Every account logs in on its own and has its own connection pool and position store.
+
+usage: python benchmarks/bench_fanout.py [--accounts 1 5 20] [--alerts 5] [--latency 0.02]
+'''
+import argparse, asyncio, json, logging, sys, time
+
+from common import setup, summary
+from fake_webull import FakeWebull
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='one alert copied to several accounts')
+    parser.add_argument('--accounts', type=int, nargs='+', default=[1, 5, 20])
+    parser.add_argument('--alerts', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--fill-delay', type=float, default=0.05)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = FakeWebull(latency=args.latency, fill_delay=args.fill_delay).start()
+    extra = [{
+        'name': f'copy{number}',
+        'email': f'55501{number:02d}',
+        'password': 'bench',
+        'did': '',
+        'trading_pin': '',
+        'api_type': 'paper',
+        'max_per_trade': 750,
+        'position_store': f'positions-copy{number}.log'
+    } for number in range(1, max(args.accounts))]
+    # position stores are relative to the throwaway working directory setup() moves to
+    setup(server.base_url, api_type='paper', auto_cancel_order=True, frequency=[0.05, 20], tickers=['SPX'], accounts=extra)
+
+    import main
+    main.logger.setLevel(logging.CRITICAL)
+    from modules.context import AppContext
+    from modules.fanout import Fanout
+    from api.utils.push import fake_broker
+
+    async def run():
+        context = AppContext.get()
+        contexts = [context, *context.accounts]
+        loop = asyncio.get_running_loop()
+        brokers = []
+        for account in contexts:
+            broker = fake_broker()
+            await account.client.events.start(broker)
+            brokers.append(broker)
+        # the fake server has one account, every account hears every fill and keeps its own
+        server.on_fill = lambda order: [loop.call_soon_threadsafe(broker.send, order) for broker in brokers]
+        handlers = [account.handler for account in contexts]
+        parse = handlers[0].parse_message
+
+        # warm the ticker and chain caches and open one connection per account, which also
+        # gives every RiskEngine its first buying power, so every run starts from the same state
+        strike = int(server.price)
+        await handlers[0].resolve(parse(f'buy spx {strike}c @ 1.0'))
+        for account in contexts:
+            await account.client.aio.get_snapshot(max_age=0)
+
+        results = {}
+        for count in args.accounts:
+            fanout = Fanout(handlers[:count], main.logger)
+            timings = {'fanout': [], 'sequential': []}
+            orders = {'fanout': 0, 'sequential': 0}
+            for _ in range(args.alerts):
+                strike += 1
+                alert = parse(f'buy spx {strike}c @ 1.0')
+                before = len(server.orders)
+                start = time.perf_counter()
+                await fanout.handle_alert(alert)
+                timings['fanout'].append(time.perf_counter() - start)
+                orders['fanout'] += len(server.orders) - before
+
+                strike += 1
+                alert = parse(f'buy spx {strike}c @ 1.0')
+                before = len(server.orders)
+                start = time.perf_counter()
+                resolved = await handlers[0].resolve(alert)
+                for handler in handlers[:count]:
+                    await handler.entry(*resolved)
+                timings['sequential'].append(time.perf_counter() - start)
+                orders['sequential'] += len(server.orders) - before
+
+            results[count] = {name: {**summary(samples), 'orders': orders[name]} for name, samples in timings.items()}
+            results[count]['speedup'] = round(results[count]['sequential']['mean_ms'] / results[count]['fanout']['mean_ms'], 1)
+
+        for account in contexts:
+            await account.client.events.stop()
+            await account.client.wb._aio.close()
+        return results
+
+    results = asyncio.run(run())
+    server.stop()
+    print(json.dumps({'params': vars(args), 'results': results}, indent=2))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,117 @@
+'''
+Time the log calls of one order spend on the order path: the alert, quote, order sent,
+fill and position lines.
+
+legacy: f-strings, file and console handlers called in place, debug records always made for the file
+queued: lazy %-style calls, records queued for the listener thread (main.LogQueue), with debug off and on
+
+The console handler writes to os.devnull, a real terminal makes the legacy numbers worse.
+drained is the time from the first order until the listener has written every record.
+
+usage: python benchmarks/bench_logging.py [--orders 2000] [--rounds 5]
+'''
+import argparse, json, logging, logging.handlers, os, queue, sys, time
+
+from common import setup
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='per order logging overhead on the order path')
+    parser.add_argument('--orders', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=5)
+    return parser.parse_args(argv)
+
+ALERT = {'ticker': 'SPX', 'direction': 'call', 'exp_date': '2023-12-01', 'strike_price': '4550', 'lmt_price': 1.05, 'trigger': 'buy'}
+QUOTE = {'tickerId': 1234567, 'askList': [{'price': '1.05', 'volume': '12'}], 'bidList': [{'price': '1.00', 'volume': '8'}], 'close': '1.02'}
+
+def legacy_order(logger, order_id, positions):
+    logger.debug(f'Parsed alert: {ALERT}')
+    logger.debug(f"Quote found: {QUOTE}")
+    logger.info(f'LMT BUY order sent: 7x SPX 12/01 4550c @ ~{1.05}')
+    logger.info(f'''BUY order {order_id} filled
+    ----------------
+    Contract: 7x SPX 12/01 4550c
+    Total value: {7.35}
+    Average fill: {round(float('1.05'), 2)}
+    ----------------''')
+    logger.debug(f'New position appended to monitor: {order_id}')
+    logger.debug(f'New current positions list: {positions}')
+
+def lazy_order(logger, order_id, positions):
+    logger.debug('Parsed alert: %s', ALERT)
+    logger.debug('Quote found: %s', QUOTE)
+    logger.info('%s %s order sent: %s @ ~%s', 'LMT', 'BUY', '7x SPX 12/01 4550c', 1.05)
+    logger.info('''%s order %s filled
+    ----------------
+    Contract: %s
+    Total value: %s
+    Average fill: %.2f
+    ----------------''', 'BUY', order_id, '7x SPX 12/01 4550c', 7.35, float('1.05'))
+    logger.debug('New position appended to monitor: %s', order_id)
+    logger.debug('New current positions list: %s', list(positions))
+
+def handlers(workdir, name, format):
+    formatter = logging.Formatter(format, datefmt="%m-%d %H:%M:%S")
+    file_handler = logging.FileHandler(os.path.join(workdir, f'{name}.log'), encoding='utf-8')
+    file_handler.setFormatter(formatter)
+    file_handler.setLevel(logging.DEBUG)
+    stream_handler = logging.StreamHandler(open(os.devnull, 'w'))
+    stream_handler.setFormatter(formatter)
+    stream_handler.setLevel(logging.INFO)
+    return file_handler, stream_handler
+
+def measure(logger, order, orders, finish=None):
+    positions = list(range(5))
+    start = time.perf_counter()
+    for order_id in range(orders):
+        order(logger, order_id, positions)
+    caller = time.perf_counter() - start
+    if finish is not None:
+        finish()
+    return caller, time.perf_counter() - start
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = setup(None)
+    import main
+    main.logger.setLevel(logging.CRITICAL)
+    format = main.config.format
+
+    def legacy():
+        logger = logging.getLogger('bench.legacy')
+        logger.handlers.clear()
+        logger.propagate = False
+        for handler in handlers(workdir, 'legacy', format):
+            logger.addHandler(handler)
+        logger.setLevel(logging.DEBUG)
+        result = measure(logger, legacy_order, args.orders)
+        for handler in logger.handlers:
+            handler.close()
+        return result
+
+    def queued(debug):
+        logger = logging.getLogger(f'bench.queued.{debug}')
+        logger.handlers.clear()
+        logger.propagate = False
+        log_queue = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(log_queue, *handlers(workdir, f'queued-{debug}', format), respect_handler_level=True)
+        logger.addHandler(main.LogQueue(log_queue))
+        logger.setLevel(logging.DEBUG if debug else logging.INFO)
+        listener.start()
+        result = measure(logger, lazy_order, args.orders, listener.stop)
+        for handler in listener.handlers:
+            handler.close()
+        return result
+
+    runs = {'legacy': legacy, 'queued_debug_off': lambda: queued(False), 'queued_debug_on': lambda: queued(True)}
+    results = {}
+    for name, run in runs.items():
+        samples = [run() for _ in range(args.rounds)]
+        caller, drained = min(samples)
+        results[name] = {'us_per_order': round(caller / args.orders * 1e6, 2), 'drained_ms': round(drained * 1000, 1)}
+    for name in ('queued_debug_off', 'queued_debug_on'):
+        results[name]['speedup'] = round(results['legacy']['us_per_order'] / results[name]['us_per_order'], 1)
+
+    print(json.dumps({'params': vars(args), 'results': results}, indent=2))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
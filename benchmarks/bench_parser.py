@@ -0,0 +1,99 @@
+'''
+Alert parsing over a corpus of real alert strings: the old token loop vs AlertParser,
+with an empty cache (every alert parsed) and a warm cache (pasted alerts repeated).
+
+usage: python benchmarks/bench_parser.py [repeat]
+'''
+import logging, os, re, sys, time
+from datetime import datetime
+
+from common import setup
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'alerts.txt')
+
+def legacy(content, tickers, keywords, offset):
+    ticker = ''
+    direction = ''
+    exp_date = ''
+    strike_price = ''
+    lmt_price = ''
+    ticker_id = ''
+    trigger = ''
+
+    msgs = content.split(" ")
+
+    for ticker in [t for t in tickers if t.lower() in content]:
+        break
+
+    for msg in msgs:
+        try:
+            if "/" in msg and bool(re.search(r"\d", msg)):
+                exp_date = (datetime.strptime(msg, "%m/%d")).strftime("2023-%m-%d")
+            elif ("c" in msg or "p" in msg) and bool(re.search(r"\d", msg)) and not strike_price:
+                strike_price = str(re.sub(r"[a-zA-Z]", "", msg)).rstrip('0').rstrip('.') if '.' in str(re.sub(r"[a-zA-Z]", "", msg)) else str(re.sub(r"[a-zA-Z]", "", msg))
+                direction = "call" if "c" in msg else "put"
+            elif "." in msg and bool(re.search(r"\d", msg)) and not lmt_price:
+                lmt_price = round(float(msg) + offset, 2)
+            elif msg.isdigit() and not ticker_id:
+                ticker_id = int(msg)
+        except Exception:
+            pass
+
+    for key, values in keywords.items():
+        if any(value in content for value in values):
+            trigger = key
+            break
+
+    return (ticker, direction, exp_date[5:], strike_price, lmt_price, ticker_id, trigger)
+
+def best(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def main(repeat=200):
+    setup(None)
+    import main
+    main.logger.setLevel(logging.CRITICAL)
+    from modules.parser import AlertParser
+
+    config = main.config
+    with open(CORPUS) as file:
+        corpus = [line.strip().lower() for line in file if line.strip()]
+
+    def compiled():
+        return AlertParser(config.tickers, config.keywords, config.bto_offset, main.logger)
+
+    parser = compiled()
+    for content in corpus:
+        alert = parser.parse(content)
+        new = (alert.ticker, alert.direction, alert.exp_date[5:], alert.strike_price, alert.lmt_price, alert.ticker_id, alert.trigger)
+        assert new == legacy(content, config.tickers, config.keywords, config.bto_offset), content
+
+    def cold():
+        parse = parser._parse
+        for content in corpus:
+            parse(content)
+
+    def warm():
+        parse = parser.parse
+        for content in corpus:
+            parse(content)
+
+    old = best(lambda: [legacy(content, config.tickers, config.keywords, config.bto_offset) for content in corpus], repeat)
+    build = best(compiled, repeat)
+    uncached = best(cold, repeat)
+    cached = best(warm, repeat)
+
+    per = lambda seconds: f'{seconds / len(corpus) * 1e6:.2f}us/alert'
+    print(f'corpus: {len(corpus)} alerts, {len(config.tickers)} tickers')
+    print(f'legacy: {per(old)}')
+    print(f'compiled: {per(uncached)} ({old / uncached:.1f}x)')
+    print(f'cached: {per(cached)} ({old / cached:.1f}x)')
+    print(f'build: {build * 1e6:.1f}us once per config load')
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,59 @@
+'''
+Startup time and per alert overhead of the application context.
+
+import: config, logger and position store (import main)
+login: first AppContext.client, the only login of the run
+handler: Handler and Manager built by the context
+alerts: entries handled through the shared Handler/Manager, with the
+        server requests each one makes (no login, no settings or position reads)
+
+usage: python benchmarks/bench_startup.py [alerts]
+'''
+import asyncio, logging, sys, time
+
+from common import setup, summary
+from fake_webull import FakeWebull
+
+def main(alerts=50):
+    server = FakeWebull().start()
+    setup(server.base_url, tickers=['SPX'])
+    phases = {}
+
+    start = time.perf_counter()
+    import main
+    main.logger.setLevel(logging.WARNING)
+    from modules.context import AppContext
+    phases['import'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    context = AppContext.get()
+    context.client
+    phases['login'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    handler = context.handler
+    phases['handler'] = time.perf_counter() - start
+    startup_requests = server.requests
+
+    loop = asyncio.new_event_loop()
+    samples = []
+    for _ in range(alerts):
+        begin = time.perf_counter()
+        loop.run_until_complete(handler.handle_message(f'buy spx {int(server.price)}c @ 1.0'))
+        samples.append(time.perf_counter() - begin)
+    alert_requests = server.requests - startup_requests
+
+    start = time.perf_counter()
+    context.reload()
+    phases['reload'] = time.perf_counter() - start
+
+    loop.run_until_complete(context.client.wb._aio.close())
+    loop.close()
+    server.stop()
+    print('startup: ' + ', '.join(f'{name} {round(seconds * 1000, 3)}ms' for name, seconds in phases.items()))
+    print(f'startup requests: {startup_requests}')
+    print(f'alerts: {summary(samples)}, {alert_requests / alerts:.1f} requests per alert')
+    print(f'shared manager: {context.manager is handler.manager}')
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
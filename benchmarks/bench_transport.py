@@ -0,0 +1,52 @@
+'''
+Cold vs warm order latency through the pooled transport.
+
+cold: a fresh transport for every order, same as the old module level requests.post
+warm: one shared keep-alive transport owned by the account
+
+The fake server is plain http on localhost, so the gap here is only the TCP connect.
+Against the real https hosts every cold order also pays a TLS handshake.
+
+usage: python benchmarks/bench_transport.py [orders] [server latency seconds]
+'''
+import asyncio, logging, sys, time
+
+from common import setup, summary
+from fake_webull import FakeWebull
+
+def main(orders=200, latency=0.0):
+    server = FakeWebull(latency=latency).start()
+    setup(server.base_url)
+
+    import main
+    main.logger.setLevel(logging.WARNING)
+    from api import paper_webull
+    from api.utils.async_transport import async_transport
+
+    wb = paper_webull(username='5550100', password='bench', did='bench-did')
+    shared = wb.wb._aio
+    loop = asyncio.new_event_loop()
+
+    def place():
+        start = time.perf_counter()
+        loop.run_until_complete(wb.place_order_option(optionId=1, quant=1, lmtPrice=1.0, action='BUY', tp_order=True))
+        return time.perf_counter() - start
+
+    cold = []
+    for _ in range(orders):
+        wb.wb._aio = async_transport.like(wb.wb._transport)
+        cold.append(place())
+        loop.run_until_complete(wb.wb._aio.close())
+
+    wb.wb._aio = shared
+    place() # open the pooled connection
+    warm = [place() for _ in range(orders)]
+
+    loop.run_until_complete(shared.close())
+    loop.close()
+    server.stop()
+    print(f'cold: {summary(cold)}')
+    print(f'warm: {summary(warm)}')
+
+if __name__ == '__main__':
+    main(*[cast(arg) for cast, arg in zip((int, float), sys.argv[1:])])
@@ -0,0 +1,50 @@
+import json, os, pickle, statistics, sys, tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, 'src')
+
+def setup(base_url, **overrides):
+    '''
+    Write a throwaway config pointing at base_url and make src/ importable.
+    Must run before anything imports main.
+    '''
+    workdir = tempfile.mkdtemp(prefix='wecli-bench-')
+    with open(os.path.join(SRC, 'misc', 'config.json')) as file:
+        settings = json.load(file)
+
+    cfg = settings['config']
+    cfg['login'] = {'email': '5550100', 'password': 'bench', 'did': 'bench-did', 'trading_pin': ''}
+    cfg['auto_cancel_order'] = False
+    cfg['debug'] = False
+    cfg['log_path'] = os.path.join(workdir, 'app.log')
+    cfg['csv_path'] = os.path.join(workdir, 'trades.csv')
+    cfg['variable_path'] = os.path.join(workdir, 'current_positions.pkl')
+    cfg['transport']['base_url'] = base_url
+    cfg['ticker_cache']['path'] = os.path.join(workdir, 'tickers.json')
+    cfg['position_store']['path'] = os.path.join(workdir, 'positions.log')
+    cfg['session']['path'] = os.path.join(workdir, 'session.json')
+    cfg['metrics']['path'] = os.path.join(workdir, 'metrics.json')
+    cfg.update(overrides)
+
+    with open(cfg['variable_path'], 'wb') as file:
+        pickle.dump([], file)
+    config_path = os.path.join(workdir, 'config.json')
+    with open(config_path, 'w') as file:
+        json.dump(settings, file)
+
+    os.environ['WECLI_CONFIG'] = config_path
+    os.chdir(workdir) # did.bin is written to the working directory
+    if SRC not in sys.path:
+        sys.path.insert(0, SRC)
+    return workdir
+
+def summary(samples):
+    ordered = sorted(samples)
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+    return {
+        'n': len(ordered),
+        'mean_ms': round(statistics.mean(ordered) * 1000, 3),
+        'p50_ms': round(pct(50) * 1000, 3),
+        'p99_ms': round(pct(99) * 1000, 3),
+    }
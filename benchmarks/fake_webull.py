@@ -0,0 +1,242 @@
+import json, itertools, random, re, socket, threading, time, zlib
+from urllib.parse import parse_qs, urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class FakeWebull(ThreadingHTTPServer):
+    '''
+    Local stand-in for the Webull hosts. Point an account at it with the
+    transport "base_url" setting; routes are matched on the url path only.
+
+    latency: seconds added to every reply, plus up to jitter seconds at random
+    error_rate: share of requests answered with a 500, only for paths containing error_path if given
+    fill_delay: seconds after placement an order fills
+    fill_rate: share of orders that fill at all, the rest stay working until cancelled
+    partial: orders of more than one contract fill half way at fill_delay / 2 first
+    on_fill(order): called from a timer thread on every (partial) fill, e.g. fake_broker.send
+    '''
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, strikes=200, expirations=4, jitter=0.0, error_rate=0.0, error_path=None, fill_delay=0.0, fill_rate=1.0, partial=False, seed=0):
+        super().__init__((host, port), FakeWebullHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_path = error_path
+        self.fill_delay = fill_delay
+        self.fill_rate = fill_rate
+        self.partial = partial
+        self.on_fill = None
+        self.strikes = strikes
+        self.expirations = expirations
+        self.price = strikes / 2
+        self.contracts = {}
+        self.orders = {}
+        self.positions = {}
+        self.order_ids = itertools.count(1000)
+        self.requests = 0
+        self.errors = 0
+        self.received = {}
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def ticker_id(self, symbol):
+        return zlib.crc32(symbol.encode('utf-8')) % 10**8
+
+    def expire_dates(self):
+        return [f'2023-12-{day:02d}' for day in range(1, self.expirations + 1)]
+
+    def option_id(self, ticker_id, expire_date, strike, direction):
+        return zlib.crc32(f'{ticker_id} {expire_date} {strike} {direction}'.encode('utf-8')) % 10**9
+
+    def contract(self, ticker_id, expire_date, strike, direction):
+        contract = {
+            'tickerId': self.option_id(ticker_id, expire_date, strike, direction),
+            'strikePrice': str(strike),
+            'direction': direction,
+            'expireDate': expire_date,
+            'askList': [{'price': '1.10', 'volume': '10'}],
+            'bidList': [{'price': '1.00', 'volume': '10'}],
+            'close': '1.05',
+            'volume': '100',
+            'openInterest': '1000'
+        }
+        self.contracts[contract['tickerId']] = contract
+        return contract
+
+    def place(self, body):
+        leg = body['orders'][0]
+        order = {
+            'orderId': next(self.order_ids),
+            'tickerId': leg['tickerId'],
+            'action': leg['action'],
+            'totalQuantity': leg['quantity'],
+            'filledQuantity': 0,
+            'lmtPrice': body.get('lmtPrice'),
+            'avgFilledPrice': None,
+            'filledValue': 0,
+            'status': 'Working'
+        }
+        with self._lock:
+            self.orders[order['orderId']] = order
+            self.received.setdefault(order['tickerId'], time.perf_counter())
+
+        if self.random.random() < self.fill_rate:
+            if self.partial and order['totalQuantity'] > 1:
+                threading.Timer(self.fill_delay / 2, self.fill, (order['orderId'], order['totalQuantity'] // 2)).start()
+            threading.Timer(self.fill_delay, self.fill, (order['orderId'], order['totalQuantity'])).start()
+        return {'orderId': order['orderId']}
+
+    def fill(self, order_id, quantity):
+        with self._lock:
+            order = self.orders[order_id]
+            if order['status'] not in ('Working', 'Partially Filled'):
+                return
+            contract = self.contracts.get(order['tickerId'], {})
+            price = float(order['lmtPrice'] or contract.get('close') or 1.0)
+            done = quantity - order['filledQuantity']
+            order['filledQuantity'] = quantity
+            order['avgFilledPrice'] = f'{price:.2f}'
+            order['filledValue'] = f'{price * quantity * 100:.2f}'
+            order['status'] = 'Filled' if quantity >= order['totalQuantity'] else 'Partially Filled'
+            held = self.positions.get(order['tickerId'], 0) + (done if order['action'] == 'BUY' else -done)
+            if held > 0:
+                self.positions[order['tickerId']] = held
+            else:
+                self.positions.pop(order['tickerId'], None)
+            snapshot = dict(order)
+        if self.on_fill:
+            self.on_fill(snapshot)
+
+    def cancel(self, order_id):
+        with self._lock:
+            order = self.orders.get(int(order_id))
+            if order is None or order['status'] not in ('Working', 'Partially Filled'):
+                return False
+            order['status'] = 'Cancelled'
+            return True
+
+    def order_list(self, query):
+        status = (query.get('status') or ['All'])[0]
+        count = int((query.get('pageSize') or [20])[0])
+        with self._lock:
+            orders = [dict(o) for o in reversed(self.orders.values()) if status in ('All', o['status'])]
+        return orders[:count]
+
+    def position_list(self):
+        with self._lock:
+            held = list(self.positions.items())
+        positions = []
+        for ticker_id, quantity in held:
+            contract = self.contracts.get(ticker_id, {'strikePrice': '0', 'direction': 'call', 'expireDate': '2023-12-01'})
+            positions.append({
+                'ticker': {'tickerId': ticker_id, 'symbol': f"SPX{contract['expireDate'][2:].replace('-', '')}{contract['direction'][0].upper()}"},
+                'optionExercisePrice': contract['strikePrice'],
+                'optionType': contract['direction'],
+                'optionExpireDate': contract['expireDate'],
+                'position': str(quantity)
+            })
+        return positions
+
+    def account(self):
+        with self._lock:
+            open_orders = [dict(o) for o in self.orders.values() if o['status'] in ('Working', 'Partially Filled')]
+        return {'positions': self.position_list(), 'openOrders': open_orders, 'netLiquidation': '100000.00', 'accountMembers': [{'key': 'dayBuyingPower', 'value': '100000.00'}]}
+
+    def failing(self, path):
+        if not self.error_rate or (self.error_path and self.error_path not in path):
+            return False
+        with self._lock:
+            return self.random.random() < self.error_rate
+
+    def option_chain(self, body):
+        dates = self.expire_dates()
+        if body.get('expireDate'):
+            dates = [d for d in dates if d == body['expireDate']]
+        return {'expireDateList': [{
+            'from': {'date': d, 'days': 0, 'weekly': 1},
+            'data': [self.contract(body['tickerId'], d, strike, direction) for strike in range(self.strikes) for direction in ('call', 'put')]
+        } for d in dates]}
+
+    def route(self, method, path, query, body):
+        if path.endswith('/user/v1/login/account/v2'):
+            return {'accessToken': 'fake-access', 'refreshToken': 'fake-refresh', 'tokenExpireTime': '2099-01-01T00:00:00.000+0000', 'uuid': 'fake-uuid'}
+        if path.endswith('/passport/refreshToken'):
+            return {'accessToken': 'fake-access', 'refreshToken': 'fake-refresh', 'tokenExpireTime': '2099-01-01T00:00:00.000+0000'}
+        if path.endswith('/myaccounts/true'):
+            return [{'id': 1}]
+        if path.endswith('/account/getSecAccountList/v5'):
+            return {'success': True, 'data': [{'rzone': 'dc_core_r001', 'secAccountId': 1}]}
+        if path.endswith('/trading/v1/global/trade/login'):
+            return {'tradeToken': 'fake-trade-token'}
+        if path.endswith('/search/pc/tickers'):
+            symbol = query['keyword'][0]
+            return {'data': [{'symbol': symbol, 'disSymbol': symbol, 'tickerId': self.ticker_id(symbol)}]}
+        if path.endswith('/quote/option/strategy/list'):
+            return self.option_chain(body)
+        if path.endswith('/quotes/ticker/getTickerRealTime'):
+            return {'tickerId': int(query['tickerId'][0]), 'close': f'{self.price:.2f}'}
+        if path.endswith('/quote/option/query/list'):
+            ids = query['derivativeIds'][0].split(',')
+            return {'data': [self.contracts[int(i)] for i in ids if int(i) in self.contracts]}
+        if path.endswith('/paper/v1/order/optionPlace') or '/trade/v2/option/placeOrder/' in path:
+            return self.place(body)
+        if '/orderop/cancel/' in path:
+            return {'success': self.cancel(path.rsplit('/', 1)[-1])}
+        if '/cancelStockOrder/' in path:
+            return {'success': self.cancel(re.search(r'/cancelStockOrder/(\d+)', path)[1])}
+        if re.search(r'/paper/1/acc/\d+/order$', path) or path.endswith('/trade/v2/option/list'):
+            return self.order_list(query)
+        if re.search(r'/paper/1/acc/\d+$', path) or '/v3/home/' in path:
+            return self.account()
+        return {}
+
+class FakeWebullHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        # headers and body go out in separate writes, don't let Nagle hold the body back
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, method):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'null') if length else None
+        self.server.requests += 1
+        if self.server.latency or self.server.jitter:
+            time.sleep(self.server.latency + self.server.random.random() * self.server.jitter)
+
+        url = urlsplit(self.path)
+        if self.server.failing(url.path):
+            self.server.errors += 1
+            status, payload = 500, b'{"success": false, "msg": "fake error"}'
+        else:
+            status, payload = 200, json.dumps(self.server.route(method, url.path, parse_qs(url.query), body)).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self._reply('GET')
+
+    def do_POST(self):
+        self._reply('POST')
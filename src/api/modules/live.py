@@ -1,17 +1,141 @@
-import uuid, requests
+import asyncio, time, uuid
 from datetime import datetime
 from pytz import timezone
 
 from ..utils.account import account
 from ..utils.endpoints import urls
-from .utils import utils as u
+from ..utils.async_transport import run_sync
+from ..utils.trace import trace
+from .utils import utils as u, async_utils
 
 endpoint = urls()
 utils = u()
 
 from main import logger
 
+class async_webull(async_utils):
+    '''
+    Coroutine versions of the live account quote, position, order and cancel calls
+    '''
+    async def place_order_option(self, optionId=None, lmtPrice='MKT', stpPrice=None, action=None, orderType='LMT', enforce='DAY', quant=0, contract='Unknown', tp_order=False):
+        '''
+        create buy / sell order
+        stock: string
+        lmtPrice: float
+        stpPrice: float
+        action: string BUY / SELL
+        optionId: string
+        orderType: MKT / LMT / STP / STP LMT
+        enforce: GTC / DAY
+        quant: int
+        '''
+        start = time.perf_counter()
+        headers = self.wb.build_req_headers(include_trade_token=True, include_time=True)
+        data = {
+            'orderType': orderType,
+            'serialId': str(uuid.uuid4()),
+            'timeInForce': enforce,
+            'orders': [{'quantity': int(quant), 'action': action, 'tickerId': int(optionId), 'tickerType': 'OPTION'}],
+        }
+
+        if orderType == 'LMT' and isinstance(lmtPrice, (int, float)):
+            data['lmtPrice'] = float(lmtPrice)
+
+        response = await self.wb._aio.post(endpoint.place_option_orders(self.wb._account_id), json=data, headers=headers, timeout=self.wb.timeout)
+        if response.status_code != 200 :
+            raise Exception('place_option_order failed', response.status_code, response.reason)
+        seconds = time.perf_counter() - start
+        trace.observe('order.submit', seconds)
+        self.invalidate_account()
+        result = response.json()
+        self._submitted(result, optionId, action, orderType, quant, lmtPrice, contract, seconds)
+        
+        logger.info('%s %s order sent: %s @ ~%s', orderType, action, contract, lmtPrice)
+
+        response_stop = None
+        if stpPrice:
+            data_stp = {
+                'orderType': orderType,
+                'serialId': str(uuid.uuid4()),
+                'timeInForce': enforce,
+                'orders': [{'quantity': int(quant), 'action': 'SELL', 'tickerId': int(optionId), 'tickerType': 'OPTION'}],
+            }
+            data_stp['auxPrice'] = float(stpPrice)
+            response_stop = await self.wb._aio.post(endpoint.place_option_orders(self.wb._account_id), json=data_stp, headers=headers, timeout=self.wb.timeout)
+            if response_stop.status_code != 200:
+                raise Exception('place_option_order (stop loss order) failed', response_stop.status_code, response_stop.reason)
+            logger.info('STOP order sent @ %s @ ~%s', stpPrice, lmtPrice)
+            response_stop = response_stop.json()
+
+        return result, response_stop
+
+    async def cancel_order(self, order_id=''):
+        '''
+        Cancel an order
+        '''
+        headers = self.wb.build_req_headers(include_trade_token=True, include_time=True)
+        data = {}
+        response = await self.wb._aio.post(endpoint.cancel_order(self.wb._account_id) + str(order_id) + '/' + str(uuid.uuid4()), json=data, headers=headers, timeout=self.wb.timeout)
+        self.invalidate_account()
+        result = response.json()
+        return result['success']
+
+    async def _fetch_account(self):
+        headers = self.wb.build_req_headers()
+        response = await self.wb._aio.get(endpoint.account(self.wb._account_id), headers=headers, timeout=self.wb.timeout)
+        return response.json()
+
+    async def get_account(self, max_age=None):
+        '''
+        get important details of account, positions, portfolio stance...etc
+        served from the account snapshot, max_age=0 downloads it again
+        '''
+        return (await self.get_snapshot(max_age)).data
+
+    async def get_positions(self, max_age=None):
+        '''
+        output standing positions of stocks
+        '''
+        return (await self.get_snapshot(max_age)).positions
+
+    async def get_portfolio(self, max_age=None):
+        '''
+        output numbers of portfolio
+        '''
+        return dict((await self.get_snapshot(max_age)).portfolio)
+
+    async def get_buying_power(self, max_age=None):
+        return (await self.get_snapshot(max_age)).buying_power
+
+    async def get_current_orders(self, max_age=None) :
+        '''
+        Get open/standing orders
+        '''
+        data = (await self.get_snapshot(max_age)).open_orders
+        logger.debug('Standing orders: %s', data)
+        return data
+    
+    async def get_history_orders(self, status='All', count=20, action=''):
+        '''
+        Historical orders, can be cancelled or filled
+        status = Cancelled / Filled / Working / Partially Filled / Pending / Failed / All
+        '''
+        headers = self.wb.build_req_headers(include_trade_token=True, include_time=True)
+        response = await self.wb._aio.get(endpoint.orders(self.wb._account_id, count, status, action), headers=headers, timeout=self.wb.timeout)
+        return response.json()
+
+    async def cancel_all_orders(self):
+        '''
+        Cancels all open (aka 'working') orders at once
+        '''
+        open_orders = await self.get_current_orders(max_age=0)
+        await asyncio.gather(*[self.cancel_order(order['orderId']) for order in open_orders])
+        for order in open_orders:
+            logger.info('Order cancelled: %s', order['orderId'])
+
 class webull(u):
+    async_class = async_webull
+
     def __init__(self, **kwargs) -> None:
         self.wb = account(**kwargs)
         super().login(self.wb)
@@ -62,7 +186,7 @@ class webull(u):
             data['trailingStopStep'] = float(trial_value)
             data['trailingType'] = str(trial_type)
 
-        response = requests.post(endpoint.place_orders(self.wb._account_id), json=data, headers=headers, timeout=self.wb.timeout)
+        response = self.wb._transport.post(endpoint.place_orders(self.wb._account_id), json=data, headers=headers, timeout=self.wb.timeout)
         return response.json()
 
     def modify_order(self, order=None, order_id=0, stock=None, tId=None, price=0, action=None, orderType=None, enforce=None, quant=0, outsideRegularTradingHour=None):
@@ -109,19 +233,15 @@ class webull(u):
         if data['orderType'] == 'MKT':
             data['outsideRegularTradingHour'] = False
 
-        response = requests.post(endpoint.modify_order(self.wb._account_id, order_id), json=data, headers=headers, timeout=self.wb.timeout)
+        response = self.wb._transport.post(endpoint.modify_order(self.wb._account_id, order_id), json=data, headers=headers, timeout=self.wb.timeout)
 
         return response.json()
 
     def cancel_order(self, order_id=''):
         '''
-        Cancel an order
+        Cancel an order, blocking wrapper of async_webull.cancel_order
         '''
-        headers = self.wb.build_req_headers(include_trade_token=True, include_time=True)
-        data = {}
-        response = requests.post(endpoint.cancel_order(self.wb._account_id) + str(order_id) + '/' + str(uuid.uuid4()), json=data, headers=headers, timeout=self.wb.timeout)
-        result = response.json()
-        return result['success']
+        return run_sync(self.aio.cancel_order(order_id))
 
     def place_order_otoco(self, stock='', price='', stop_loss_price='', limit_profit_price='', time_in_force='DAY', quant=0) :
         '''
@@ -144,7 +264,7 @@ class webull(u):
             ]
         }
 
-        response1 = requests.post(endpoint.check_otoco_orders(self.wb._account_id), json=data1, headers=headers, timeout=self.wb.timeout)
+        response1 = self.wb._transport.post(endpoint.check_otoco_orders(self.wb._account_id), json=data1, headers=headers, timeout=self.wb.timeout)
         result1 = response1.json()
 
         if result1['forward'] :
@@ -161,7 +281,7 @@ class webull(u):
                 'serialId': str(uuid.uuid4())
             }
 
-            response2 = requests.post(endpoint.place_otoco_orders(self.wb._account_id), json=data2, headers=headers, timeout=self.wb.timeout)
+            response2 = self.wb._transport.post(endpoint.place_otoco_orders(self.wb._account_id), json=data2, headers=headers, timeout=self.wb.timeout)
 
             # print('Resp 2: {}'.format(response2))
             return response2.json()
@@ -191,7 +311,7 @@ class webull(u):
             'serialId': str(uuid.uuid4())
         }
 
-        response = requests.post(endpoint.modify_otoco_orders(self.wb._account_id), json=data, headers=headers, timeout=self.wb.timeout)
+        response = self.wb._transport.post(endpoint.modify_otoco_orders(self.wb._account_id), json=data, headers=headers, timeout=self.wb.timeout)
 
         return response.json()
 
@@ -202,7 +322,7 @@ class webull(u):
         headers = self.wb.build_req_headers(include_trade_token=True, include_time=True)
         # data = { 'serialId': str(uuid.uuid4()), 'cancelOrders': [str(order_id)]}
         data = {}
-        response = requests.post(endpoint.cancel_otoco_orders(self.wb._account_id, combo_id), json=data, headers=headers, timeout=self.wb.timeout)
+        response = self.wb._transport.post(endpoint.cancel_otoco_orders(self.wb._account_id, combo_id), json=data, headers=headers, timeout=self.wb.timeout)
         return response.json()
 
     def place_order_crypto(self, stock=None, tId=None, price=0, action='BUY', orderType='LMT', enforce='DAY', entrust_type='QTY', quant=0, outsideRegularTradingHour=False) :
@@ -238,52 +358,14 @@ class webull(u):
             'timeInForce': enforce
         }
 
-        response = requests.post(endpoint.place_orders(self.wb._account_id), json=data, headers=headers, timeout=self.wb.timeout)
+        response = self.wb._transport.post(endpoint.place_orders(self.wb._account_id), json=data, headers=headers, timeout=self.wb.timeout)
         return response.json()
 
     async def place_order_option(self, optionId=None, lmtPrice='MKT', stpPrice=None, action=None, orderType='LMT', enforce='DAY', quant=0, contract='Unknown', tp_order=False):
         '''
-        create buy / sell order
-        stock: string
-        lmtPrice: float
-        stpPrice: float
-        action: string BUY / SELL
-        optionId: string
-        orderType: MKT / LMT / STP / STP LMT
-        enforce: GTC / DAY
-        quant: int
+        create buy / sell order, see async_webull.place_order_option
         '''
-        headers = self.wb.build_req_headers(include_trade_token=True, include_time=True)
-        data = {
-            'orderType': orderType,
-            'serialId': str(uuid.uuid4()),
-            'timeInForce': enforce,
-            'orders': [{'quantity': int(quant), 'action': action, 'tickerId': int(optionId), 'tickerType': 'OPTION'}],
-        }
-
-        if orderType == 'LMT' and isinstance(lmtPrice, int):
-            data['lmtPrice'] = float(lmtPrice)
-
-        response = requests.post(endpoint.place_option_orders(self.wb._account_id), json=data, headers=headers, timeout=self.wb.timeout)
-        if response.status_code != 200 :
-            raise Exception('place_option_order failed', response.status_code, response.reason)
-        
-        logger.info(f'{orderType} {action} order sent: {contract} @ ~{lmtPrice}')
-        
-        if stpPrice:
-            data_stp = {
-                'orderType': orderType,
-                'serialId': str(uuid.uuid4()),
-                'timeInForce': enforce,
-                'orders': [{'quantity': int(quant), 'action': 'SELL', 'tickerId': int(optionId), 'tickerType': 'OPTION'}],
-            }
-            data_stp['auxPrice'] = float(stpPrice)
-            response_stop = requests.post(endpoint.place_option_orders(self.wb._account_id), json=data, headers=headers, timeout=self.wb.timeout)
-            if response_stop.status_code != 200:
-                raise Exception('place_option_order (stop loss order) failed', response_stop.status_code, response_stop.reason)
-            logger.info(f'STOP order sent @ {stpPrice} @ ~{lmtPrice}')
-
-        return response.json(), response_stop.json()
+        return await self.aio.place_order_option(optionId, lmtPrice, stpPrice, action, orderType, enforce, quant, contract, tp_order)
 
     def modify_order_option(self, order=None, lmtPrice=None, stpPrice=None, enforce=None, quant=0):
         '''
@@ -314,37 +396,34 @@ class webull(u):
             data['auxPrice'] = stpPrice or order['auxPrice']
             data['lmtPrice'] = lmtPrice or order['lmtPrice']
 
-        response = requests.post(endpoint.replace_option_orders(self.wb._account_id), json=data, headers=headers, timeout=self.wb.timeout)
+        response = self.wb._transport.post(endpoint.replace_option_orders(self.wb._account_id), json=data, headers=headers, timeout=self.wb.timeout)
         if response.status_code != 200:
             raise Exception('replace_option_order failed', response.status_code, response.reason)
         return True
 
     def get_account(self):
         '''
-        get important details of account, positions, portfolio stance...etc
+        get important details of account, blocking wrapper of async_webull.get_account
         '''
-        headers = self.wb.build_req_headers()
-        response = requests.get(endpoint.account(self.wb._account_id), headers=headers, timeout=self.wb.timeout)
-        result = response.json()
-
-        return result
+        return run_sync(self.aio.get_account())
 
     def get_positions(self):
         '''
         output standing positions of stocks
         '''
-
-        return self.get_account()['positions']
+        return run_sync(self.aio.get_positions())
 
     def get_portfolio(self):
         '''
         output numbers of portfolio
         '''
-        data = self.get_account()
-        output = {}
-        for item in data['accountMembers']:
-            output[item['key']] = item['value']
-        return output
+        return run_sync(self.aio.get_portfolio())
+
+    def get_buying_power(self):
+        '''
+        buying power of the account snapshot
+        '''
+        return run_sync(self.aio.get_buying_power())
 
     def get_activities(self, index=1, size=500) :
         '''
@@ -353,31 +432,24 @@ class webull(u):
         headers = self.wb.build_req_headers(include_trade_token=True, include_time=True)
         data = {'pageIndex': index,
                 'pageSize': size}
-        response = requests.post(endpoint.account_activities(self.wb._account_id), json=data, headers=headers, timeout=self.wb.timeout)
+        response = self.wb._transport.post(endpoint.account_activities(self.wb._account_id), json=data, headers=headers, timeout=self.wb.timeout)
         return response.json()
 
     def get_current_orders(self) :
         '''
         Get open/standing orders
         '''
-        data = self.get_account()['openOrders']
-        self.wb.logger.debug(f'Standing orders: {data}')
-        return data
+        return run_sync(self.aio.get_current_orders())
     
     def get_history_orders(self, status='All', count=20, action=''):
         '''
         Historical orders, can be cancelled or filled
         status = Cancelled / Filled / Working / Partially Filled / Pending / Failed / All
         '''
-        headers = self.wb.build_req_headers(include_trade_token=True, include_time=True)
-        response = requests.get(endpoint.orders(self.wb._account_id, count, status, action), headers=headers, timeout=self.wb.timeout)
-        return response.json()
+        return run_sync(self.aio.get_history_orders(status, count, action))
 
     def cancel_all_orders(self):
         '''
         Cancels all open (aka 'working') orders
         '''
-        open_orders = self.get_current_orders()
-        for order in open_orders:
-            self.cancel_order(order['orderId'])
-            self.wb.logger.info(f'Order cancelled: {order["orderId"]}')
+        return run_sync(self.aio.cancel_all_orders())
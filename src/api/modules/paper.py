@@ -1,5 +1,5 @@
 
-import requests, uuid
+import asyncio, time, uuid
 
 from datetime import datetime
 from pytz import timezone
@@ -8,16 +8,17 @@ from main import logger, config
 
 from ..utils.account import account
 from ..utils.endpoints import urls
-from .utils import utils as u
+from ..utils.async_transport import run_sync
+from ..utils.trace import trace
+from .utils import utils as u, async_utils
 
 endpoint = urls()
 utils = u()
 
-class paper_webull(u):
-    def __init__(self, **kwargs) -> None:
-        self.wb = account(paper=True, **kwargs)
-        super().login(self.wb)
-
+class async_paper_webull(async_utils):
+    '''
+    Coroutine versions of the paper account quote, position, order and cancel calls
+    '''
     async def place_order_option(self, optionId, quant, lmtPrice=None, stpPrice=None, action=None, orderType='LMT', enforce='DAY', contract='Unknown', tp_order=False):
         '''
         create buy / sell order
@@ -30,6 +31,7 @@ class paper_webull(u):
         quant: int
         '''
 
+        start = time.perf_counter()
         headers = self.wb.build_req_headers(include_trade_token=True, include_time=True)
         data = {
             'orderType': orderType,
@@ -47,20 +49,83 @@ class paper_webull(u):
         if orderType == 'LMT' and isinstance(lmtPrice, float):
             data['lmtPrice'] = float(lmtPrice)
             
-        response = requests.post(endpoint.paper_place_option_orders(), json=data, headers=headers, timeout=self.wb.timeout)
+        response = await self.wb._aio.post(endpoint.paper_place_option_orders(), json=data, headers=headers, timeout=self.wb.timeout)
         if response.status_code != 200:
             raise Exception('place_option_order failed', response.status_code, response.reason)
-        
-        logger.info(f'{orderType} {action} order sent: {contract} @ ~{lmtPrice}')
+        seconds = time.perf_counter() - start
+        trace.observe('order.submit', seconds)
+        self.invalidate_account()
         response = response.json()
+        self._submitted(response, optionId, action, orderType, quant, lmtPrice, contract, seconds)
+        
+        logger.info('%s %s order sent: %s @ ~%s', orderType, action, contract, lmtPrice)
 
         if config.auto_cancel_order is True and tp_order is False:
-            from modules.manager import Manager
-            await Manager().check_order(response['orderId'], action, contract, optionId)
+            manager = self.manager
+            if manager is None:
+                from modules.context import AppContext
+                manager = AppContext.get().manager
+            await manager.check_order(response['orderId'], action, contract, optionId)
             return response
         
         return response
 
+    async def cancel_order(self, order_id):
+        ''' Cancel a paper account order. '''
+        headers = self.wb.build_req_headers()
+        response = await self.wb._aio.post(endpoint.paper_cancel_order(self.wb._account_id, order_id), headers=headers, timeout=self.wb.timeout)
+        self.invalidate_account()
+        return bool(response)
+
+    async def cancel_all_orders(self):
+        ''' Cancel every open paper trading order at once '''
+        open_orders = await self.get_current_orders(max_age=0)
+        await asyncio.gather(*[self.cancel_order(order['orderId']) for order in open_orders])
+        for order in open_orders:
+            logger.info('Order cancelled: %s', order['orderId'])
+
+    async def get_current_orders(self, max_age=None):
+        ''' Open paper trading orders '''
+        return (await self.get_snapshot(max_age)).open_orders
+
+    async def get_history_orders(self, status='All', count=20, action=''):
+        headers = self.wb.build_req_headers(include_trade_token=True, include_time=True)
+        response = await self.wb._aio.get(endpoint.paper_orders(self.wb._account_id, count, status, action), headers=headers, timeout=self.wb.timeout)
+        return response.json()
+
+    async def get_positions(self, max_age=None):
+        ''' Current positions in paper trading account. '''
+        return (await self.get_snapshot(max_age)).positions
+
+    async def get_portfolio(self, max_age=None):
+        ''' Numbers of the paper account '''
+        return dict((await self.get_snapshot(max_age)).portfolio)
+
+    async def get_buying_power(self, max_age=None):
+        return (await self.get_snapshot(max_age)).buying_power
+
+    async def get_account(self, max_age=None):
+        ''' Get important details of paper account, served from the account snapshot '''
+        return (await self.get_snapshot(max_age)).data
+
+    async def _fetch_account(self):
+        headers = self.wb.build_req_headers()
+        response = await self.wb._aio.get(endpoint.paper_account(self.wb._account_id), headers=headers, timeout=self.wb.timeout)
+        return response.json()
+
+class paper_webull(u):
+    async_class = async_paper_webull
+
+    def __init__(self, **kwargs) -> None:
+        self.wb = account(paper=True, **kwargs)
+        super().login(self.wb)
+
+    async def place_order_option(self, optionId, quant, lmtPrice=None, stpPrice=None, action=None, orderType='LMT', enforce='DAY', contract='Unknown', tp_order=False):
+        '''
+        create buy / sell order, see async_paper_webull.place_order_option
+        '''
+        return await self.aio.place_order_option(optionId, quant, lmtPrice, stpPrice, action, orderType, enforce, contract, tp_order)
+
     def place_order(self, stock=None, tId=None, price=0, action='BUY', orderType='LMT', enforce='GTC', quant=0, outsideRegularTradingHour=True):
         ''' Place a paper account order. '''
         if not tId is None:
@@ -87,7 +152,7 @@ class paper_webull(u):
         if orderType == 'MKT':
             data['outsideRegularTradingHour'] = False
 
-        response = requests.post(endpoint.paper_place_order(self.wb._account_id, tId), json=data, headers=headers, timeout=self.wb.timeout)
+        response = self.wb._transport.post(endpoint.paper_place_order(self.wb._account_id, tId), json=data, headers=headers, timeout=self.wb.timeout)
         return response.json()
 
     def modify_order(self, order, price=0, action='BUY', orderType='LMT', enforce='GTC', quant=0, outsideRegularTradingHour=True):
@@ -110,7 +175,7 @@ class paper_webull(u):
         else:
             data['quantity'] = int(quant)
 
-        response = requests.post(endpoint.paper_modify_order(self.wb._account_id, order['orderId']), json=data, headers=headers, timeout=self.wb.timeout)
+        response = self.wb._transport.post(endpoint.paper_modify_order(self.wb._account_id, order['orderId']), json=data, headers=headers, timeout=self.wb.timeout)
         if response:
             return True
         else:
@@ -119,34 +184,38 @@ class paper_webull(u):
         
     def cancel_order(self, order_id):
         ''' Cancel a paper account order. '''
-        headers = self.wb.build_req_headers()
-        response = requests.post(endpoint.paper_cancel_order(self.wb._account_id, order_id), headers=headers, timeout=self.wb.timeout)
-        return bool(response)
+        return run_sync(self.aio.cancel_order(order_id))
 
     def get_current_orders(self):
         ''' Open paper trading orders '''
-        return self.get_account()['openOrders']
+        return run_sync(self.aio.get_current_orders())
 
     def get_history_orders(self, status='All', count=20, action=''):
-        headers = self.wb.build_req_headers(include_trade_token=True, include_time=True)
-        response = requests.get(endpoint.paper_orders(self.wb._account_id, count, status, action), headers=headers, timeout=self.wb.timeout)
-        return response.json()
+        return run_sync(self.aio.get_history_orders(status, count, action))
 
     def get_positions(self):
         ''' Current positions in paper trading account. '''
+        return run_sync(self.aio.get_positions())
+
+    def get_portfolio(self):
+        ''' Numbers of the paper account '''
+        return run_sync(self.aio.get_portfolio())
+
+    def get_buying_power(self):
+        return run_sync(self.aio.get_buying_power())
 
-        return self.get_account()['positions']
+    def cancel_all_orders(self):
+        ''' Cancel every open paper trading order '''
+        return run_sync(self.aio.cancel_all_orders())
     
     def get_account(self):
         ''' Get important details of paper account '''
-        headers = self.wb.build_req_headers()
-        response = requests.get(endpoint.paper_account(self.wb._account_id), headers=headers, timeout=self.wb.timeout)
-        return response.json()
+        return run_sync(self.aio.get_account())
 
     def get_account_id(self):
         ''' Get paper account id: call this before paper account actions'''
         headers = self.wb.build_req_headers()
-        response = requests.get(endpoint.paper_account_id(), headers=headers, timeout=self.wb.timeout)
+        response = self.wb._transport.get(endpoint.paper_account_id(), headers=headers, timeout=self.wb.timeout)
         result = response.json()
         if result is not None and len(result) > 0 and 'id' in result[0]:
             id = result[0]['id']
@@ -158,14 +227,14 @@ class paper_webull(u):
     def get_social_posts(self, topic, num=100):
         headers = self.wb.build_req_headers()
 
-        response = requests.get(endpoint.social_posts(topic, num), headers=headers, timeout=self.wb.timeout)
+        response = self.wb._transport.get(endpoint.social_posts(topic, num), headers=headers, timeout=self.wb.timeout)
         result = response.json()
         return result
 
     def get_social_home(self, topic, num=100):
         headers = self.wb.build_req_headers()
 
-        response = requests.get(endpoint.social_home(topic, num), headers=headers, timeout=self.wb.timeout)
+        response = self.wb._transport.get(endpoint.social_home(topic, num), headers=headers, timeout=self.wb.timeout)
         result = response.json()
         return result
 
@@ -1,18 +1,109 @@
-import collections, requests, time
+import asyncio, collections, time
 
 from datetime import datetime, timedelta
-from pandas import DataFrame, to_datetime
 from pytz import timezone
 
 from ..utils.endpoints import urls
+from ..utils.async_transport import run_sync
+from ..utils.cache import option_chain
+from ..utils.bars import parse_bars
+from ..utils.orders import order_events
+from ..utils.quotes import quote_stream
+from ..utils.snapshot import account_cache
+from ..utils.flight import single_flight, coalesce
+
+from main import logger, config
 
 endpoint= urls()
 
-class utils:
-    def login(self, wb):
+class async_utils:
+    '''
+    Coroutine versions of the ticker, quote and option chain lookups.
+    Requests go through the account's async transport so any number of lookups can run on one loop.
+    Identical lookups in flight at the same time share one request, see self.flights.stats().
+    '''
+    def __init__(self, wb):
         self.wb = wb
+        self.flights = single_flight()
+        self.snapshots = account_cache.from_config(self._fetch_account, config.account_cache, self.flights)
+        # callables called with every placed order, e.g. the trade ledger and the RiskEngine
+        self.order_listeners = []
+        # Manager that follows the orders of this account, set by the Manager
+        self.manager = None
 
-    def get_ticker(self, stock=''):
+    def _submitted(self, response, optionId, action, orderType, quant, lmtPrice, contract, seconds):
+        '''
+        hand a placed order to every order listener, right after the request returned
+        '''
+        if not self.order_listeners:
+            return
+        data = response.get('data') if isinstance(response.get('data'), dict) else response
+        order = {
+            'orderId': data.get('orderId'),
+            'tickerId': optionId,
+            'action': action,
+            'orderType': orderType,
+            'quantity': quant,
+            'lmtPrice': lmtPrice if isinstance(lmtPrice, (int, float)) else None,
+            'contract': contract,
+            'seconds': seconds
+        }
+        for listener in self.order_listeners:
+            listener(order)
+
+    async def _fetch_account(self):
+        '''
+        raw get_account payload, implemented by the live and paper clients
+        '''
+        raise NotImplementedError
+
+    async def get_snapshot(self, max_age=None):
+        '''
+        account_snapshot shared by every account call, at most max_age (default account_cache ttl) seconds old
+        '''
+        return await self.snapshots.get(max_age)
+
+    def invalidate_account(self):
+        self.snapshots.invalidate()
+
+    async def get_position_index(self, max_age=None):
+        '''
+        positions of the account snapshot keyed by tickerId
+        '''
+        return (await self.get_snapshot(max_age)).index
+
+    async def get_ticker(self, stock=''):
+        '''
+        Lookup ticker_id, served from the ticker cache while the entry is fresh
+        '''
+        if stock and isinstance(stock, str):
+            ticker_id = self.wb._tickers.get(stock)
+            if ticker_id is not None:
+                return ticker_id
+
+        ticker_id = await self._lookup_ticker(stock)
+        self.wb._tickers.put(stock, ticker_id, save=False)
+        # the file is written in a worker thread, the lookup does not wait for the disk
+        asyncio.get_running_loop().run_in_executor(None, self.wb._tickers.save)
+        return ticker_id
+
+    async def seed_tickers(self, symbols):
+        '''
+        Resolve every symbol missing from the ticker cache at once, then save the cache
+        '''
+        missing = self.wb._tickers.missing(symbols)
+        if not missing:
+            return 0
+
+        ticker_ids = await asyncio.gather(*[self._lookup_ticker(symbol) for symbol in missing], return_exceptions=True)
+        for symbol, ticker_id in zip(missing, ticker_ids):
+            if not isinstance(ticker_id, Exception):
+                self.wb._tickers.put(symbol, ticker_id, save=False)
+        self.wb._tickers.save()
+        return len(missing)
+
+    @coalesce
+    async def _lookup_ticker(self, stock=''):
         '''
         Lookup ticker_id
         Ticker issue, will attempt to find an exact match, if none is found, match the first one
@@ -20,7 +111,7 @@ class utils:
         headers = self.wb.build_req_headers()
         ticker_id = 0
         if stock and isinstance(stock, str):
-            response = requests.get(endpoint.stock_id(stock, self.wb._region_code), headers=headers, timeout=self.wb.timeout)
+            response = await self.wb._aio.get(endpoint.stock_id(stock, self.wb._region_code), headers=headers, timeout=self.wb.timeout)
             result = response.json()
             if result.get('data') :
                 for item in result['data'] : # implies multiple tickers, but only assigns last one?
@@ -38,9 +129,9 @@ class utils:
             raise ValueError('Stock symbol is required')
         return ticker_id
 
-    def get_ticker_info(self, stock=None, tId=None):
+    @coalesce
+    async def get_quote(self, stock=None, tId=None):
         '''
-        Get stock public info
         get price quote
         tId: ticker ID str
         '''
@@ -48,82 +139,119 @@ class utils:
         if not stock and not tId:
             raise ValueError('Must provide a stock symbol or a stock id')
 
-        if stock :
+        if stock:
             try:
-                tId = str(self.get_ticker(stock))
+                tId = str(await self.get_ticker(stock))
             except ValueError as _e:
                 raise ValueError("Could not find ticker for stock {}".format(stock))
-        response = requests.get(endpoint.stock_detail(tId), headers=headers, timeout=self.wb.timeout)
+        response = await self.wb._aio.get(endpoint.quotes(tId), headers=headers, timeout=self.wb.timeout)
         result = response.json()
         return result
 
-    def get_all_tickers(self, region_code=None):
-        '''
-        Get all tickers from a region
-        region id: https://github.com/tedchou12/webull/wiki/What-is-the-region_id%3F
-        '''
-        headers = self.wb.build_req_headers()
-
-        if not region_code :
-            region_code = self.wb._region_code
-
-        response = requests.get(endpoint.get_all_tickers(region_code, region_code), headers=headers, timeout=self.wb.timeout)
-        result = response.json()
-        return result
+    # request options quotes
 
-    def get_quote(self, stock=None, tId=None):
+    @coalesce
+    async def get_option_quote(self, stock=None, tId=None, optionId=None):
         '''
-        get price quote
-        tId: ticker ID str
+        get option quote
         '''
-        headers = self.wb.build_req_headers()
         if not stock and not tId:
             raise ValueError('Must provide a stock symbol or a stock id')
 
         if stock:
             try:
-                tId = str(self.get_ticker(stock))
+                tId = str(await self.get_ticker(stock))
             except ValueError as _e:
                 raise ValueError("Could not find ticker for stock {}".format(stock))
-        response = requests.get(endpoint.quotes(tId), headers=headers, timeout=self.wb.timeout)
-        result = response.json()
-        return result
-    
-    # request options quotes
+        headers = self.wb.build_req_headers()
+        params = {'tickerId': tId, 'derivativeIds': optionId}
+        return (await self.wb._aio.get(endpoint.option_quotes(), params=params, headers=headers, timeout=self.wb.timeout)).json()
 
-    def get_option_quote(self, stock=None, tId=None, optionId=None):
+    async def get_option_quotes(self, optionIds, stock=None, tId=None, batch=50):
         '''
-        get option quote
+        get quotes of many options at once, the ids are sent comma separated
+        in as few requests as possible, batch ids per request, all requests concurrently
+        optionIds: option tickerIds
+        stock / tId: underlying, optional
+        returns {tickerId: quote}, ids without a quote are left out
         '''
-        if not stock and not tId:
-            raise ValueError('Must provide a stock symbol or a stock id')
-
         if stock:
             try:
-                tId = str(self.get_ticker(stock))
-            except ValueError as _e:
+                tId = str(await self.get_ticker(stock))
+            except ValueError:
                 raise ValueError("Could not find ticker for stock {}".format(stock))
+
+        ids = list(dict.fromkeys(int(i) for i in optionIds))
         headers = self.wb.build_req_headers()
-        params = {'tickerId': tId, 'derivativeIds': optionId}
-        return requests.get(endpoint.option_quotes(), params=params, headers=headers, timeout=self.wb.timeout).json()
 
-    def get_options_expiration_dates(self, stock=None, count=-1):
+        async def fetch(chunk):
+            params = {'tickerId': tId, 'derivativeIds': ','.join(map(str, chunk))}
+            return (await self.wb._aio.get(endpoint.option_quotes(), params=params, headers=headers, timeout=self.wb.timeout)).json()
+
+        results = await asyncio.gather(*[fetch(ids[i:i + batch]) for i in range(0, len(ids), batch)])
+        return {quote['tickerId']: quote for result in results for quote in result.get('data', [])}
+
+    @coalesce
+    async def _fetch_chains(self, ticker_id, expireDate=None):
         '''
-        returns a list of options expiration dates
+        Download the option chain into the chain cache.
+        With expireDate only that expiration is asked for and cached, without it
+        every expiration and the expiration date list are.
         '''
         headers = self.wb.build_req_headers()
-        data = {'count': count,
-                'direction': 'all',
-                'tickerId': self.get_ticker(stock)}
+        data = {'direction': 'all',
+                'tickerId': ticker_id}
+        if expireDate:
+            data['expireDate'] = expireDate
+        else:
+            data['count'] = -1
 
-        res = requests.post(endpoint.options_exp_dat_new(), json=data, headers=headers, timeout=self.wb.timeout).json()
-        r_data = []
+        res = (await self.wb._aio.post(endpoint.options_exp_dat_new(), json=data, headers=headers, timeout=self.wb.timeout)).json()
+        fetched = time.monotonic()
+        chains = {}
         for entry in res['expireDateList'] :
-            r_data.append(entry['from'])
+            date = str(entry['from']['date'])
+            if expireDate and date != expireDate:
+                continue
+            chain = option_chain(date, entry['data'], fetched)
+            self.wb._chains.put(ticker_id, chain)
+            chains[chain.expireDate] = chain
+
+        if not expireDate:
+            self.wb._chains.put_dates(ticker_id, [entry['from'] for entry in res['expireDateList']])
+        return chains
 
-        return r_data
+    async def get_options_expiration_dates(self, stock=None, count=-1):
+        '''
+        returns a list of options expiration dates
+        '''
+        ticker_id = await self.get_ticker(stock)
+        dates = self.wb._chains.get_dates(ticker_id)
+        if dates is None:
+            await self._fetch_chains(ticker_id)
+            dates = self.wb._chains.get_dates(ticker_id)
+        return dates if count == -1 else dates[:count]
 
-    def get_options(self, stock=None, count=-1, includeWeekly=1, direction='all', expireDate=None, queryAll=0):
+    async def get_option_chain(self, stock=None, expireDate=None):
+        '''
+        get one expiration of the option chain as an option_chain, served from the chain cache while fresh
+        params:
+            stock: symbol
+            expireDate: contract expire date, nearest expiration if None
+        '''
+        ticker_id = await self.get_ticker(stock)
+        if not expireDate:
+            dates = await self.get_options_expiration_dates(stock)
+            if not dates:
+                return option_chain(None, [])
+            expireDate = str(dates[0]['date'])
+
+        chain = self.wb._chains.get(ticker_id, expireDate)
+        if chain is None:
+            chain = (await self._fetch_chains(ticker_id, expireDate)).get(expireDate) or option_chain(expireDate, [])
+        return chain
+
+    async def get_options(self, stock=None, count=-1, includeWeekly=1, direction='all', expireDate=None, queryAll=0):
         '''
         get options and returns a dict of options contracts
         params:
@@ -134,50 +262,125 @@ class utils:
             expireDate: contract expire date
             queryAll: 0 (deprecated)
         '''
+        return (await self.get_option_chain(stock, expireDate)).rows(direction)
+
+    async def get_options_by_strike_and_expire_date(self, stock=None, expireDate=None, strike=None, direction='all'):
+        '''
+        get a list of options contracts by expire date and strike price
+        strike: string
+        '''
+        row = (await self.get_option_chain(stock, expireDate)).find(strike, direction)
+        return [row] if row else []
+
+    async def keep_chains_warm(self, symbols, expirations=1, interval=4):
+        '''
+        Refresh the nearest expirations of every symbol every interval seconds so entries hit a warm chain cache
+        '''
+        while True:
+            for symbol in symbols:
+                try:
+                    ticker_id = await self.get_ticker(symbol)
+                    dates = self.wb._chains.get_dates(ticker_id)
+                    if dates is None:
+                        await self._fetch_chains(ticker_id)
+                        continue
+                    await asyncio.gather(*[self._fetch_chains(ticker_id, str(d['date'])) for d in dates[:expirations]])
+                except Exception as e:
+                    logger.warning(f'Option chain refresh failed for {symbol}: {type(e).__name__} {e}')
+            await asyncio.sleep(interval)
+
+class utils:
+    async_class = async_utils
+
+    def login(self, wb):
+        self.wb = wb
+        self.aio = self.async_class(wb)
+        self.events = order_events(self.aio, poll_interval=config.frequency[0])
+        self.events.listeners.append(self.aio.snapshots.on_order_event)
+        self.quotes = quote_stream.from_config(self.aio, config.quotes)
+
+    def get_ticker(self, stock=''):
+        '''
+        Lookup ticker_id, blocking wrapper of async_utils.get_ticker
+        '''
+        return run_sync(self.aio.get_ticker(stock))
+
+    def get_ticker_info(self, stock=None, tId=None):
+        '''
+        Get stock public info
+        get price quote
+        tId: ticker ID str
+        '''
         headers = self.wb.build_req_headers()
-        # get next closet expiredate if none is provided
-        if not expireDate:
-            dates = self.get_options_expiration_dates(stock)
-            for d in dates:
-                expireDate = d['date']
-                break
+        if not stock and not tId:
+            raise ValueError('Must provide a stock symbol or a stock id')
 
-        data = {'count': count,
-                'direction': direction,
-                'tickerId': self.get_ticker(stock)}
+        if stock :
+            try:
+                tId = str(self.get_ticker(stock))
+            except ValueError:
+                raise ValueError("Could not find ticker for stock {}".format(stock))
+        response = self.wb._transport.get(endpoint.stock_detail(tId), headers=headers, timeout=self.wb.timeout)
+        result = response.json()
+        return result
 
-        res = requests.post(endpoint.options_exp_dat_new(), json=data, headers=headers, timeout=self.wb.timeout).json()
-        t_data = []
-        for entry in res['expireDateList'] :
-            if str(entry['from']['date']) == expireDate :
-                t_data = entry['data']
+    def get_all_tickers(self, region_code=None):
+        '''
+        Get all tickers from a region
+        region id: https://github.com/tedchou12/webull/wiki/What-is-the-region_id%3F
+        '''
+        headers = self.wb.build_req_headers()
+
+        if not region_code :
+            region_code = self.wb._region_code
 
-        r_data = {}
-        for entry in t_data :
-            if entry['strikePrice'] not in r_data :
-                r_data[entry['strikePrice']] = {}
-            r_data[entry['strikePrice']][entry['direction']] = entry
+        response = self.wb._transport.get(endpoint.get_all_tickers(region_code, region_code), headers=headers, timeout=self.wb.timeout)
+        result = response.json()
+        return result
+
+    def get_quote(self, stock=None, tId=None):
+        '''
+        get price quote, blocking wrapper of async_utils.get_quote
+        '''
+        return run_sync(self.aio.get_quote(stock, tId))
 
-        r_data = dict(sorted(r_data.items()))
+    # request options quotes
 
-        rr_data = []
-        for s_price in r_data :
-            rr_entry = {'strikePrice': s_price}
-            if 'call' in r_data[s_price] :
-                rr_entry['call'] = r_data[s_price]['call']
-            if 'put' in r_data[s_price] :
-                rr_entry['put'] = r_data[s_price]['put']
-            rr_data.append(rr_entry)
+    def get_option_quote(self, stock=None, tId=None, optionId=None):
+        '''
+        get option quote, blocking wrapper of async_utils.get_option_quote
+        '''
+        return run_sync(self.aio.get_option_quote(stock, tId, optionId))
 
-        return rr_data
+    def get_option_quotes(self, optionIds, stock=None, tId=None, batch=50):
+        '''
+        get quotes of many options at once, blocking wrapper of async_utils.get_option_quotes
+        '''
+        return run_sync(self.aio.get_option_quotes(optionIds, stock, tId, batch))
+
+    def get_options_expiration_dates(self, stock=None, count=-1):
+        '''
+        returns a list of options expiration dates, blocking wrapper of async_utils.get_options_expiration_dates
+        '''
+        return run_sync(self.aio.get_options_expiration_dates(stock, count))
+
+    def get_option_chain(self, stock=None, expireDate=None):
+        '''
+        get one expiration of the option chain, blocking wrapper of async_utils.get_option_chain
+        '''
+        return run_sync(self.aio.get_option_chain(stock, expireDate))
+
+    def get_options(self, stock=None, count=-1, includeWeekly=1, direction='all', expireDate=None, queryAll=0):
+        '''
+        get options, blocking wrapper of async_utils.get_options
+        '''
+        return run_sync(self.aio.get_options(stock, count, includeWeekly, direction, expireDate, queryAll))
 
     def get_options_by_strike_and_expire_date(self, stock=None, expireDate=None, strike=None, direction='all'):
         '''
-        get a list of options contracts by expire date and strike price
-        strike: string
+        get a list of options contracts by expire date and strike price, blocking wrapper of async_utils.get_options_by_strike_and_expire_date
         '''
-        opts = self.get_options(stock=stock, expireDate=expireDate, direction=direction)
-        return [c for c in opts if c['strikePrice'] == strike]
+        return run_sync(self.aio.get_options_by_strike_and_expire_date(stock, expireDate, strike, direction))
 
     # others
 
@@ -186,7 +389,7 @@ class utils:
         get if stock is tradable
         '''
         headers = self.wb.build_req_headers()
-        response = requests.get(endpoint.is_tradable(self.get_ticker(stock)), headers=headers, timeout=self.wb.timeout)
+        response = self.wb._transport.get(endpoint.is_tradable(self.get_ticker(stock)), headers=headers, timeout=self.wb.timeout)
 
         return response.json()
 
@@ -196,7 +399,7 @@ class utils:
         '''
         headers = self.wb.build_req_headers()
 
-        response = requests.get(endpoint.list_alerts(), headers=headers, timeout=self.wb.timeout)
+        response = self.wb._transport.get(endpoint.list_alerts(), headers=headers, timeout=self.wb.timeout)
         result = response.json()
         if 'data' in result:
             return result.get('data', [])
@@ -220,7 +423,7 @@ class utils:
                 rule['active'] = 'off'
             alert['eventWarningInput'] = alert['eventWarning']
 
-        response = requests.post(endpoint.remove_alert(), json=alert, headers=headers, timeout=self.wb.timeout)
+        response = self.wb._transport.post(endpoint.remove_alert(), json=alert, headers=headers, timeout=self.wb.timeout)
         if response.status_code != 200:
             raise Exception('alerts_remove failed', response.status_code, response.reason)
         return True
@@ -285,7 +488,7 @@ class utils:
         except Exception as e:
             print(f'failed to build alerts_add payload data. error: {e}')
 
-        response = requests.post(endpoint.add_alert(), json=data, headers=headers, timeout=self.wb.timeout)
+        response = self.wb._transport.post(endpoint.add_alert(), json=data, headers=headers, timeout=self.wb.timeout)
         if response.status_code != 200:
             raise Exception('alerts_add failed', response.status_code, response.reason)
         return True
@@ -299,7 +502,7 @@ class utils:
         '''
         headers = self.wb.build_req_headers()
 
-        response = requests.get(endpoint.active_gainers_losers(direction, self.wb._region_code, rank_type, count), headers=headers, timeout=self.wb.timeout)
+        response = self.wb._transport.get(endpoint.active_gainers_losers(direction, self.wb._region_code, rank_type, count), headers=headers, timeout=self.wb.timeout)
         result = response.json()
 
         return result
@@ -338,7 +541,7 @@ class utils:
             jdict['sort']['desc'] = 'true'
 
         # jdict = self._ddict2dict(jdict)
-        response = requests.post(endpoint.screener(), json=jdict, timeout=self.wb.timeout)
+        response = self.wb._transport.post(endpoint.screener(), json=jdict, timeout=self.wb.timeout)
         result = response.json()
         return result
 
@@ -347,7 +550,7 @@ class utils:
         get analysis info and returns a dict of analysis ratings
         '''
         headers = self.wb.build_req_headers()
-        return requests.get(endpoint.analysis(self.get_ticker(stock)), headers=headers, timeout=self.wb.timeout).json()
+        return self.wb._transport.get(endpoint.analysis(self.get_ticker(stock)), headers=headers, timeout=self.wb.timeout).json()
 
     def get_capital_flow(self, stock=None, tId=None, show_hist=True):
         '''
@@ -364,7 +567,7 @@ class utils:
             tId = self.get_ticker(stock)
         else:
             raise ValueError('Must provide a stock symbol or a stock id')
-        return requests.get(endpoint.analysis_capital_flow(tId, show_hist), headers=headers, timeout=self.wb.timeout).json()
+        return self.wb._transport.get(endpoint.analysis_capital_flow(tId, show_hist), headers=headers, timeout=self.wb.timeout).json()
 
     def get_etf_holding(self, stock=None, tId=None, has_num=0, count=50):
         '''
@@ -382,7 +585,7 @@ class utils:
             tId = self.get_ticker(stock)
         else:
             raise ValueError('Must provide a stock symbol or a stock id')
-        return requests.get(endpoint.analysis_etf_holding(tId, has_num, count), headers=headers, timeout=self.wb.timeout).json()
+        return self.wb._transport.get(endpoint.analysis_etf_holding(tId, has_num, count), headers=headers, timeout=self.wb.timeout).json()
 
     def get_institutional_holding(self, stock=None, tId=None):
         '''
@@ -398,7 +601,7 @@ class utils:
             tId = self.get_ticker(stock)
         else:
             raise ValueError('Must provide a stock symbol or a stock id')
-        return requests.get(endpoint.analysis_institutional_holding(tId), headers=headers, timeout=self.wb.timeout).json()
+        return self.wb._transport.get(endpoint.analysis_institutional_holding(tId), headers=headers, timeout=self.wb.timeout).json()
 
     def get_short_interest(self, stock=None, tId=None):
         '''
@@ -414,14 +617,14 @@ class utils:
             tId = self.get_ticker(stock)
         else:
             raise ValueError('Must provide a stock symbol or a stock id')
-        return requests.get(endpoint.analysis_shortinterest(tId), headers=headers, timeout=self.wb.timeout).json()
+        return self.wb._transport.get(endpoint.analysis_shortinterest(tId), headers=headers, timeout=self.wb.timeout).json()
 
     def get_financials(self, stock=None):
         '''
         get financials info and returns a dict of financial info
         '''
         headers = self.wb.build_req_headers()
-        return requests.get(endpoint.fundamentals(self.get_ticker(stock)), headers=headers, timeout=self.wb.timeout).json()
+        return self.wb._transport.get(endpoint.fundamentals(self.get_ticker(stock)), headers=headers, timeout=self.wb.timeout).json()
 
     def get_news(self, stock=None, tId=None, Id=0, items=20):
         '''
@@ -437,9 +640,9 @@ class utils:
             tId = self.get_ticker(stock)
         else:
             raise ValueError('Must provide a stock symbol or a stock id')
-        return requests.get(endpoint.news(tId, Id, items), headers=headers, timeout=self.wb.timeout).json()
+        return self.wb._transport.get(endpoint.news(tId, Id, items), headers=headers, timeout=self.wb.timeout).json()
 
-    def get_bars(self, stock=None, tId=None, interval='m1', count=1, extendTrading=0, timeStamp=None):
+    def get_bars(self, stock=None, tId=None, interval='m1', count=1, extendTrading=0, timeStamp=None, output='frame'):
         '''
         get bars returns a pandas dataframe
         params:
@@ -447,6 +650,7 @@ class utils:
             count: number of bars to return
             extendTrading: change to 1 for pre-market and afterhours bars
             timeStamp: If epoc timestamp is provided, return bar count up to timestamp. If not set default to current time.
+            output: frame (DataFrame), lazy (bars, DataFrame built on first access) or raw (dict of NumPy arrays)
         '''
         headers = self.wb.build_req_headers()
         if not tId is None:
@@ -461,32 +665,16 @@ class utils:
             timeStamp = int(time.time())
 
         params = {'extendTrading': extendTrading}
-        df = DataFrame(columns=['open', 'high', 'low', 'close', 'volume', 'vwap'])
-        df.index.name = 'timestamp'
-        response = requests.get(
+        response = self.wb._transport.get(
             endpoint.bars(tId, interval, count, timeStamp),
             params=params,
             headers=headers,
             timeout=self.wb.timeout,
         )
         result = response.json()
-        time_zone = timezone(result[0]['timeZone'])
-        for row in result[0]['data']:
-            row = row.split(',')
-            row = ['0' if value == 'null' else value for value in row]
-            data = {
-                'open': float(row[1]),
-                'high': float(row[3]),
-                'low': float(row[4]),
-                'close': float(row[2]),
-                'volume': float(row[6]),
-                'vwap': float(row[7])
-            }
-            #convert to a panda datetime64 which has extra features like floor and resample
-            df.loc[to_datetime(datetime.fromtimestamp(int(row[0])).astimezone(time_zone))] = data
-        return df.iloc[::-1]
+        return parse_bars(result, output)
 
-    def get_bars_crypto(self, stock=None, tId=None, interval='m1', count=1, extendTrading=0, timeStamp=None):
+    def get_bars_crypto(self, stock=None, tId=None, interval='m1', count=1, extendTrading=0, timeStamp=None, output='frame'):
         '''
         get bars returns a pandas dataframe
         params:
@@ -494,6 +682,7 @@ class utils:
             count: number of bars to return
             extendTrading: change to 1 for pre-market and afterhours bars
             timeStamp: If epoc timestamp is provided, return bar count up to timestamp. If not set default to current time.
+            output: frame (DataFrame), lazy (bars, DataFrame built on first access) or raw (dict of NumPy arrays)
         '''
         headers = self.wb.build_req_headers()
         if not tId is None:
@@ -504,27 +693,11 @@ class utils:
             raise ValueError('Must provide a stock symbol or a stock id')
 
         params = {'type': interval, 'count': count, 'extendTrading': extendTrading, 'timestamp': timeStamp}
-        df = DataFrame(columns=['open', 'high', 'low', 'close', 'volume', 'vwap'])
-        df.index.name = 'timestamp'
-        response = requests.get(endpoint.bars_crypto(tId), params=params, headers=headers, timeout=self.wb.timeout)
+        response = self.wb._transport.get(endpoint.bars_crypto(tId), params=params, headers=headers, timeout=self.wb.timeout)
         result = response.json()
-        time_zone = timezone(result[0]['timeZone'])
-        for row in result[0]['data']:
-            row = row.split(',')
-            row = ['0' if value == 'null' else value for value in row]
-            data = {
-                'open': float(row[1]),
-                'high': float(row[3]),
-                'low': float(row[4]),
-                'close': float(row[2]),
-                'volume': float(row[6]),
-                'vwap': float(row[7])
-            }
-            #convert to a panda datetime64 which has extra features like floor and resample
-            df.loc[to_datetime(datetime.fromtimestamp(int(row[0])).astimezone(time_zone))] = data
-        return df.iloc[::-1]
+        return parse_bars(result, output)
 
-    def get_options_bars(self, derivativeId=None, interval='1m', count=1, direction=1, timeStamp=None):
+    def get_options_bars(self, derivativeId=None, interval='1m', count=1, direction=1, timeStamp=None, output='frame'):
         '''
         get bars returns a pandas dataframe
         params:
@@ -534,34 +707,19 @@ class utils:
             direction: 1 ignores {count} parameter & returns all bars on and after timestamp
                        setting any other value will ignore timestamp & return latest {count} bars
             timeStamp: If epoc timestamp is provided, return bar count up to timestamp. If not set default to current time.
+            output: frame (DataFrame), lazy (bars, DataFrame built on first access) or raw (dict of NumPy arrays)
         '''
         headers = self.wb.build_req_headers()
         if derivativeId is None:
             raise ValueError('Must provide a derivative ID')
 
         params = {'type': interval, 'count': count, 'direction': direction, 'timestamp': timeStamp}
-        df = DataFrame(columns=['open', 'high', 'low', 'close', 'volume', 'vwap'])
-        df.index.name = 'timestamp'
-        response = requests.get(endpoint.options_bars(derivativeId), params=params, headers=headers, timeout=self.wb.timeout)
+        response = self.wb._transport.get(endpoint.options_bars(derivativeId), params=params, headers=headers, timeout=self.wb.timeout)
         result = response.json()
-        time_zone = timezone(result[0]['timeZone'])
-        for row in result[0]['data'] :
-            row = row.split(',')
-            row = ['0' if value == 'null' else value for value in row]
-            data = {
-                'open': float(row[1]),
-                'high': float(row[3]),
-                'low': float(row[4]),
-                'close': float(row[2]),
-                'volume': float(row[6]),
-                'vwap': float(row[7])
-            }
-            #convert to a panda datetime64 which has extra features like floor and resample
-            df.loc[to_datetime(datetime.fromtimestamp(int(row[0])).astimezone(time_zone))] = data
-        return df.iloc[::-1]
+        return parse_bars(result, output)
 
     def get_chart_data(self, stock=None, tId=None, ma=5, timestamp=None):
-        bars = self.get_bars(stock=stock, tId=tId, interval='d1', count=1200, timestamp=timestamp)
+        bars = self.get_bars(stock=stock, tId=tId, interval='d1', count=1200, timeStamp=timestamp)
         ma_data = bars['close'].rolling(ma).mean()
         return ma_data.dropna()
 
@@ -584,7 +742,7 @@ class utils:
             raise ValueError('Must provide a stock symbol or a stock id')
 
         params = {'type': 'm1', 'count': 1, 'extendTrading': 0}
-        response = requests.get(endpoint.bars(tId), params=params, headers=headers, timeout=self.wb.timeout)
+        response = self.wb._transport.get(endpoint.bars(tId), params=params, headers=headers, timeout=self.wb.timeout)
         result = response.json()
         time_zone = timezone(result[0]['timeZone'])
         last_trade_date = datetime.fromtimestamp(int(result[0]['data'][0].split(',')[0])).astimezone(time_zone)
@@ -619,7 +777,7 @@ class utils:
         ''' Return account's incoming dividend info '''
         headers = self.wb.build_req_headers()
         data = {}
-        response = requests.post(endpoint.dividends(self.wb._account_id), json=data, headers=headers, timeout=self.wb.timeout)
+        response = self.wb._transport.post(endpoint.dividends(self.wb._account_id), json=data, headers=headers, timeout=self.wb.timeout)
         return response.json()
 
     def get_five_min_ranking(self, extendTrading=0):
@@ -629,7 +787,7 @@ class utils:
         rank = []
         headers = self.wb.build_req_headers()
         params = {'regionId': self.wb._region_code, 'userRegionId': self.wb._region_code, 'platform': 'pc', 'limitCards': 'latestActivityPc'}
-        response = requests.get(endpoint.rankings(), params=params, headers=headers, timeout=self.wb.timeout)
+        response = self.wb._transport.get(endpoint.rankings(), params=params, headers=headers, timeout=self.wb.timeout)
         result = response.json()[0].get('data')
         if extendTrading:
             for data in result:
@@ -647,7 +805,7 @@ class utils:
         """
         headers = self.wb.build_req_headers()
         params = {'version': 0}
-        response = requests.get(endpoint.portfolio_lists(), params=params, headers=headers, timeout=self.wb.timeout)
+        response = self.wb._transport.get(endpoint.portfolio_lists(), params=params, headers=headers, timeout=self.wb.timeout)
 
         if not as_list_symbols :
             return response.json()['portfolioList']
@@ -680,7 +838,7 @@ class utils:
         else:
             raise ValueError('Must provide a stock symbol or a stock id')
         headers = self.wb.build_req_headers()
-        response = requests.get(endpoint.press_releases(tId, typeIds, num), headers=headers, timeout=self.wb.timeout)
+        response = self.wb._transport.get(endpoint.press_releases(tId, typeIds, num), headers=headers, timeout=self.wb.timeout)
         result = response.json()
 
         return result
@@ -694,7 +852,7 @@ class utils:
         if start_date is None:
             start_date = datetime.today().strftime('%Y-%m-%d')
         headers = self.wb.build_req_headers()
-        response = requests.get(endpoint.calendar_events(event, self.wb._region_code, start_date, page, num), headers=headers, timeout=self.wb.timeout)
+        response = self.wb._transport.get(endpoint.calendar_events(event, self.wb._region_code, start_date, page, num), headers=headers, timeout=self.wb.timeout)
         result = response.json()
 
         return result
@@ -1,10 +1,15 @@
-import getpass, hashlib, os, pickle, requests, time, uuid, urllib.parse, sys
+import getpass, hashlib, os, pickle, time, uuid, urllib.parse, sys
 from datetime import datetime
+from types import MappingProxyType
 from email_validator import validate_email, EmailNotValidError
 
 from . import endpoints
+from .transport import transport
+from .async_transport import async_transport
+from .cache import ticker_cache, chain_cache
+from .session import tokens, token_cache
 
-from main import logger
+from main import logger, config
 
 class account:
     def __init__(self, paper=False, **kwargs):
@@ -19,14 +24,27 @@ class account:
         save_token = kwargs.get('save_token', False)
         token_path = kwargs.get('token_path', None)
         region_code = kwargs.get('region_code', None)
+        restore = kwargs.get('restore', True)
         self.paper = paper
+        self._username = username
+        self._pin = pin
+        self._tokens = tokens()
+
+        # saved session tokens, pass session=... to keep them somewhere else
+        self._session = kwargs.get('session', None) or token_cache.from_config(config.session)
+
+        # pooled http transport, pass transport=... to point the account somewhere else
+        self._transport = kwargs.get('transport', None) or transport.from_config(config.transport)
+        self._aio = async_transport.like(self._transport)
+
+        # symbol -> tickerId cache, pass tickers=... to share one between accounts
+        self._tickers = kwargs.get('tickers', None) or ticker_cache.from_config(config.ticker_cache)
+        self._chains = kwargs.get('chains', None) or chain_cache.from_config(config.option_cache)
 
         if did: self._set_did(did)
-        if pin: self.get_trade_token(pin)
         
-        # session
-        self._session = requests.session()
-        self._headers = {
+        # session, never written, build_req_headers copies it
+        self._headers = MappingProxyType({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:99.0) Gecko/20100101 Firefox/99.0',
             'Accept': '*/*',
             'Accept-Encoding': 'gzip, deflate',
@@ -44,24 +62,28 @@ class account:
             'locale': 'eng',
             'device-type': 'Web',
             'did': self._get_did()
-        }
+        })
+        self._base_headers = None
 
         # endpoints
         self._urls = endpoints.urls()
 
         # account info
         self._account_id = ''
-        self._trade_token = ''
-        self._access_token = ''
-        self._refresh_token = ''
-        self._token_expire = ''
-        self._uuid = ''
 
         # misc
         self._did = self._get_did()
         self._region_code = region_code or 6
         self.zone_var = 'dc_core_r001'
-        self.timeout = 15
+        self.timeout = self._transport.timeout
+
+        # warm start, the saved tokens are used while they have not expired
+        cached = self._session.load(username, paper) if restore else None
+        if cached is not None and cached.fresh(config.session['refresh_margin']) and cached.account_id and (cached.trade_token or not pin):
+            self._tokens = cached
+            self._account_id = cached.account_id
+            self.zone_var = cached.zone_var
+            return logger.info('Webull session restored')
 
         # with webull md5 hash salted
         password = ('wl_app-a&b@!423^' + password).encode('utf-8')
@@ -94,14 +116,14 @@ class account:
         if question_id != '' and question_answer != '' :
             data['accessQuestions'] = '[{"questionId":"' + str(question_id) + '", "answer":"' + str(question_answer) + '"}]'
 
-        response = requests.post(self._urls.login(), json=data, headers=headers, timeout=self.timeout)
+        response = self._transport.post(self._urls.login(), json=data, headers=headers, timeout=self.timeout)
         result = response.json()
         if 'accessToken' in result and result['accessToken']:
-            self._access_token = result['accessToken']
-            self._refresh_token = result['refreshToken']
-            self._token_expire = result['tokenExpireTime']
-            self._uuid = result['uuid']
+            self._tokens = tokens(result['accessToken'], result['refreshToken'], result['tokenExpireTime'], result['uuid'])
             self._account_id = self.get_account_id()
+            # the trade token needs the logged in session
+            if pin: self.get_trade_token(pin)
+            self.save_session()
             if save_token:
                 self._save_token(result, token_path)
             return logger.info('Webull successfully logged in')
@@ -156,21 +178,79 @@ class account:
             pickle.dump(did, file)
         return True
 
+    # token attributes read the current tokens, assigning one swaps in a new tokens object
+    @property
+    def _access_token(self):
+        return self._tokens.access_token
+
+    @_access_token.setter
+    def _access_token(self, value):
+        self._tokens = self._tokens.replace(access_token=value)
+
+    @property
+    def _refresh_token(self):
+        return self._tokens.refresh_token
+
+    @_refresh_token.setter
+    def _refresh_token(self, value):
+        self._tokens = self._tokens.replace(refresh_token=value)
+
+    @property
+    def _token_expire(self):
+        return self._tokens.token_expire
+
+    @_token_expire.setter
+    def _token_expire(self, value):
+        self._tokens = self._tokens.replace(token_expire=value)
+
+    @property
+    def _uuid(self):
+        return self._tokens.uuid
+
+    @_uuid.setter
+    def _uuid(self, value):
+        self._tokens = self._tokens.replace(uuid=value)
+
+    @property
+    def _trade_token(self):
+        return self._tokens.trade_token
+
+    @_trade_token.setter
+    def _trade_token(self, value):
+        self._tokens = self._tokens.replace(trade_token=value)
+
+    def save_session(self):
+        '''
+        keep the current tokens for the next start
+        '''
+        self._session.save(self._username, self.paper, self._tokens.replace(account_id=self._account_id, zone_var=self.zone_var))
+
+    def _session_headers(self):
+        '''
+        static headers with the fields of the current session, built once per tokens / zone
+        '''
+        session = self._tokens
+        base = self._base_headers
+        if base is None or base[0] is not session or base[1] != self.zone_var or base[2]['did'] != self._did:
+            headers = MappingProxyType({**self._headers, 'did': self._did, 'access_token': session.access_token, 'lzone': self.zone_var})
+            base = self._base_headers = (session, self.zone_var, headers)
+        return base
+
     def build_req_headers(self, include_trade_token=False, include_time=False, include_zone_var=True):
         '''
-        Build default set of header params
+        Build default set of header params.
+        Every call gets its own dict: a copy of the precomputed session headers with the
+        per request fields on top, so concurrent requests never see each other's reqid.
         '''
-        headers = self._headers
-        req_id = str(uuid.uuid4().hex)
-        headers['reqid'] = req_id
-        headers['did'] = self._did
-        headers['access_token'] = self._access_token
+        session, _, base = self._session_headers()
+        headers = dict(base)
+        headers['reqid'] = uuid.uuid4().hex
         if include_trade_token :
-            headers['t_token'] = self._trade_token
+            headers['t_token'] = session.trade_token
         if include_time :
             headers['t_time'] = str(round(time.time() * 1000))
-        if include_zone_var :
-            headers['lzone'] = self.zone_var
+        if not include_zone_var :
+            headers['lzone'] = self._headers['lzone']
         return headers
 
     def get_mfa(self, username='') :
@@ -180,7 +260,7 @@ class account:
                 'accountType': str(account_type),
                 'codeType': int(5)}
 
-        response = requests.post(self._urls.get_mfa(), json=data, headers=self._headers, timeout=self.timeout)
+        response = self._transport.post(self._urls.get_mfa(), json=data, headers=self._headers, timeout=self.timeout)
         # data = response.json()
 
         if response.status_code == 200 :
@@ -196,7 +276,7 @@ class account:
                 'code': str(mfa),
                 'codeType': int(5)}
 
-        response = requests.post(self._urls.check_mfa(), json=data, headers=self._headers, timeout=self.timeout)
+        response = self._transport.post(self._urls.check_mfa(), json=data, headers=self._headers, timeout=self.timeout)
         data = response.json()
 
         return data
@@ -207,10 +287,10 @@ class account:
 
         # seems like webull has a bug/stability issue here:
         time = datetime.now().timestamp() * 1000
-        response = requests.get(self._urls.get_security(username, account_type, self._region_code, 'PRODUCT_LOGIN', time, 0), headers=self._headers, timeout=self.timeout)
+        response = self._transport.get(self._urls.get_security(username, account_type, self._region_code, 'PRODUCT_LOGIN', time, 0), headers=self._headers, timeout=self.timeout)
         data = response.json()
         if len(data) == 0 :
-            response = requests.get(self._urls.get_security(username, account_type, self._region_code, 'PRODUCT_LOGIN', time, 1), headers=self._headers, timeout=self.timeout)
+            response = self._transport.get(self._urls.get_security(username, account_type, self._region_code, 'PRODUCT_LOGIN', time, 1), headers=self._headers, timeout=self.timeout)
             data = response.json()
 
         return data
@@ -221,10 +301,10 @@ class account:
 
         # seems like webull has a bug/stability issue here:
         time = datetime.now().timestamp() * 1000
-        response = requests.get(self._urls.next_security(username, account_type, self._region_code, 'PRODUCT_LOGIN', time, 0), headers=self._headers, timeout=self.timeout)
+        response = self._transport.get(self._urls.next_security(username, account_type, self._region_code, 'PRODUCT_LOGIN', time, 0), headers=self._headers, timeout=self.timeout)
         data = response.json()
         if len(data) == 0 :
-            response = requests.get(self._urls.next_security(username, account_type, self._region_code, 'PRODUCT_LOGIN', time, 1), headers=self._headers, timeout=self.timeout)
+            response = self._transport.get(self._urls.next_security(username, account_type, self._region_code, 'PRODUCT_LOGIN', time, 1), headers=self._headers, timeout=self.timeout)
             data = response.json()
 
         return data
@@ -237,7 +317,7 @@ class account:
                 'answerList': [{'questionId': str(question_id), 'answer': str(question_answer)}],
                 'event': 'PRODUCT_LOGIN'}
 
-        response = requests.post(self._urls.check_security(), json=data, headers=self._headers, timeout=self.timeout)
+        response = self._transport.post(self._urls.check_security(), json=data, headers=self._headers, timeout=self.timeout)
         data = response.json()
 
         return data
@@ -257,14 +337,11 @@ class account:
         End login session
         '''
         headers = self.build_req_headers()
-        response = requests.get(self._urls.logout(), headers=headers, timeout=self.timeout)
+        response = self._transport.get(self._urls.logout(), headers=headers, timeout=self.timeout)
         return response.status_code
 
     def api_login(self, access_token='', refresh_token='', token_expire='', uuid='', mfa=''):
-        self._access_token = access_token
-        self._refresh_token = refresh_token
-        self._token_expire = token_expire
-        self._uuid = uuid
+        self._tokens = tokens(access_token, refresh_token, token_expire, uuid, self._trade_token)
         self._account_id = self.get_account_id()
 
     def refresh_login(self, save_token=False, token_path=None):
@@ -274,18 +351,29 @@ class account:
         headers = self.build_req_headers()
         data = {'refreshToken': self._refresh_token}
 
-        response = requests.post(self._urls.refresh_login(self._refresh_token), json=data, headers=headers, timeout=self.timeout)
+        response = self._transport.post(self._urls.refresh_login(self._refresh_token), json=data, headers=headers, timeout=self.timeout)
         result = response.json()
         if 'accessToken' in result and result['accessToken'] != '' and result['refreshToken'] != '' and result['tokenExpireTime'] != '':
-            self._access_token = result['accessToken']
-            self._refresh_token = result['refreshToken']
-            self._token_expire = result['tokenExpireTime']
-            self._account_id = self.get_account_id()
+            # one swap, a request never sends the new access token with the old refresh state or the other way round
+            self._tokens = self._tokens.replace(access_token=result['accessToken'], refresh_token=result['refreshToken'], token_expire=result['tokenExpireTime'])
             if save_token:
                 result['uuid'] = self._uuid
                 self._save_token(result, token_path)
         return result
 
+    def refresh_session(self):
+        '''
+        Refresh the access token, then the trade token, and save both for the next start.
+        True when the access token was refreshed.
+        '''
+        result = self.refresh_login()
+        if not result.get('accessToken'):
+            return False
+        if self._pin:
+            self.get_trade_token(self._pin)
+        self.save_session()
+        return True
+
     def _save_token(self, token=None, path=None):
         '''
         save login token to webull_credentials.json
@@ -304,7 +392,7 @@ class account:
         '''
         headers = self.build_req_headers()
 
-        response = requests.get(self._urls.user(), headers=headers, timeout=self.timeout)
+        response = self._transport.get(self._urls.user(), headers=headers, timeout=self.timeout)
         result = response.json()
 
         return result
@@ -316,7 +404,7 @@ class account:
         '''
         if self.paper is True:
             headers = self.build_req_headers()
-            response = requests.get(self._urls.paper_account_id(), headers=headers, timeout=self.timeout)
+            response = self._transport.get(self._urls.paper_account_id(), headers=headers, timeout=self.timeout)
             result = response.json()
             if result is not None and len(result) > 0 and 'id' in result[0]:
                 id = result[0]['id']
@@ -326,7 +414,7 @@ class account:
                 return None
         else:
             headers = self.build_req_headers()
-            response = requests.get(self._urls.account_id(), headers=headers, timeout=self.timeout)
+            response = self._transport.get(self._urls.account_id(), headers=headers, timeout=self.timeout)
             result = response.json()
             if result['success'] and len(result['data']) > 0 :
                 self.zone_var = str(result['data'][int(id)]['rzone'])
@@ -347,7 +435,7 @@ class account:
         md5_hash = hashlib.md5(password)
         data = {'pwd': md5_hash.hexdigest()}
 
-        response = requests.post(self._urls.trade_token(), json=data, headers=headers, timeout=self.timeout)
+        response = self._transport.post(self._urls.trade_token(), json=data, headers=headers, timeout=self.timeout)
         result = response.json()
         if 'tradeToken' in result :
             self._trade_token = result['tradeToken']
@@ -0,0 +1,118 @@
+import asyncio, json, threading, weakref, aiohttp
+
+from .trace import trace
+
+class response:
+    '''
+    Fully read reply of an async request. Mirrors the parts of requests.Response the api uses
+    '''
+    __slots__ = ('status_code', 'reason', 'content')
+
+    def __init__(self, status_code, reason, content):
+        self.status_code = status_code
+        self.reason = reason
+        self.content = content
+
+    def __bool__(self):
+        return self.status_code < 400
+
+    def json(self):
+        return json.loads(self.content)
+
+class async_transport:
+    '''
+    Pooled keep-alive aiohttp transport, the async twin of transport.
+
+    aiohttp sessions are bound to the loop that created them, so one session
+    (with its own per-host connection pool) is kept for every running loop.
+    '''
+    def __init__(self, pool_connections=16, pool_maxsize=10, timeout=15, base_url=None, resolve=None):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.base_url = base_url
+        self._resolve = resolve
+        self._sessions = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def like(cls, sync_transport):
+        '''
+        Build an async transport with the same pool, timeout and base_url settings as a sync transport
+        '''
+        return cls(
+            pool_connections=sync_transport.pool_connections,
+            pool_maxsize=sync_transport.pool_maxsize,
+            timeout=sync_transport.timeout,
+            base_url=sync_transport.base_url,
+            resolve=sync_transport.resolve
+        )
+
+    def resolve(self, url):
+        return self._resolve(url) if self._resolve else url
+
+    @property
+    def session(self):
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_connections * self.pool_maxsize,
+                limit_per_host=self.pool_maxsize,
+                ttl_dns_cache=300
+            )
+            session = aiohttp.ClientSession(connector=connector)
+            self._sessions[loop] = session
+        return session
+
+    async def request(self, method, url, params=None, json=None, headers=None, timeout=None):
+        timeout = aiohttp.ClientTimeout(total=timeout or self.timeout)
+        if params:
+            params = {key: str(value) for key, value in params.items() if value is not None}
+
+        with trace.span(f'http.{getattr(url, "name", None) or "other"}'):
+            async with self.session.request(method, self.resolve(url), params=params, json=json, headers=headers, timeout=timeout) as resp:
+                return response(resp.status, resp.reason, await resp.read())
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request('POST', url, **kwargs)
+
+    async def close(self):
+        '''
+        Close the session of the running loop
+        '''
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.close()
+
+class _loop_thread:
+    '''
+    Event loop running forever in a daemon thread. The blocking api wrappers
+    submit their coroutines here, so they work with or without a running loop.
+    '''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+
+    @property
+    def loop(self):
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name='wecli-sync-bridge', daemon=True).start()
+                    self._loop = loop
+        return self._loop
+
+    def run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+_bridge = _loop_thread()
+
+def run_sync(coro):
+    '''
+    Run a coroutine to completion from blocking code and return its result
+    '''
+    return _bridge.run(coro)
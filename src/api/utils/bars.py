@@ -0,0 +1,70 @@
+import numpy as np
+from pandas import DataFrame, DatetimeIndex, to_datetime
+
+# bar rows come as 'timestamp,open,close,high,low,preClose,volume,vwap'
+COLUMNS = {'open': 1, 'high': 3, 'low': 4, 'close': 2, 'volume': 6, 'vwap': 7}
+
+class bars:
+    '''
+    Columnar bars of a chart response, oldest first.
+    Columns are NumPy arrays, the DataFrame is only built the first time .frame is read.
+    '''
+    __slots__ = ('timestamp', 'columns', 'time_zone', '_frame')
+
+    def __init__(self, timestamp, columns, time_zone):
+        self.timestamp = timestamp
+        self.columns = columns
+        self.time_zone = time_zone
+        self._frame = None
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    def __getitem__(self, name):
+        return self.timestamp if name == 'timestamp' else self.columns[name]
+
+    @property
+    def index(self):
+        '''
+        timestamps as a timezone aware DatetimeIndex, converted in one step
+        '''
+        return DatetimeIndex(to_datetime(self.timestamp, unit='s', utc=True).tz_convert(self.time_zone), name='timestamp')
+
+    @property
+    def frame(self):
+        if self._frame is None:
+            self._frame = DataFrame(self.columns, index=self.index, columns=list(COLUMNS))
+        return self._frame
+
+def parse_bars(result, output='frame'):
+    '''
+    Parse the first series of a get_bars / get_bars_crypto / get_options_bars response
+    output:
+        frame: pandas DataFrame indexed by timestamp (same as before)
+        lazy: bars object, DataFrame built on first access
+        raw: dict of NumPy arrays, timestamp in epoch seconds
+    '''
+    series = result[0]
+    rows = series['data']
+    time_zone = series['timeZone']
+
+    if rows:
+        flat = ','.join(rows).replace('null', '0').split(',')
+        try:
+            table = np.asarray(flat, dtype=np.float64).reshape(len(rows), -1)[::-1]
+        except ValueError:
+            # rows of different lengths, pad them one by one
+            width = max(row.count(',') for row in rows) + 1
+            table = np.array([(row.replace('null', '0').split(',') + ['0'] * width)[:width] for row in rows], dtype=np.float64)[::-1]
+    else:
+        table = np.empty((0, max(COLUMNS.values()) + 1), dtype=np.float64)
+
+    timestamp = table[:, 0].astype(np.int64)
+    columns = {name: np.ascontiguousarray(table[:, i]) for name, i in COLUMNS.items()}
+    parsed = bars(timestamp, columns, time_zone)
+
+    if output == 'raw':
+        return {'timestamp': timestamp, **columns}
+    if output == 'lazy':
+        return parsed
+    return parsed.frame
@@ -0,0 +1,258 @@
+import bisect, json, os, threading, time
+
+class ticker_cache:
+    '''
+    symbol -> tickerId cache with a ttl.
+    Entries are saved to a json file so a restart does not have to look them up again.
+
+    path: json file to persist to, None keeps the cache in memory only
+    ttl: seconds an entry is trusted before it is looked up again
+    '''
+    def __init__(self, path=None, ttl=86400):
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    @classmethod
+    def from_config(cls, settings):
+        return cls(path=settings['path'], ttl=settings['ttl'])
+
+    def get(self, symbol):
+        entry = self._entries.get(symbol)
+        if entry is not None and time.time() - entry[1] < self.ttl:
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        return None
+
+    def put(self, symbol, ticker_id, save=True):
+        self._entries[symbol] = (ticker_id, time.time())
+        if save:
+            self.save()
+
+    def missing(self, symbols):
+        '''
+        symbols without a fresh entry, does not count as hits or misses
+        '''
+        now = time.time()
+        return [s for s in symbols if s not in self._entries or now - self._entries[s][1] >= self.ttl]
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as file:
+                self._entries = {symbol: tuple(entry) for symbol, entry in json.load(file).items()}
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            # copy first, save may run in a worker thread while the loop adds entries
+            entries = dict(self._entries)
+            # write then rename so a crash never leaves half a file behind
+            tmp_path = f'{self.path}.tmp'
+            with open(tmp_path, 'w') as file:
+                json.dump(entries, file)
+            os.replace(tmp_path, self.path)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0
+        }
+
+class option_contract:
+    '''
+    Compact option contract, keeps only the fields the program reads from a chain entry
+    '''
+    __slots__ = ('tickerId', 'symbol', 'strikePrice', 'direction', 'expireDate', 'ask', 'askVolume', 'bid', 'bidVolume', 'close', 'volume', 'openInterest', 'impVol', 'delta')
+
+    def __init__(self, entry):
+        ask = (entry.get('askList') or [{}])[0]
+        bid = (entry.get('bidList') or [{}])[0]
+        self.tickerId = entry['tickerId']
+        self.symbol = entry.get('symbol')
+        self.strikePrice = entry['strikePrice']
+        self.direction = entry['direction']
+        self.expireDate = entry.get('expireDate')
+        self.ask = ask.get('price')
+        self.askVolume = ask.get('volume')
+        self.bid = bid.get('price')
+        self.bidVolume = bid.get('volume')
+        self.close = entry.get('close')
+        self.volume = entry.get('volume')
+        self.openInterest = entry.get('openInterest')
+        self.impVol = entry.get('impVol')
+        self.delta = entry.get('delta')
+
+    def to_dict(self):
+        '''
+        The kept fields in the shape of a raw chain entry, only the best ask and bid are in askList/bidList
+        '''
+        return {
+            'tickerId': self.tickerId,
+            'symbol': self.symbol,
+            'strikePrice': self.strikePrice,
+            'direction': self.direction,
+            'expireDate': self.expireDate,
+            'askList': [{'price': self.ask, 'volume': self.askVolume}] if self.ask is not None else [],
+            'bidList': [{'price': self.bid, 'volume': self.bidVolume}] if self.bid is not None else [],
+            'close': self.close,
+            'volume': self.volume,
+            'openInterest': self.openInterest,
+            'impVol': self.impVol,
+            'delta': self.delta
+        }
+
+class option_chain:
+    '''
+    One expiration of an option chain indexed by strike.
+    Exact strike lookups are a dict hit, nearest strike lookups a bisect over the sorted strikes.
+    '''
+    __slots__ = ('expireDate', 'strikes', 'prices', 'index', 'calls', 'puts', 'fetched')
+
+    def __init__(self, expireDate, entries, fetched=None):
+        rows = {}
+        for entry in entries:
+            rows.setdefault(float(entry['strikePrice']), {})[entry['direction']] = option_contract(entry)
+
+        self.expireDate = expireDate
+        self.prices = sorted(rows)
+        self.strikes = []
+        self.calls = []
+        self.puts = []
+        for price in self.prices:
+            contract = rows[price].get('call') or rows[price].get('put')
+            self.strikes.append(contract.strikePrice)
+            self.calls.append(rows[price].get('call'))
+            self.puts.append(rows[price].get('put'))
+        self.index = {price: i for i, price in enumerate(self.prices)}
+        self.fetched = time.monotonic() if fetched is None else fetched
+
+    def __len__(self):
+        return len(self.prices)
+
+    def _row(self, i, direction='all'):
+        row = {'strikePrice': self.strikes[i]}
+        if direction in ('all', 'call') and self.calls[i] is not None:
+            row['call'] = self.calls[i].to_dict()
+        if direction in ('all', 'put') and self.puts[i] is not None:
+            row['put'] = self.puts[i].to_dict()
+        return row
+
+    def find(self, strike, direction='all'):
+        '''
+        row of an exact strike or None, strike can be a string or a number
+        '''
+        try:
+            i = self.index.get(float(strike))
+        except (TypeError, ValueError):
+            return None
+        return None if i is None else self._row(i, direction)
+
+    def nearest(self, price, count=1, direction='all'):
+        '''
+        rows of the count strikes closest to price, ordered by strike
+        '''
+        if not self.prices:
+            return []
+        i = bisect.bisect_left(self.prices, float(price))
+        lo, hi = i, i
+        while hi - lo < count and (lo > 0 or hi < len(self.prices)):
+            if lo == 0 or (hi < len(self.prices) and self.prices[hi] - float(price) < float(price) - self.prices[lo - 1]):
+                hi += 1
+            else:
+                lo -= 1
+        return [self._row(j, direction) for j in range(lo, hi)]
+
+    def rows(self, direction='all'):
+        '''
+        every strike in the shape returned by get_options
+        '''
+        return [self._row(i, direction) for i in range(len(self.prices))]
+
+class chain_cache:
+    '''
+    (tickerId, expiration) -> option_chain cache with a short ttl.
+    Expiration date lists are cached per tickerId with their own ttl.
+    '''
+    def __init__(self, ttl=5, dates_ttl=300):
+        self.ttl = ttl
+        self.dates_ttl = dates_ttl
+        self.hits = 0
+        self.misses = 0
+        self._chains = {}
+        self._dates = {}
+
+    @classmethod
+    def from_config(cls, settings):
+        return cls(ttl=settings['ttl'], dates_ttl=settings['dates_ttl'])
+
+    def get(self, ticker_id, expireDate):
+        chain = self._chains.get((ticker_id, expireDate))
+        if chain is not None and time.monotonic() - chain.fetched < self.ttl:
+            self.hits += 1
+            return chain
+        self.misses += 1
+        return None
+
+    def put(self, ticker_id, chain):
+        self._chains[(ticker_id, chain.expireDate)] = chain
+
+    def get_dates(self, ticker_id):
+        entry = self._dates.get(ticker_id)
+        if entry is not None and time.monotonic() - entry[1] < self.dates_ttl:
+            return entry[0]
+        return None
+
+    def put_dates(self, ticker_id, dates):
+        self._dates[ticker_id] = (dates, time.monotonic())
+
+    def clear(self):
+        self._chains.clear()
+        self._dates.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self._chains),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0
+        }
+
+class position_index:
+    '''
+    Positions of an account snapshot keyed by option tickerId
+    '''
+    __slots__ = ('positions', 'by_id', 'fetched')
+
+    def __init__(self, positions, fetched=None):
+        self.positions = positions
+        self.by_id = {int(position['ticker']['tickerId']): position for position in positions}
+        self.fetched = time.monotonic() if fetched is None else fetched
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __iter__(self):
+        return iter(self.positions)
+
+    def get(self, ticker_id):
+        try:
+            return self.by_id.get(int(ticker_id))
+        except (TypeError, ValueError):
+            return None
+
+    def ids(self):
+        return list(self.by_id)
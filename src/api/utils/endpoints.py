@@ -223,3 +223,27 @@ class urls :
 
     def get_all_tickers(self, region_code, user_region_code) :
         return f'{self.base_securitiesfintech_url}/securities/market/v5/card/stockActivityPc.advanced/list?regionId={region_code}&userRegionId={user_region_code}&hasNum=0&pageSize=9999'
+
+class endpoint(str):
+    '''
+    url that remembers the urls method that built it, HTTP spans are named after it
+    '''
+    name = None
+
+    def __add__(self, other):
+        url = endpoint(str.__add__(self, other))
+        url.name = self.name
+        return url
+
+def _named(name, method):
+    def build(self, *args, **kwargs):
+        url = endpoint(method(self, *args, **kwargs))
+        url.name = name
+        return url
+    build.__name__ = name
+    build.__doc__ = method.__doc__
+    return build
+
+for _name, _method in list(vars(urls).items()):
+    if callable(_method) and not _name.startswith('_'):
+        setattr(urls, _name, _named(_name, _method))
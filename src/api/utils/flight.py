@@ -0,0 +1,67 @@
+import asyncio, functools, inspect
+
+class single_flight:
+    '''
+    Identical calls in flight at the same time share one execution and its result.
+    Only calls on the same event loop share, each loop runs its own flights.
+
+    The first caller for a key starts the call, everyone arriving before it finished
+    awaits the same task. Callers get the same result object, so it must not be changed.
+    '''
+    def __init__(self):
+        self.calls = {}
+        self.saved = {}
+        self._flights = {}
+
+    async def do(self, key, call, name=None):
+        '''
+        key: hashable identity of the call
+        call: zero argument coroutine function, only run by the first caller
+        name: counter the call is counted under, key[0] by default
+        '''
+        name = name or (key[0] if isinstance(key, tuple) else str(key))
+        # the run_sync bridge runs its own loop, a task can only be awaited on the loop it runs on
+        key = (asyncio.get_running_loop(), key)
+        task = self._flights.get(key)
+        if task is None:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            task = asyncio.ensure_future(call())
+            self._flights[key] = task
+            task.add_done_callback(lambda done: self._flights.pop(key) if self._flights.get(key) is done else None)
+        else:
+            self.saved[name] = self.saved.get(name, 0) + 1
+        # one caller giving up does not cancel the call for the others
+        return await asyncio.shield(task)
+
+    async def drain(self):
+        '''
+        Wait for the running loop's flights, whose callers may all have given up, e.g. before closing the session they use
+        '''
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(task for (flight_loop, _), task in list(self._flights.items()) if flight_loop is loop), return_exceptions=True)
+
+    def in_flight(self, key):
+        return any(flight[1] == key for flight in self._flights)
+
+    def stats(self):
+        return {name: {'calls': calls, 'saved': self.saved.get(name, 0)} for name, calls in sorted(self.calls.items())}
+
+def coalesce(method):
+    '''
+    Share identical concurrent calls of an async_utils coroutine method through self.flights.
+    Arguments are matched after defaults are applied, so positional and keyword calls share too.
+    Calls with unhashable arguments run on their own.
+    '''
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        key = (method.__name__,) + tuple(bound.arguments.values())[1:]
+        try:
+            hash(key)
+        except TypeError:
+            return await method(self, *args, **kwargs)
+        return await self.flights.do(key, lambda: method(self, *args, **kwargs))
+    return wrapper
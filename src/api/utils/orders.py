@@ -0,0 +1,213 @@
+import asyncio, collections, traceback
+
+from main import logger
+
+TERMINAL = ('Filled', 'Cancelled', 'Failed', 'Expired', 'Rejected')
+
+def orders_in(payload):
+    '''
+    order dicts of a push message or a history response
+    '''
+    if isinstance(payload, list):
+        return [order for item in payload for order in orders_in(item)]
+    if not isinstance(payload, dict):
+        return []
+    if 'orderId' in payload:
+        return [payload]
+    return orders_in(payload.get('data') or payload.get('orders') or [])
+
+class order_event:
+    '''
+    One status change of an order, from the push channel or from polling
+    '''
+    __slots__ = ('order_id', 'status', 'filled_quantity', 'avg_price', 'filled_value', 'source', 'raw')
+
+    def __init__(self, order_id, status, filled_quantity=0, avg_price=None, filled_value=None, source='push', raw=None):
+        self.order_id = str(order_id)
+        self.status = status
+        self.filled_quantity = filled_quantity
+        self.avg_price = avg_price
+        self.filled_value = filled_value
+        self.source = source
+        self.raw = raw
+
+    @classmethod
+    def from_order(cls, order, source='push'):
+        return cls(
+            order['orderId'],
+            order.get('status') or order.get('statusStr') or order.get('orderStatus'),
+            filled_quantity=order.get('filledQuantity', 0),
+            avg_price=order.get('avgFilledPrice'),
+            filled_value=order.get('filledValue'),
+            source=source,
+            raw=order
+        )
+
+    @property
+    def terminal(self):
+        return self.status in TERMINAL
+
+    def __repr__(self):
+        return f'order_event({self.order_id}, {self.status}, {self.filled_quantity} @ {self.avg_price}, {self.source})'
+
+class order_events:
+    '''
+    Order status hub. Waiting coroutines are woken the moment a fill, partial fill or
+    cancel arrives on the push channel.
+
+    While the push channel is not connected one shared tracker polls every open order
+    with a single get_history_orders call per tick (get_current_orders for orders the
+    history did not return), however many orders are waiting.
+
+    client: async api with get_history_orders and get_current_orders
+    poll_interval: seconds between polls with one open order
+    min_interval: shortest poll interval, reached as more orders are open
+    backlog: events kept for orders nobody watches yet, a push can beat the order response
+    listeners: callables called with every event on the loop, watched or not
+    '''
+    def __init__(self, client, poll_interval=3, min_interval=0.5, backlog=256):
+        self.client = client
+        self.poll_interval = poll_interval
+        self.min_interval = min_interval
+        self.backlog = backlog
+        self.source = None
+        self.pushed = 0
+        self.polled = 0
+        self.listeners = []
+        self._loop = None
+        self._queues = {}
+        self._open = {}
+        self._tracker = None
+        self._unclaimed = collections.OrderedDict()
+
+    @property
+    def pushing(self):
+        return self.source is not None and self.source.connected
+
+    async def start(self, source):
+        '''
+        Connect a push source (push_client or fake_broker), False if polling has to be used
+        '''
+        self._loop = asyncio.get_running_loop()
+        source.on_message = self._on_push
+        source.on_disconnect = lambda: self._loop.call_soon_threadsafe(self._fallback)
+        try:
+            connected = await self._loop.run_in_executor(None, source.connect)
+        except Exception as e:
+            line_number = (traceback.extract_tb(e.__traceback__))[-1][1]
+            logger.warning(f'Push channel {type(e).__name__} occurred on line {line_number}: {e}')
+            connected = False
+
+        if connected:
+            source.subscribe_orders()
+            self.source = source
+            logger.info('Order push channel connected')
+        else:
+            logger.warning('Order push channel unavailable, polling order status')
+        return connected
+
+    async def stop(self):
+        if self._tracker is not None:
+            self._tracker.cancel()
+            self._tracker = None
+        if self.source is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.source.close)
+            self.source = None
+
+    def watch(self, order_id):
+        '''
+        Start collecting events of an order, call before wait()
+        '''
+        order_id = str(order_id)
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        self._queues.setdefault(order_id, asyncio.Queue())
+        self._open[order_id] = None
+        for event in self._unclaimed.pop(order_id, ()):
+            self._deliver(event)
+        if not self.pushing:
+            self._track()
+
+    def forget(self, order_id):
+        order_id = str(order_id)
+        self._queues.pop(order_id, None)
+        self._open.pop(order_id, None)
+
+    async def wait(self, order_id, timeout=None):
+        '''
+        next event of a watched order, None on timeout
+        '''
+        try:
+            return await asyncio.wait_for(self._queues[str(order_id)].get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def cancelled(self, order_id):
+        '''
+        an order this process cancelled, published here unless the push channel reports it
+        '''
+        if self.pushing:
+            return
+        last = self._open.get(str(order_id))
+        self.publish(order_event(order_id, 'Cancelled', filled_quantity=last[1] if last else 0, source='cancel'))
+
+    def publish(self, event: order_event):
+        for listener in self.listeners:
+            listener(event)
+        self._deliver(event)
+
+    def _deliver(self, event: order_event):
+        queue = self._queues.get(event.order_id)
+        if queue is not None:
+            if event.terminal:
+                self._open.pop(event.order_id, None)
+            elif event.order_id in self._open:
+                self._open[event.order_id] = (event.status, event.filled_quantity)
+            queue.put_nowait(event)
+            return
+        self._unclaimed.setdefault(event.order_id, []).append(event)
+        self._unclaimed.move_to_end(event.order_id)
+        while len(self._unclaimed) > self.backlog:
+            self._unclaimed.popitem(last=False)
+
+    def _on_push(self, topic, payload):
+        # paho network thread, hand every order over to the loop
+        for order in orders_in(payload):
+            self.pushed += 1
+            self._loop.call_soon_threadsafe(self.publish, order_event.from_order(order, 'push'))
+
+    def _fallback(self):
+        logger.warning('Order push channel dropped, polling order status')
+        self._track()
+
+    def _track(self):
+        if self._open and (self._tracker is None or self._tracker.done()):
+            self._tracker = asyncio.create_task(self._poll())
+
+    def interval(self):
+        '''
+        seconds until the next poll, every open order is served by the same request
+        so more open orders poll sooner, down to min_interval
+        '''
+        return max(self.min_interval, self.poll_interval / max(1, len(self._open)))
+
+    async def _poll(self):
+        while self._open and not self.pushing:
+            await asyncio.sleep(self.interval())
+            count = min(100, max(20, 2 * len(self._open)))
+            try:
+                orders = {str(order['orderId']): order for order in orders_in(await self.client.get_history_orders(status='All', count=count))}
+                if any(order_id not in orders for order_id in self._open):
+                    orders.update({str(order['orderId']): order for order in orders_in(await self.client.get_current_orders())})
+            except Exception as e:
+                line_number = (traceback.extract_tb(e.__traceback__))[-1][1]
+                logger.warning(f'Order poll {type(e).__name__} occurred on line {line_number}: {e}')
+                continue
+
+            self.polled += 1
+            for order_id, last in list(self._open.items()):
+                if order_id not in orders:
+                    continue
+                event = order_event.from_order(orders[order_id], 'poll')
+                if (event.status, event.filled_quantity) != last:
+                    self.publish(event)
@@ -0,0 +1,236 @@
+import json, ssl, threading, time
+import paho.mqtt.client as mqtt
+
+class push_client:
+    '''
+    Webull push channel, MQTT over a websocket. The broker publishes order status
+    (and quote) updates here, so nothing has to be polled while it is connected.
+
+    did: device id of the logged in session, see account._get_did
+    access_token: access token of the logged in session
+    on_message(topic, payload) is called from the paho network thread with the decoded json
+    on_disconnect() is called from the same thread when the connection drops
+    record_path: json lines file every message is appended to, for replay_source
+    name: client id suffix, the broker drops one of two connections with the same client id
+    '''
+    def __init__(self, did, access_token='', host='wspush.webullbroker.com', port=443, keepalive=30, record_path=None, name='orders'):
+        self.did = did
+        self.name = name
+        self.access_token = access_token
+        self.host = host
+        self.port = port
+        self.keepalive = keepalive
+        self.connected = False
+        self.on_message = None
+        self.on_disconnect = None
+        self.topics = []
+        self.record_path = record_path
+        self._ready = threading.Event()
+        self._client = None
+        self._record = None
+        self._started = time.monotonic()
+
+    @classmethod
+    def from_config(cls, wb, settings, record_path=None, name='orders'):
+        return cls(wb._did, wb._access_token, host=settings['host'], port=settings['port'], keepalive=settings['keepalive'], record_path=record_path, name=name)
+
+    def header(self):
+        return {
+            'access_token': self.access_token,
+            'app': 'desktop',
+            'did': self.did,
+            'hl': 'en',
+            'os': 'web',
+            'osv': '',
+            'ver': '4.5.5',
+            'reqid': ''
+        }
+
+    def connect(self, timeout=10):
+        '''
+        Blocking connect, True once the broker accepted the connection
+        '''
+        client = mqtt.Client(client_id=f'{self.did}-{self.name}', transport='websockets')
+        client.tls_set_context(ssl.create_default_context())
+        # the web app logs in to the broker with these, the session is identified by the subscription header
+        client.username_pw_set('test', password='test')
+        client.on_connect = self._on_connect
+        client.on_disconnect = self._on_disconnect
+        client.on_message = self._on_message
+        self._client = client
+
+        if self.record_path:
+            self._record = open(self.record_path, 'a')
+            self._started = time.monotonic()
+
+        self._ready.clear()
+        client.connect(self.host, self.port, self.keepalive)
+        client.loop_start()
+        if not self._ready.wait(timeout):
+            self.close()
+        return self.connected
+
+    def subscribe(self, topic: dict):
+        '''
+        topic: subscription dict, the session header is added to it
+        '''
+        topic = json.dumps({**topic, 'header': self.header()})
+        self.topics.append(topic)
+        if self.connected:
+            self._client.subscribe(topic)
+
+    def unsubscribe(self, topic: dict):
+        topic = json.dumps({**topic, 'header': self.header()})
+        if topic in self.topics:
+            self.topics.remove(topic)
+            if self.connected:
+                self._client.unsubscribe(topic)
+
+    def subscribe_orders(self):
+        self.subscribe({})
+
+    def close(self):
+        self.connected = False
+        if self._client is not None:
+            self._client.loop_stop()
+            self._client.disconnect()
+            self._client = None
+        if self._record is not None:
+            self._record.close()
+            self._record = None
+
+    def _on_connect(self, client, userdata, flags, rc):
+        self.connected = rc == 0
+        if self.connected:
+            # resubscribe after a reconnect
+            for topic in self.topics:
+                client.subscribe(topic)
+        self._ready.set()
+
+    def _on_disconnect(self, client, userdata, rc):
+        was_connected, self.connected = self.connected, False
+        if was_connected and self.on_disconnect:
+            self.on_disconnect()
+
+    def _on_message(self, client, userdata, message):
+        try:
+            topic = json.loads(message.topic)
+        except ValueError:
+            topic = message.topic
+        try:
+            payload = json.loads(message.payload)
+        except ValueError:
+            return
+        if self._record is not None:
+            self._record.write(json.dumps({'t': round(time.monotonic() - self._started, 6), 'topic': topic, 'payload': payload}) + '\n')
+        if self.on_message:
+            self.on_message(topic, payload)
+
+class fake_broker:
+    '''
+    In process stand-in for push_client, for tests and benchmarks.
+    send() delivers a message the way the broker would, from any thread.
+    '''
+    def __init__(self, connects=True):
+        self.connects = connects
+        self.connected = False
+        self.on_message = None
+        self.on_disconnect = None
+        self.topics = []
+
+    def connect(self, timeout=10):
+        self.connected = self.connects
+        return self.connected
+
+    def subscribe(self, topic: dict):
+        self.topics.append(topic)
+
+    def unsubscribe(self, topic: dict):
+        if topic in self.topics:
+            self.topics.remove(topic)
+
+    def subscribe_orders(self):
+        self.subscribe({})
+
+    def close(self):
+        self.connected = False
+
+    def send(self, payload, topic=None):
+        if self.on_message:
+            self.on_message(topic, payload)
+
+    def order(self, order_id, status='Filled', quantity=1, price=1.0):
+        self.send({
+            'orderId': order_id,
+            'status': status,
+            'filledQuantity': quantity,
+            'avgFilledPrice': price,
+            'filledValue': round(quantity * price * 100, 2)
+        })
+
+    def drop(self):
+        self.connected = False
+        if self.on_disconnect:
+            self.on_disconnect()
+
+class replay_source:
+    '''
+    Plays back messages recorded with push_client(record_path=...), for tests and benchmarks.
+
+    records: path of a recording or a list of {'t': seconds, 'topic': ..., 'payload': ...}
+    speed: 1 replays at the recorded pace, 2 twice as fast, 0 as fast as possible
+    '''
+    def __init__(self, records, speed=0):
+        if isinstance(records, str):
+            with open(records) as file:
+                records = [json.loads(line) for line in file if line.strip()]
+        self.records = records
+        self.speed = speed
+        self.connected = False
+        self.on_message = None
+        self.on_disconnect = None
+        self.topics = []
+        self.played = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def connect(self, timeout=10):
+        self.connected = True
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._play, name='wecli-replay', daemon=True)
+        self._thread.start()
+        return True
+
+    def subscribe(self, topic: dict):
+        self.topics.append(topic)
+
+    def unsubscribe(self, topic: dict):
+        if topic in self.topics:
+            self.topics.remove(topic)
+
+    def subscribe_orders(self):
+        self.subscribe({})
+
+    def close(self):
+        self._stop.set()
+        self.connected = False
+
+    def join(self, timeout=None):
+        '''
+        wait until every record was played
+        '''
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _play(self):
+        started = time.monotonic()
+        for record in self.records:
+            if self.speed:
+                delay = record.get('t', 0) / self.speed - (time.monotonic() - started)
+                if delay > 0 and self._stop.wait(delay):
+                    return
+            elif self._stop.is_set():
+                return
+            if self.on_message:
+                self.on_message(record.get('topic'), record['payload'])
+            self.played += 1
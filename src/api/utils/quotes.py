@@ -0,0 +1,208 @@
+import asyncio, time, traceback
+
+from main import logger
+
+def _top(levels):
+    level = (levels or [{}])[0]
+    price = level.get('price')
+    return (float(price) if price is not None else None), level.get('volume')
+
+class quote:
+    '''
+    Latest bid/ask of one option. Never changed after it is built, an update replaces the whole entry.
+    '''
+    __slots__ = ('tickerId', 'bid', 'bidVolume', 'ask', 'askVolume', 'expireDate', 'source', 'received')
+
+    def __init__(self, tickerId, bid, bidVolume, ask, askVolume, expireDate=None, source='push', received=None):
+        self.tickerId = tickerId
+        self.bid = bid
+        self.bidVolume = bidVolume
+        self.ask = ask
+        self.askVolume = askVolume
+        self.expireDate = expireDate
+        self.source = source
+        self.received = time.monotonic() if received is None else received
+
+    @classmethod
+    def from_quote(cls, data, source='push', tickerId=None):
+        '''
+        from a rest or push quote with askList/bidList
+        '''
+        bid, bidVolume = _top(data.get('bidList'))
+        ask, askVolume = _top(data.get('askList'))
+        return cls(int(tickerId or data['tickerId']), bid, bidVolume, ask, askVolume, data.get('expireDate'), source)
+
+    @property
+    def mid(self):
+        if self.bid is None or self.ask is None:
+            return None
+        return round((self.ask + self.bid) / 2, 2)
+
+    def age(self):
+        return time.monotonic() - self.received
+
+    def __repr__(self):
+        return f'quote({self.tickerId}, {self.bid}x{self.ask}, {self.source}, {self.age():.2f}s)'
+
+class quote_table:
+    '''
+    tickerId -> latest quote.
+    Writers swap whole entries and readers do a plain dict read, so neither
+    the push thread nor the loop ever waits on a lock.
+    '''
+    def __init__(self, max_age=2):
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._quotes = {}
+
+    def __len__(self):
+        return len(self._quotes)
+
+    def put(self, entry: quote):
+        current = self._quotes.get(entry.tickerId)
+        # an update without an expiration keeps the one already known
+        if entry.expireDate is None and current is not None and current.expireDate is not None:
+            entry.expireDate = current.expireDate
+        self._quotes[entry.tickerId] = entry
+
+    def get(self, tickerId, max_age=None):
+        '''
+        the latest quote if it is fresh enough, else None
+        '''
+        entry = self._quotes.get(int(tickerId))
+        if entry is not None and entry.mid is not None and entry.age() <= (self.max_age if max_age is None else max_age):
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self._quotes),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0
+        }
+
+class quote_stream:
+    '''
+    Keeps the quote table current for the watched option tickerIds.
+    Bid/ask updates come from the push channel (or a replay_source); while no
+    channel is connected the watched ids are polled with get_option_quotes.
+
+    client: async api with get_option_quotes
+    level: push subscription type
+    '''
+    def __init__(self, client, max_age=2, poll_interval=1, batch=50, level='105'):
+        self.client = client
+        self.table = quote_table(max_age)
+        self.poll_interval = poll_interval
+        self.batch = batch
+        self.level = level
+        self.source = None
+        self.watched = set()
+        self.pushed = 0
+        self.polled = 0
+        self._topic = None
+        self._poller = None
+
+    @classmethod
+    def from_config(cls, client, settings):
+        return cls(client, max_age=settings['max_age'], poll_interval=settings['poll_interval'], batch=settings['batch'])
+
+    @property
+    def pushing(self):
+        return self.source is not None and self.source.connected
+
+    def get(self, tickerId, max_age=None):
+        return self.table.get(tickerId, max_age)
+
+    async def start(self, source=None):
+        '''
+        Connect a push source (push_client or replay_source), False if polling has to be used
+        '''
+        if source is None:
+            self._track()
+            return False
+
+        loop = asyncio.get_running_loop()
+        source.on_message = self._on_push
+        source.on_disconnect = lambda: loop.call_soon_threadsafe(self._track)
+        try:
+            connected = await loop.run_in_executor(None, source.connect)
+        except Exception as e:
+            line_number = (traceback.extract_tb(e.__traceback__))[-1][1]
+            logger.warning(f'Quote channel {type(e).__name__} occurred on line {line_number}: {e}')
+            connected = False
+
+        if connected:
+            self.source = source
+            self._subscribe()
+            logger.info('Quote push channel connected')
+        else:
+            logger.warning('Quote push channel unavailable, polling quotes')
+            self._track()
+        return connected
+
+    async def stop(self):
+        if self._poller is not None:
+            self._poller.cancel()
+            self._poller = None
+        if self.source is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.source.close)
+            self.source = None
+
+    def watch(self, tickerIds):
+        '''
+        Replace the watched set, subscribes once for the whole set
+        '''
+        watched = {int(i) for i in tickerIds}
+        if watched == self.watched:
+            return
+        self.watched = watched
+        if self.pushing:
+            self._subscribe()
+        else:
+            self._track()
+
+    def seed(self, entries, source='chain'):
+        '''
+        Fill the table from the contracts of a freshly downloaded chain
+        '''
+        for entry in entries:
+            self.table.put(quote.from_quote(entry, source))
+
+    def _subscribe(self):
+        if self._topic is not None:
+            self.source.unsubscribe(self._topic)
+            self._topic = None
+        if self.watched:
+            self._topic = {'tickerIds': sorted(self.watched), 'type': self.level}
+            self.source.subscribe(self._topic)
+
+    def _on_push(self, topic, payload):
+        # push thread, the table is written directly
+        for data in payload if isinstance(payload, list) else [payload]:
+            tickerId = data.get('tickerId') or (topic.get('tickerId') if isinstance(topic, dict) else None)
+            if tickerId is None or not ('askList' in data or 'bidList' in data):
+                continue
+            self.pushed += 1
+            self.table.put(quote.from_quote(data, 'push', tickerId))
+
+    def _track(self):
+        if self.watched and (self._poller is None or self._poller.done()):
+            self._poller = asyncio.create_task(self._poll())
+
+    async def _poll(self):
+        while self.watched and not self.pushing:
+            try:
+                quotes = await self.client.get_option_quotes(self.watched, batch=self.batch)
+                for data in quotes.values():
+                    self.table.put(quote.from_quote(data, 'poll'))
+                self.polled += 1
+            except Exception as e:
+                line_number = (traceback.extract_tb(e.__traceback__))[-1][1]
+                logger.warning(f'Quote poll {type(e).__name__} occurred on line {line_number}: {e}')
+            await asyncio.sleep(self.poll_interval)
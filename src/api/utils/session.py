@@ -0,0 +1,162 @@
+import asyncio, hashlib, json, os, time, traceback
+from datetime import datetime
+
+from main import logger
+
+def expires_at(token_expire):
+    '''
+    tokenExpireTime ('2023-12-04T12:00:00.000+0000' or epoch milliseconds) as epoch seconds, None if unreadable
+    '''
+    if not token_expire:
+        return None
+    if isinstance(token_expire, (int, float)):
+        return token_expire / 1000 if token_expire > 1e11 else float(token_expire)
+    for format in ('%Y-%m-%dT%H:%M:%S.%f%z', '%Y-%m-%dT%H:%M:%S%z'):
+        try:
+            return datetime.strptime(token_expire, format).timestamp()
+        except ValueError:
+            pass
+    return None
+
+class tokens:
+    '''
+    Credentials of one logged in session. Never changed after it is built, a login or
+    refresh swaps in a whole new one, so every request sends a matching set.
+    '''
+    __slots__ = ('access_token', 'refresh_token', 'token_expire', 'uuid', 'trade_token', 'account_id', 'zone_var')
+
+    def __init__(self, access_token='', refresh_token='', token_expire='', uuid='', trade_token='', account_id='', zone_var='dc_core_r001'):
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        self.token_expire = token_expire
+        self.uuid = uuid
+        self.trade_token = trade_token
+        self.account_id = account_id
+        self.zone_var = zone_var
+
+    def replace(self, **changes):
+        return tokens(**{**self.to_dict(), **changes})
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{name: data[name] for name in cls.__slots__ if name in data})
+
+    def expires(self):
+        return expires_at(self.token_expire)
+
+    def fresh(self, margin=0):
+        '''
+        True while the access token is valid for more than margin seconds
+        '''
+        expires = self.expires()
+        return bool(self.access_token) and expires is not None and expires - time.time() > margin
+
+class token_cache:
+    '''
+    Session tokens kept between runs so a start can skip the password login.
+    One entry per login (username, paper or live), the username is only stored hashed.
+    The file is written then renamed and only the owner can read it (0600).
+
+    path: json file, None keeps nothing
+    '''
+    def __init__(self, path=None):
+        self.path = path
+
+    @classmethod
+    def from_config(cls, settings):
+        return cls(path=settings['path'])
+
+    @staticmethod
+    def key(username, paper):
+        return hashlib.sha256(f'{username}:{"paper" if paper else "live"}'.encode('utf-8')).hexdigest()[:16]
+
+    def _read(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, entries):
+        tmp_path = f'{self.path}.tmp'
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as file:
+            json.dump(entries, file)
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, self.path)
+
+    def load(self, username, paper=False):
+        entry = self._read().get(self.key(username, paper))
+        return tokens.from_dict(entry) if entry else None
+
+    def save(self, username, paper, session: tokens):
+        if not self.path:
+            return
+        entries = self._read()
+        entries[self.key(username, paper)] = session.to_dict()
+        self._write(entries)
+
+    def clear(self, username, paper=False):
+        if not self.path:
+            return
+        entries = self._read()
+        if entries.pop(self.key(username, paper), None) is not None:
+            self._write(entries)
+
+class session_refresher:
+    '''
+    Refreshes the tokens of an account margin seconds before tokenExpireTime.
+    The refresh runs in a worker thread and the new tokens are swapped in at once,
+    requests in flight keep the tokens they were sent with.
+
+    account: api.utils.account.account
+    interval: seconds between refreshes when the expiry time is unknown
+    retry: seconds before a failed refresh is tried again
+    '''
+    def __init__(self, account, margin=300, interval=3600, retry=30):
+        self.account = account
+        self.margin = margin
+        self.interval = interval
+        self.retry = retry
+        self.refreshes = 0
+        self.failures = 0
+
+    @classmethod
+    def from_config(cls, account, settings):
+        return cls(account, margin=settings['refresh_margin'], interval=settings['refresh_interval'], retry=settings['retry'])
+
+    def due(self):
+        '''
+        seconds until the next refresh
+        '''
+        expires = self.account._tokens.expires()
+        if expires is None:
+            return self.interval
+        return max(0, expires - self.margin - time.time())
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.due())
+            try:
+                refreshed = await loop.run_in_executor(None, self.account.refresh_session)
+            except Exception as e:
+                line_number = (traceback.extract_tb(e.__traceback__))[-1][1]
+                logger.warning(f'Session refresh {type(e).__name__} occurred on line {line_number}: {e}')
+                refreshed = False
+
+            if refreshed:
+                self.refreshes += 1
+                logger.info('Webull session refreshed')
+                if self.due() == 0:
+                    # the new token is already inside the margin, don't spin on it
+                    await asyncio.sleep(self.retry)
+            else:
+                self.failures += 1
+                logger.warning(f'Webull session refresh failed, trying again in {self.retry}s')
+                await asyncio.sleep(self.retry)
@@ -0,0 +1,136 @@
+import time
+
+from .cache import position_index
+from .flight import single_flight
+
+# accountMembers / paper account keys holding buying power, most specific first
+BUYING_POWER_KEYS = ('optionBuyingPower', 'dayBuyingPower', 'overnightBuyingPower', 'usableCash', 'cashBalance')
+
+class account_snapshot:
+    '''
+    One get_account payload, read only. Typed views are built on first use.
+    '''
+    __slots__ = ('data', 'fetched', '_index', '_portfolio')
+
+    def __init__(self, data, fetched=None):
+        self.data = data
+        self.fetched = time.monotonic() if fetched is None else fetched
+        self._index = None
+        self._portfolio = None
+
+    def age(self):
+        return time.monotonic() - self.fetched
+
+    @property
+    def positions(self) -> list:
+        return self.data.get('positions') or []
+
+    @property
+    def open_orders(self) -> list:
+        return self.data.get('openOrders') or []
+
+    @property
+    def portfolio(self) -> dict:
+        '''
+        accountMembers as key -> value, the paper account has its numbers at the top level instead
+        '''
+        if self._portfolio is None:
+            members = self.data.get('accountMembers')
+            if members is not None:
+                self._portfolio = {item['key']: item['value'] for item in members}
+            else:
+                self._portfolio = {key: value for key, value in self.data.items() if not isinstance(value, (list, dict))}
+        return self._portfolio
+
+    @property
+    def buying_power(self) -> float:
+        portfolio = self.portfolio
+        for key in BUYING_POWER_KEYS:
+            if portfolio.get(key) not in (None, ''):
+                return float(portfolio[key])
+        return 0.0
+
+    @property
+    def index(self) -> position_index:
+        if self._index is None:
+            self._index = position_index(self.positions, self.fetched)
+        return self._index
+
+class account_cache:
+    '''
+    Latest account_snapshot with a short ttl.
+
+    Callers arriving while a download is in flight share it instead of starting their own.
+    invalidate() (order placed, cancelled or filled) makes the next get() download again,
+    a download started before the invalidation is not reused.
+
+    fetch: coroutine function returning the raw get_account payload
+    flights: single_flight the downloads are shared through
+    on_snapshot(snapshot): called with every download that is kept
+    '''
+    def __init__(self, fetch, ttl=1, flights=None):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.flights = flights or single_flight()
+        self.hits = 0
+        self.misses = 0
+        self.downloads = 0
+        self.on_snapshot = None
+        self._snapshot = None
+        self._generation = 0
+
+    @classmethod
+    def from_config(cls, fetch, settings, flights=None):
+        return cls(fetch, ttl=settings['ttl'], flights=flights)
+
+    @property
+    def shared(self):
+        return self.flights.saved.get('account', 0)
+
+    async def get(self, max_age=None) -> account_snapshot:
+        '''
+        snapshot at most max_age (default ttl) seconds old, 0 forces a download
+        '''
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.age() < (self.ttl if max_age is None else max_age):
+            self.hits += 1
+            return snapshot
+        self.misses += 1
+        return await self.refresh()
+
+    async def refresh(self) -> account_snapshot:
+        # keyed by generation, a download started before an invalidation is not joined
+        generation = self._generation
+        return await self.flights.do(('account', generation), lambda: self._download(generation))
+
+    async def _download(self, generation):
+        self.downloads += 1
+        # aged from the request, anything changed before it was sent is in the payload
+        started = time.monotonic()
+        snapshot = account_snapshot(await self.fetch(), started)
+        if generation == self._generation:
+            self._snapshot = snapshot
+            if self.on_snapshot is not None:
+                self.on_snapshot(snapshot)
+        return snapshot
+
+    def invalidate(self):
+        self._generation += 1
+        self._snapshot = None
+
+    def on_order_event(self, event):
+        '''
+        order_events listener, fills and final states change positions and buying power
+        '''
+        if event.terminal or float(event.filled_quantity or 0) > 0:
+            self.invalidate()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'shared': self.shared,
+            'downloads': self.downloads,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0
+        }
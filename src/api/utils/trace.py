@@ -0,0 +1,175 @@
+import json, os, sys, threading, time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SUB_BUCKET_BITS = 8
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+HALF = SUB_BUCKETS >> 1
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+class histogram:
+    '''
+    HDR style latency histogram in microseconds.
+    Buckets are log-linear, values from 2^8us up are counted in buckets 1/128 of
+    their size wide (under 1% error, below that exact) with a fixed, small number
+    of buckets from 1us to hours.
+    '''
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def index(value):
+        if value < SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - SUB_BUCKET_BITS
+        return shift * HALF + (value >> shift)
+
+    @staticmethod
+    def value(index):
+        '''
+        highest value counted in a bucket
+        '''
+        if index < SUB_BUCKETS:
+            return index
+        shift = (index - HALF) // HALF
+        return ((index - shift * HALF + 1) << shift) - 1
+
+    def record(self, micros):
+        micros = max(0, int(micros))
+        i = self.index(micros)
+        with self._lock:
+            self.counts[i] = self.counts.get(i, 0) + 1
+            self.count += 1
+            self.total += micros
+            self.min = micros if self.min is None else min(self.min, micros)
+            self.max = max(self.max, micros)
+
+    def percentile(self, quantile):
+        if not self.count:
+            return 0
+        target = max(1, round(quantile * self.count))
+        seen = 0
+        for i in sorted(self.counts):
+            seen += self.counts[i]
+            if seen >= target:
+                return min(self.value(i), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else 0
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'mean_us': round(self.mean(), 1),
+            'min_us': self.min or 0,
+            'max_us': self.max,
+            **{f'p{q * 100:g}_us': self.percentile(q) for q in QUANTILES},
+            'buckets': {str(i): n for i, n in sorted(self.counts.items())}
+        }
+
+class tracer:
+    '''
+    Named latency spans. Every span name gets its own histogram.
+
+    with trace.span('order.submit'):
+        ...
+    '''
+    def __init__(self):
+        self.histograms = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def histogram(self, name):
+        h = self.histograms.get(name)
+        if h is None:
+            with self._lock:
+                h = self.histograms.setdefault(name, histogram())
+        return h
+
+    def observe(self, name, seconds):
+        self.histogram(name).record(seconds * 1e6)
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def clear(self):
+        with self._lock:
+            self.histograms = {}
+
+    def snapshot(self):
+        return {
+            'started': self.started,
+            'exported': time.time(),
+            'spans': {name: h.to_dict() for name, h in sorted(self.histograms.items())}
+        }
+
+    def export(self, path):
+        '''
+        write every histogram to a json metrics file, write then rename
+        '''
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(self.snapshot(), file)
+        os.replace(tmp_path, path)
+
+    def prometheus(self):
+        '''
+        histograms in the Prometheus text format, as summaries in seconds
+        '''
+        lines = ['# HELP wecli_span_seconds Latency of traced spans', '# TYPE wecli_span_seconds summary']
+        for name, h in sorted(self.histograms.items()):
+            for q in QUANTILES:
+                lines.append(f'wecli_span_seconds{{span="{name}",quantile="{q}"}} {h.percentile(q) / 1e6:.6f}')
+            lines.append(f'wecli_span_seconds_sum{{span="{name}"}} {h.total / 1e6:.6f}')
+            lines.append(f'wecli_span_seconds_count{{span="{name}"}} {h.count}')
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port, host='127.0.0.1'):
+        '''
+        serve /metrics in the Prometheus text format from a daemon thread
+        '''
+        source = self
+
+        class handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = source.prometheus().encode('utf-8')
+                self.send_response(200 if self.path.startswith('/metrics') else 404)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), handler)
+        threading.Thread(target=server.serve_forever, name='wecli-metrics', daemon=True).start()
+        return server
+
+def table(snapshot):
+    '''
+    exported metrics as a printable table, in milliseconds
+    '''
+    rows = [f'{"span":<32}{"count":>8}{"mean":>10}{"p50":>10}{"p90":>10}{"p99":>10}{"max":>10}']
+    for name, h in snapshot['spans'].items():
+        ms = lambda key: f'{h[key] / 1000:.2f}'
+        rows.append(f'{name:<32}{h["count"]:>8}{ms("mean_us"):>10}{ms("p50_us"):>10}{ms("p90_us"):>10}{ms("p99_us"):>10}{ms("max_us"):>10}')
+    return '\n'.join(rows)
+
+trace = tracer()
+
+if __name__ == '__main__':
+    # python src/api/utils/trace.py [metrics file]
+    with open(sys.argv[1] if len(sys.argv) > 1 else 'src/misc/metrics.json') as file:
+        print(table(json.load(file)))
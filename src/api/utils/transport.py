@@ -0,0 +1,87 @@
+import threading, requests
+from urllib.parse import urlsplit, urlunsplit
+from requests.adapters import HTTPAdapter
+
+from .trace import trace
+
+class transport:
+    '''
+    Pooled keep-alive HTTP transport shared by every API method of an account.
+
+    One requests.Session is mounted with an HTTPAdapter whose pool manager keeps a
+    connection pool per host (quotes-gw, ustrade, act...), so only the first call to a
+    host pays for the TCP+TLS handshake.
+
+    pool_connections: number of host pools to keep alive
+    pool_maxsize: connections kept per host pool
+    timeout: default timeout when a call does not pass one
+    max_retries: connection level retries done by urllib3
+    base_url: send every request to this scheme://host[:port] instead (local fake server)
+    '''
+    def __init__(self, pool_connections=16, pool_maxsize=10, timeout=15, max_retries=0, base_url=None):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_url = base_url
+        self._lock = threading.Lock()
+        self._session = None
+
+    @classmethod
+    def from_config(cls, settings):
+        '''
+        Build a transport from the "transport" section of config.json
+        '''
+        return cls(
+            pool_connections=settings['pool_connections'],
+            pool_maxsize=settings['pool_maxsize'],
+            timeout=settings['timeout'],
+            max_retries=settings['max_retries'],
+            base_url=settings['base_url']
+        )
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(
+                        pool_connections=self.pool_connections,
+                        pool_maxsize=self.pool_maxsize,
+                        max_retries=self.max_retries
+                    )
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+        return self._session
+
+    def resolve(self, url):
+        '''
+        Rewrite the scheme and host of url to base_url, keeping path and query
+        '''
+        if not self.base_url:
+            return url
+        base = urlsplit(self.base_url)
+        parts = urlsplit(url)
+        return urlunsplit((base.scheme, base.netloc, parts.path, parts.query, parts.fragment))
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        with trace.span(f'http.{getattr(url, "name", None) or "other"}'):
+            return self.session.request(method, self.resolve(url), **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        '''
+        Drop every pooled connection
+        '''
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
@@ -1,4 +1,6 @@
-import json, logging, pickle, asyncio
+import atexit, json, logging, logging.handlers, os, asyncio, queue
+
+from modules.store import PositionStore
 
 # updatable settings
 class ConfigLoader:
@@ -23,10 +25,26 @@ class ConfigLoader:
         self.bto_offset = self.config['config']['bto_offset']
         self.stc_offset = self.config['config']['stc_offset']
         self.max_per_trade = self.config['config']['max_per_trade']
+        self.workers = self.config['config']['workers']
+        self.accounts = self.config['config']['accounts']
+
+        # http transport
+        self.transport = self.config['config']['transport']
+        self.ticker_cache = self.config['config']['ticker_cache']
+        self.option_cache = self.config['config']['option_cache']
+        self.prefetch = self.config['config']['prefetch']
+        self.push = self.config['config']['push']
+        self.quotes = self.config['config']['quotes']
+        self.metrics = self.config['config']['metrics']
+        self.account_cache = self.config['config']['account_cache']
+        self.risk = self.config['config']['risk']
+        self.session = self.config['config']['session']
 
         # Paths
         self.csv_path = self.config['config']['csv_path']
+        self.ledger = self.config['config']['ledger']
         self.variable_path = self.config['config']['variable_path']
+        self.position_store = self.config['config']['position_store']
 
         # debug/logger
         self.debug = self.config['config']['debug']
@@ -38,34 +56,55 @@ class ConfigLoader:
         self.keywords = self.config['triggers']
 
     def reload_config(self):
-        self.load_config()
+        # read the whole file first, then swap every setting at once
+        fresh = ConfigLoader(self.config_path)
+        vars(self).update(vars(fresh))
+        logger.setLevel(logging.DEBUG if self.debug is True else logging.INFO)
+        stream_handler.setLevel(logging.DEBUG if self.debug is True else logging.INFO)
 
-        from modules.handler import Handler
-        from modules.manager import Manager
-
-        Handler().update_vars()
-        Manager().update_vars()
+        from modules.context import AppContext
+        AppContext.get().apply()
         
         return True
 
-config_path = "D:\Downloads\Coding\Python\cli-hidden-config\config.json"
+config_path = os.environ.get("WECLI_CONFIG", "D:\Downloads\Coding\Python\cli-hidden-config\config.json")
 config = ConfigLoader(config_path)
 wb = None
-with open(config.variable_path, 'rb') as file:
-    current_positions = pickle.load(file)
+positions = PositionStore.from_config(config.position_store, legacy_path=config.variable_path)
 
 # logger
+class LogQueue(logging.handlers.QueueHandler):
+    '''
+    Puts records on the queue as they are, the listener thread formats them.
+    Log arguments are formatted later, so pass values that are not changed afterwards.
+    '''
+    def prepare(self, record):
+        return record
+
 logger = logging.getLogger(__name__)
 formatter = logging.Formatter(config.format, datefmt="%m-%d %H:%M:%S")
 file_handler = logging.FileHandler(config.log_path, encoding='utf-8')
 file_handler.setFormatter(formatter)
 file_handler.setLevel(logging.DEBUG)
-logger.addHandler(file_handler)
 stream_handler = logging.StreamHandler()
 stream_handler.setFormatter(formatter)
 stream_handler.setLevel(logging.DEBUG if config.debug is True else logging.INFO)
-logger.addHandler(stream_handler)
-logger.setLevel(logging.DEBUG)
+# the caller only builds the record and queues it, formatting and writing happen on the listener thread
+log_queue = queue.SimpleQueue()
+log_listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+logger.addHandler(LogQueue(log_queue))
+# debug calls return before a record is made unless debug is on
+logger.setLevel(logging.DEBUG if config.debug is True else logging.INFO)
+log_listener.start()
+
+def stop_logging():
+    '''
+    write out the queued records and stop the listener, safe to call more than once
+    '''
+    if log_listener._thread is not None:
+        log_listener.stop()
+
+atexit.register(stop_logging)
 
 # api login
 def login(refresh_session=None):
@@ -73,20 +112,72 @@ def login(refresh_session=None):
     from api import paper_webull, webull
     if not wb or refresh_session is not None: 
         if config.api_type == 'paper':
-            wb = paper_webull(username=config.email, password=config.password, did=config.did)
+            wb = paper_webull(username=config.email, password=config.password, did=config.did, restore=refresh_session is None)
         elif config.api_type == 'live':
-            wb = webull(username=config.email, password=config.password, did=config.did, pin=config.pin)
+            wb = webull(username=config.email, password=config.password, did=config.did, pin=config.pin, restore=refresh_session is None)
     return wb
 
-async def ask_entry():
-    from modules.handler import Handler
-    entry = input('> ').lower()
-    if entry:
-        await Handler().handle_message(entry)
+async def export_metrics(trace):
+    while True:
+        await asyncio.sleep(config.metrics['export_interval'])
+        trace.export(config.metrics['path'])
+
+async def run():
+    from modules.context import AppContext
+    from modules.fanout import Fanout
+    from modules.pipeline import Pipeline
+    from modules.prefetch import Prefetcher
+    from api.utils.push import push_client
+    from api.utils.trace import trace
+    from api.utils.session import session_refresher
+    # background loops, cancelled once the pipeline is done
+    tasks = []
+    if config.metrics['port']:
+        trace.serve(config.metrics['port'])
+    if config.metrics['export_interval'] > 0:
+        tasks.append(asyncio.create_task(export_metrics(trace)))
+    context = AppContext.get()
+    handler = context.handler
+    ledger = context.ledger
+    # the main account first, then every account alerts are copied to
+    contexts = [context, *context.accounts]
+    for account in context.accounts:
+        # hooks the account's orders into the shared ledger
+        account.ledger
+    if config.session['refresh'] is True:
+        tasks.extend(asyncio.create_task(session_refresher.from_config(account.client.wb, config.session).run()) for account in contexts)
+    if config.push['enabled'] is True:
+        # accounts without their own did share one, the client ids still have to differ
+        await asyncio.gather(*(account.client.events.start(push_client.from_config(account.client.wb, config.push, name='orders' if account is context else f'orders-{account.name}')) for account in contexts))
+    if config.quotes['enabled'] is True:
+        await handler.wb.quotes.start(push_client.from_config(handler.wb.wb, config.push, config.quotes['record_path'], name='quotes') if config.push['enabled'] is True else None)
+    await handler.wb.aio.seed_tickers(config.tickers)
+    logger.debug(f'Ticker cache: {handler.wb.wb._tickers.stats()}')
+    if config.option_cache['refresh_interval'] > 0:
+        tasks.append(asyncio.create_task(handler.wb.aio.keep_chains_warm(config.tickers, config.option_cache['expirations'], config.option_cache['refresh_interval'])))
+    if config.risk['enabled'] is True and config.risk['refresh_interval'] > 0:
+        tasks.extend(asyncio.create_task(account.risk.run()) for account in contexts)
+    if config.prefetch['enabled'] is True:
+        handler.prefetcher = Prefetcher(handler.wb, config.tickers, config.prefetch, handler.quotes)
+        tasks.append(asyncio.create_task(handler.prefetcher.run()))
+    await Pipeline(Fanout([account.handler for account in contexts], logger) if context.accounts else handler, config.workers).run()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if handler.prefetcher:
+        logger.info(f'Warm set: {handler.prefetcher.stats()}')
+    logger.debug(f'Risk: {context.risk.stats()}')
+    for account in context.accounts:
+        logger.debug(f'Risk ({account.name}): {account.risk.stats()}')
+    logger.debug(f'Coalesced requests: {handler.wb.aio.flights.stats()}')
+    await asyncio.gather(*(account.client.events.stop() for account in contexts))
+    await handler.wb.quotes.stop()
+    # calls left running by cancelled callers still need the sessions
+    await asyncio.gather(*(account.client.aio.flights.drain() for account in contexts))
+    await asyncio.gather(*(account.client.wb._aio.close() for account in contexts))
+    ledger.close()
+    logger.debug(f'Ledger: {ledger.stats()}')
+    trace.export(config.metrics['path'])
 
 if __name__ == '__main__':
-    while True:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(ask_entry())
-        loop.close()
\ No newline at end of file
+    asyncio.run(run())
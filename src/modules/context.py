@@ -0,0 +1,150 @@
+import logging, threading
+
+import main
+from . import error
+from .store import PositionStore
+
+class AppContext:
+    '''
+    The one application context of the process. Owns the config, logger, api client
+    and position store, and builds the Handler, Manager, RiskEngine and TradeLedger once
+    so every alert and order shares them instead of logging in and reading settings again.
+    '''
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, config, logger, positions) -> None:
+        self.config = config
+        self.logger = logger
+        self.positions = positions
+        self._handler = None
+        self._manager = None
+        self._risk = None
+        self._ledger = None
+        self._accounts = None
+
+    @classmethod
+    def get(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls(main.config, main.logger, main.positions)
+        return cls._instance
+
+    @property
+    def client(self):
+        return main.login()
+
+    @property
+    def max_per_trade(self):
+        return self.config.max_per_trade
+
+    @property
+    def accounts(self):
+        '''
+        contexts of the extra accounts in config.accounts, built on first use
+        '''
+        if self._accounts is None:
+            self._accounts = [AccountContext(settings, self) for settings in self.config.accounts]
+        return self._accounts
+
+    @property
+    def manager(self):
+        if self._manager is None:
+            from .manager import Manager
+            self._manager = Manager(self)
+        return self._manager
+
+    @property
+    def risk(self):
+        if self._risk is None:
+            from .risk import RiskEngine
+            self._risk = RiskEngine(self)
+        return self._risk
+
+    @property
+    def ledger(self):
+        if self._ledger is None:
+            self._ledger = self._build_ledger()
+            self.client.aio.order_listeners.append(self._ledger.submitted)
+            self.client.events.listeners.append(self._ledger.on_event)
+        return self._ledger
+
+    def _build_ledger(self):
+        from .ledger import TradeLedger
+        return TradeLedger.from_config(self.config.ledger, self.config.csv_path, self.logger)
+
+    @property
+    def handler(self):
+        if self._handler is None:
+            from .handler import Handler
+            self._handler = Handler(self)
+        return self._handler
+
+    def components(self):
+        return [component for component in (self._handler, self._manager, self._risk) if component is not None]
+
+    def apply(self):
+        '''
+        Hand the current config to the components. Nothing awaits in between, so no
+        alert ever sees half of the old and half of the new settings.
+        '''
+        for component in self.components():
+            component.update_vars()
+        for account in self._accounts or ():
+            account.apply()
+
+    def reload(self):
+        return self.config.reload_config()
+
+class AccountLog(logging.LoggerAdapter):
+    '''
+    Prefixes the lines of an extra account with its name
+    '''
+    def process(self, msg, kwargs):
+        return f'[{self.extra["account"]}] {msg}', kwargs
+
+class AccountContext(AppContext):
+    '''
+    Context of one extra account alerts are copied to. It has its own login, connection
+    pool, position store, buying power and max_per_trade; the other settings and the
+    ticker and option chain caches are shared with the main account.
+
+    settings: one entry of config.accounts
+    parent: the AppContext of the main account
+    '''
+
+    def __init__(self, settings, parent: AppContext) -> None:
+        if settings['api_type'] not in ('paper', 'live'):
+            raise error.ConfigError(f"Account {settings['name']}: api_type must be 'paper' or 'live', not {settings['api_type']!r}")
+        positions = PositionStore(settings['position_store'], fsync=parent.config.position_store['fsync'], compact_after=parent.config.position_store['compact_after'])
+        super().__init__(parent.config, AccountLog(parent.logger, {'account': settings['name']}), positions)
+        self.name = settings['name']
+        self.settings = settings
+        self.parent = parent
+        self._client = None
+        self._accounts = []
+
+    @property
+    def client(self):
+        if self._client is None:
+            from api import paper_webull, webull
+            shared = self.parent.client.wb
+            login = dict(username=self.settings['email'], password=self.settings['password'], did=self.settings['did'], tickers=shared._tickers, chains=shared._chains)
+            if self.settings['api_type'] == 'paper':
+                self._client = paper_webull(**login)
+            elif self.settings['api_type'] == 'live':
+                self._client = webull(pin=self.settings['trading_pin'], **login)
+        return self._client
+
+    @property
+    def max_per_trade(self):
+        # read again on every apply, so a reload changes the sizing
+        for settings in self.config.accounts:
+            if settings['name'] == self.name:
+                return settings['max_per_trade']
+        return self.settings['max_per_trade']
+
+    def _build_ledger(self):
+        # one ledger for every account, order ids are unique across accounts
+        return self.parent.ledger
@@ -0,0 +1,38 @@
+import asyncio, traceback
+
+from .parser import Alert
+
+class Fanout:
+    '''
+    Copies every alert to several accounts at the same time.
+
+    An entry is resolved once by the main account (contract, quote and limit price),
+    then every account sizes and places its own order concurrently, so an alert takes
+    about one order's latency however many accounts follow it. Trims and exits run on
+    every account at once, each against its own positions.
+
+    handlers: Handler of the main account first, then one per extra account
+    '''
+
+    def __init__(self, handlers, logger) -> None:
+        self.handlers = handlers
+        self.primary = handlers[0]
+        self.logger = logger
+
+    def parse_message(self, content: str) -> Alert:
+        return self.primary.parse_message(content)
+
+    async def handle_message(self, content: str):
+        return await self.handle_alert(self.parse_message(content))
+
+    async def handle_alert(self, alert: Alert):
+        if alert.trigger != 'entry':
+            return await asyncio.gather(*(handler.handle_alert(alert) for handler in self.handlers))
+
+        try:
+            resolved = await self.primary.resolve(alert)
+        except Exception as e:
+            line_number = (traceback.extract_tb(e.__traceback__))[-1][1]
+            self.logger.error(f'{type(e).__name__} occured on line {line_number}: {e}')
+            return
+        return await asyncio.gather(*(handler.entry(*resolved) for handler in self.handlers))
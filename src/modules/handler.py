@@ -1,115 +1,74 @@
-import re, traceback, math
-from datetime import datetime
+import asyncio, re, traceback, math
 
-import main
 from . import error
-from .manager import Manager
+from .context import AppContext
+from .parser import Alert, AlertParser
+from api.utils.trace import trace
 
-manager = Manager()
+def trim_quantity(position: int) -> int:
+    '''
+    Contracts a trim sells: half the position rounded, at least one.
+    The original rule ended up selling the whole position whenever it held more than one contract.
+    '''
+    return min(position, max(1, round(position/2)))
 
 class Handler:
         
-    def __init__(self) -> None:
+    def __init__(self, context: AppContext = None) -> None:
+        self.context = context or AppContext.get()
+        self.manager = self.context.manager
+        self.risk = self.context.risk
+        self.prefetcher = None
         self.update_vars()
 
     def update_vars(self):
-        self.email = main.config.email
-        self.password = main.config.password
-        self.wb = main.login()
-        self.offset = main.config.bto_offset
-        self.logger = main.logger
-        self.max_per_trade = main.config.max_per_trade
-        self.ticker_list = main.config.tickers
-        self.keywords: dict = main.config.keywords
+        config = self.context.config
+        self.email = config.email
+        self.password = config.password
+        self.wb = self.context.client
+        self.offset = config.bto_offset
+        self.logger = self.context.logger
+        self.max_per_trade = self.context.max_per_trade
+        self.workers = config.workers
+        self.ticker_list = config.tickers
+        self.keywords: dict = config.keywords
+        self.parser = AlertParser(self.ticker_list, self.keywords, self.offset, self.logger)
+        self.quotes = self.wb.quotes if config.quotes['enabled'] is True else None
+
+    def parse_message(self, content: str) -> Alert:
+        with trace.span('alert.parse'):
+            alert = self.parser.parse(content)
+        self.logger.debug('Parsed alert: %s', alert)
+        return alert
 
     async def handle_message(self, content: str):
         try:
-            ticker = ''
-            direction = ''
-            exp_date = ''
-            strike_price = ''
-            lmt_price = ''
-            ticker_id = ''
-
-            msgs = content.split(" ")
-
-            for ticker in [t for t in self.ticker_list if t.lower() in content]:
-                self.logger.debug(f"Ticker found: {ticker}")
-                break
-
-            for msg in msgs:
-                try:
-                    if "/" in msg and bool(re.search(r"\d", msg)):
-                        exp_date = (datetime.strptime(msg, "%m/%d")).strftime("2023-%m-%d")                          
-                        self.logger.debug(f"Expiration date found: {exp_date}")
-
-                    elif ("c" in msg or "p" in msg) and bool(re.search(r"\d", msg)) and not strike_price:
-                        strike_price = str(re.sub(r"[a-zA-Z]", "", msg)).rstrip('0').rstrip('.') if '.' in str(re.sub(r"[a-zA-Z]", "", msg)) else str(re.sub(r"[a-zA-Z]", "", msg))
-                        direction = "call" if "c" in msg else "put"
-                        self.logger.debug(f"Strike and direction found: {strike_price}, {direction}")
-
-                    elif "." in msg and bool(re.search(r"\d", msg)) and not lmt_price:
-                        lmt_price = round(float(msg) + self.offset, 2)
-                        self.logger.debug(f"Limit price found: {lmt_price}")
-
-                    elif msg.isdigit() and not ticker_id:
-                        ticker_id = int(msg)
-                        self.logger.debug(f"Ticker ID found: {ticker_id}")
-                except Exception as e:
-                    line_number = (traceback.extract_tb(e.__traceback__))[-1][1]
-                    self.logger.warning(f'{type(e).__name__} occured on line {line_number}: {e}')
-
-            for trigger, value in self.keywords.items():
-                for value in value:
-                    if value not in content:
-                        continue
-                    if trigger == 'trim':
-                        if not ticker_id and manager.current_positions:
-                            ticker_id = manager.current_positions[-1]
-                            self.logger.info(f'Ticker ID not found. Fetching from last placed position: {ticker_id}')
-                        return await self.sell(ticker_id, True)
-                    elif trigger == 'exit':
-                        if not ticker_id and manager.current_positions:
-                            ticker_id = manager.current_positions[-1]
-                            self.logger.info(f'Ticker ID not found. Fetching from last placed position: {ticker_id}')
-                        return await self.sell(ticker_id)
-                    elif trigger == 'entry':
-                        if ticker_id and ticker:
-                            quote = self.wb.get_option_quote(
-                                stock=ticker,
-                                optionId=ticker_id
-                            )
-
-                        elif ticker and strike_price and direction:
-                            quote = self.wb.get_options_by_strike_and_expire_date(
-                                ticker,
-                                exp_date,
-                                strike_price, 
-                                direction
-                            )
-
-                        else:
-                            missing_values = []
-                            if not ticker:
-                                missing_values.append("ticker")
-                            if not strike_price:
-                                missing_values.append("strike_price")
-                            if not direction:
-                                missing_values.append("direction")
-                            
-                            raise error.MissingValueError(f"Missing values: {', '.join(missing_values)}")
-
-                        if not quote:
-                            raise error.MissingValueError(f"Quote not found: {ticker}, {strike_price}, {direction}")
-                        quote = quote[0][direction] if isinstance(quote, list) else quote['data'][0] 
-                        self.logger.debug(f"Quote found: {quote}")
-                        ticker_id = quote['tickerId']
-                        
-                        if not lmt_price:
-                            lmt_price = round((float(quote["askList"][0]['price']) + float(quote["bidList"][0]['price'])) / 2, 2)
-
-                        contract = f'{ticker} {"/".join((quote["expireDate"].split("-"))[1:])} {strike_price}{direction[0]}'
-                        return await self.entry(ticker_id, lmt_price, contract)
+            return await self.handle_alert(self.parse_message(content))
+        except Exception as e:
+            line_number = (traceback.extract_tb(e.__traceback__))[-1][1]
+            self.logger.error(f'{type(e).__name__} occured on line {line_number}: {e}')
+
+    async def handle_alert(self, alert: Alert):
+        try:
+            ticker_id = alert.ticker_id
+            trigger = alert.trigger
+
+            if trigger == 'trim_all':
+                return await self.sell_all(True)
+            elif trigger == 'exit_all':
+                return await self.sell_all()
+            elif trigger == 'trim':
+                if not ticker_id and self.manager.positions:
+                    ticker_id = self.manager.positions.last()
+                    self.logger.info('Ticker ID not found. Fetching from last placed position: %s', ticker_id)
+                return await self.sell(ticker_id, True)
+            elif trigger == 'exit':
+                if not ticker_id and self.manager.positions:
+                    ticker_id = self.manager.positions.last()
+                    self.logger.info('Ticker ID not found. Fetching from last placed position: %s', ticker_id)
+                return await self.sell(ticker_id)
+            elif trigger == 'entry':
+                return await self.entry(*await self.resolve(alert))
             
             return self.logger.warning(f'None of the criteria were met.')
                 
@@ -117,64 +76,158 @@ class Handler:
             line_number = (traceback.extract_tb(e.__traceback__))[-1][1]
             self.logger.error(f'{type(e).__name__} occured on line {line_number}: {e}')
 
+    async def resolve(self, alert: Alert):
+        '''
+        contract of an entry alert as (ticker_id, lmt_price, contract)
+        '''
+        ticker = alert.ticker
+        direction = alert.direction
+        exp_date = alert.exp_date
+        strike_price = alert.strike_price
+        lmt_price = alert.lmt_price
+        ticker_id = alert.ticker_id
+
+        option_id = ticker_id or (self.prefetcher.lookup(ticker, exp_date, strike_price, direction) if self.prefetcher and ticker and strike_price and direction else None)
+        live = self.quotes.get(option_id) if self.quotes and option_id else None
+        if live is not None:
+            self.logger.debug('Quote served from stream: %s', live)
+            if not lmt_price:
+                lmt_price = live.mid
+            contract = f'{ticker} {"/".join((live.expireDate or "--").split("-")[1:])} {strike_price}{direction[:1]}'
+            return option_id, lmt_price, contract
+
+        if ticker_id and ticker:
+            quote = await self.wb.aio.get_option_quote(
+                stock=ticker,
+                optionId=ticker_id
+            )
+
+        elif ticker and strike_price and direction:
+            if option_id:
+                self.logger.debug('Contract served from warm set: %s', option_id)
+                quote = await self.wb.aio.get_option_quote(
+                    stock=ticker,
+                    optionId=option_id
+                )
+            else:
+                quote = await self.wb.aio.get_options_by_strike_and_expire_date(
+                    ticker,
+                    exp_date,
+                    strike_price, 
+                    direction
+                )
+
+        else:
+            missing_values = []
+            if not ticker:
+                missing_values.append("ticker")
+            if not strike_price:
+                missing_values.append("strike_price")
+            if not direction:
+                missing_values.append("direction")
+
+            raise error.MissingValueError(f"Missing values: {', '.join(missing_values)}")
+
+        if not quote:
+            raise error.MissingValueError(f"Quote not found: {ticker}, {strike_price}, {direction}")
+        quote = quote[0][direction] if isinstance(quote, list) else quote['data'][0] 
+        self.logger.debug('Quote found: %s', quote)
+        ticker_id = quote['tickerId']
+
+        if not lmt_price:
+            lmt_price = round((float(quote["askList"][0]['price']) + float(quote["bidList"][0]['price'])) / 2, 2)
+
+        contract = f'{ticker} {"/".join((quote["expireDate"].split("-"))[1:])} {strike_price}{direction[0]}'
+        return ticker_id, lmt_price, contract
+
     async def entry(self, ticker_id, lmt_price, contract='Unknown'):
         try:
             quantity = math.floor(self.max_per_trade / (lmt_price * 100))
 
             if quantity <= 0:
                 raise error.LimitExceededError(f'Cannot use auto quantity. One contract ({round(lmt_price * 100, 2)}) exceeds your limit ({self.max_per_trade})')
+
+            allowed = self.risk.size(lmt_price, quantity)
+            if allowed <= 0:
+                raise error.LimitExceededError(f'Not enough buying power. One contract ({round(lmt_price * 100, 2)}) exceeds the available {round(self.risk.available(), 2)}')
+            if allowed < quantity:
+                self.logger.info('Quantity resized from %s to %s to fit the buying power', quantity, allowed)
+                quantity = allowed
             
             contract = f'{quantity}x {contract}'
             
-            await manager.lmt_order(
-                ticker_id, 
-                lmt_price, 
-                'BUY', 
-                quantity,
-                contract
-            )
+            token = self.risk.reserve(lmt_price, quantity, ticker_id)
+            try:
+                await self.manager.lmt_order(
+                    ticker_id, 
+                    lmt_price, 
+                    'BUY', 
+                    quantity,
+                    contract
+                )
+            except Exception:
+                self.risk.release(token)
+                raise
+            self.risk.placed(token)
             
         except Exception as e:
             line_number = (traceback.extract_tb(e.__traceback__))[-1][1]
             self.logger.error(f'{type(e).__name__} occured on line {line_number}: {e}')
 
-    async def sell(self, ticker_id: int, partial=False):
-        positions = self.wb.get_positions()
-        if len(positions) == 0:
-            self.logger.warning(f"No positions found")
+    async def sell(self, ticker_id: int, partial=False, index=None):
+        '''
+        index: position_index to sell from, a fresh one is downloaded when None
+        '''
+        if index is None:
+            index = await self.wb.aio.get_position_index()
+        if len(index) == 0:
+            self.logger.warning("No positions found")
             return
-        
-        for each in positions:
-            try:
-                symbol = re.match(r'^[A-Z]+', each['ticker']['symbol']).group(0) if re.match(r'^[A-Z]+', each['ticker']['symbol']) else None
-                strike = str(round(each['optionExercisePrice']))
-                tickerID = each['ticker']['tickerId']
-                amt = 0
-
-                if int(ticker_id) != int(tickerID):
-                    continue
-
-                optionType = each['optionType'][:1]
-                positionAmt = int(each['position'])
-                expiration = "/".join((each['optionExpireDate'].split("-"))[1:])
-                contract = f'{symbol} {expiration} {strike}{optionType}'
-
-                if partial is True:
-                    amt = round(positionAmt/2) if round(positionAmt/2) > 0 else 1
-
-                if amt >= positionAmt:
-                    positionAmt = amt
-
-                await manager.mkt_order(
-                    ticker_id=ticker_id,
-                    action='SELL',
-                    quant=positionAmt,
-                    contract=contract
-                )
 
-            except KeyError as e:
-                line_number = (traceback.extract_tb(e.__traceback__))[-1][1]
-                self.logger.warning(f'KeyError: {e} not found')
-            except Exception as e:
-                line_number = (traceback.extract_tb(e.__traceback__))[-1][1]
-                self.logger.error(f'{type(e).__name__} occurred on line {line_number}: {e}')
\ No newline at end of file
+        each = index.get(ticker_id)
+        if each is None:
+            self.logger.warning(f"Position not found: {ticker_id}")
+            return
+
+        try:
+            symbol = re.match(r'^[A-Z]+', each['ticker']['symbol']).group(0) if re.match(r'^[A-Z]+', each['ticker']['symbol']) else None
+            strike = str(round(float(each['optionExercisePrice'])))
+            optionType = each['optionType'][:1]
+            positionAmt = int(each['position'])
+            expiration = "/".join((each['optionExpireDate'].split("-"))[1:])
+            contract = f'{symbol} {expiration} {strike}{optionType}'
+
+            if partial is True:
+                positionAmt = trim_quantity(positionAmt)
+
+            await self.manager.mkt_order(
+                ticker_id=each['ticker']['tickerId'],
+                action='SELL',
+                quant=positionAmt,
+                contract=contract
+            )
+
+        except KeyError as e:
+            line_number = (traceback.extract_tb(e.__traceback__))[-1][1]
+            self.logger.warning(f'KeyError: {e} not found')
+        except Exception as e:
+            line_number = (traceback.extract_tb(e.__traceback__))[-1][1]
+            self.logger.error(f'{type(e).__name__} occurred on line {line_number}: {e}')
+
+    async def sell_all(self, partial=False):
+        '''
+        Trim or exit every open position, at most `workers` sell orders in flight at a time
+        '''
+        index = await self.wb.aio.get_position_index(max_age=0)
+        if len(index) == 0:
+            self.logger.warning("No positions found")
+            return
+
+        self.logger.info('%s %s positions', 'Trimming' if partial else 'Closing', len(index))
+        slots = asyncio.Semaphore(self.workers)
+
+        async def sell(ticker_id):
+            async with slots:
+                await self.sell(ticker_id, partial, index)
+
+        await asyncio.gather(*(sell(ticker_id) for ticker_id in index.ids()))
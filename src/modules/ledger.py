@@ -0,0 +1,228 @@
+import csv, glob, math, os, queue, threading, time, traceback
+
+import numpy as np
+from pandas import DataFrame, concat, read_csv
+
+COLUMNS = ('time', 'event', 'order_id', 'ticker_id', 'action', 'order_type', 'quantity', 'price', 'filled_quantity', 'avg_price', 'latency_ms', 'contract', 'source')
+NUMERIC = ('time', 'quantity', 'price', 'filled_quantity', 'avg_price', 'latency_ms')
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+def segment_paths(path):
+    '''
+    columnar segments of a ledger, oldest first
+    '''
+    return sorted(glob.glob(f'{os.path.splitext(path)[0]}-[0-9][0-9][0-9][0-9][0-9][0-9].npz'))
+
+def load_ledger(path, format='csv'):
+    '''
+    the whole ledger as a DataFrame, rotated csv files and npz segments included, oldest first
+    '''
+    if format == 'npz':
+        frames = []
+        for segment in segment_paths(path):
+            with np.load(segment) as data:
+                frames.append(DataFrame({column: data[column] for column in COLUMNS}))
+    else:
+        paths = sorted(glob.glob(f'{glob.escape(path)}.[0-9]*'), key=lambda name: int(name.rsplit('.', 1)[1]), reverse=True)
+        frames = [read_csv(name, dtype={'order_id': str, 'ticker_id': str}) for name in paths + [path] if os.path.exists(name)]
+    if not frames:
+        return DataFrame(columns=list(COLUMNS))
+    return concat(frames, ignore_index=True)
+
+class TradeLedger:
+    '''
+    Every order, fill and cancel with its timings, written off the order path.
+
+    submitted() and on_event() only put a row on a queue. A writer thread takes rows
+    in batches of up to `batch`, or whatever arrived within `flush_interval` seconds,
+    and writes each batch with one call.
+
+    csv: appended to csv_path, which is rotated to csv_path.1 .. csv_path.<backups>
+    once it grows past max_bytes.
+    npz: compressed column arrays, one <name>-NNNNNN.npz segment per `segment_rows`
+    rows and one for the rest on close(). Numbers are float64 (NaN when missing),
+    so a segment loads straight into numpy or pandas without parsing.
+
+    path: csv_path, the npz segments are named after it
+    latency_ms: submit round trip on 'submit' rows, time since the submit on status rows
+    '''
+
+    def __init__(self, path, enabled=True, format='csv', batch=64, flush_interval=1, max_bytes=10485760, backups=5, segment_rows=10000, logger=None) -> None:
+        self.path = path
+        self.enabled = enabled
+        self.format = format
+        self.batch = max(1, batch)
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.segment_rows = segment_rows
+        self.logger = logger
+        self.recorded = 0
+        self.written = 0
+        self.batches = 0
+        self.rotations = 0
+        self.segments = 0
+        self._orders = {}
+        self._last = {}
+        self._queue = queue.SimpleQueue()
+        self._file = None
+        self._writer = None
+        self._segment = []
+        self._thread = None
+        if enabled:
+            self._thread = threading.Thread(target=self._run, name='ledger', daemon=True)
+            self._thread.start()
+
+    @classmethod
+    def from_config(cls, settings, path, logger=None):
+        return cls(
+            path,
+            enabled=settings['enabled'] is True,
+            format=settings['format'],
+            batch=settings['batch'],
+            flush_interval=settings['flush_interval'],
+            max_bytes=settings['max_bytes'],
+            backups=settings['backups'],
+            segment_rows=settings['segment_rows'],
+            logger=logger
+        )
+
+    def record(self, *row):
+        if self._thread is None:
+            return
+        self.recorded += 1
+        self._queue.put(row)
+
+    def submitted(self, order):
+        '''
+        async_utils order listener, called once the order request returned
+        '''
+        order_id = str(order['orderId'])
+        self._orders[order_id] = (time.monotonic(), order['tickerId'], order['action'], order['contract'])
+        self.record(time.time(), 'submit', order_id, order['tickerId'], order['action'], order['orderType'], order['quantity'], order['lmtPrice'], None, None, order['seconds'] * 1000, order['contract'], 'api')
+
+    def on_event(self, event):
+        '''
+        order_events listener, a push and a poll of the same change are recorded once
+        '''
+        state = (event.status, event.filled_quantity)
+        if self._last.get(event.order_id) == state:
+            return
+        self._last[event.order_id] = state
+        submitted, ticker_id, action, contract = self._orders.get(event.order_id, (None, None, None, None))
+        latency = (time.monotonic() - submitted) * 1000 if submitted is not None else None
+        self.record(time.time(), event.status, event.order_id, ticker_id, action, None, None, None, event.filled_quantity, event.avg_price, latency, contract, event.source)
+        if event.terminal:
+            self._orders.pop(event.order_id, None)
+            self._last.pop(event.order_id, None)
+
+    def _run(self):
+        while True:
+            row = self._queue.get()
+            if row is None:
+                break
+            rows = [row]
+            deadline = time.monotonic() + self.flush_interval
+            closing = False
+            while len(rows) < self.batch:
+                try:
+                    row = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if row is None:
+                    closing = True
+                    break
+                rows.append(row)
+            self._write(rows)
+            if closing:
+                break
+        self._finish()
+
+    def _write(self, rows):
+        try:
+            if self.format == 'npz':
+                self._segment.extend(rows)
+                while len(self._segment) >= self.segment_rows:
+                    self._save_segment(self.segment_rows)
+            else:
+                self._write_csv(rows)
+            self.written += len(rows)
+            self.batches += 1
+        except Exception as e:
+            line_number = (traceback.extract_tb(e.__traceback__))[-1][1]
+            if self.logger:
+                self.logger.warning(f'Ledger {type(e).__name__} occurred on line {line_number}: {e}')
+
+    def _write_csv(self, rows):
+        if self._file is not None and self.max_bytes and self._file.tell() >= self.max_bytes:
+            self._rotate()
+        if self._file is None:
+            self._file = open(self.path, 'a', newline='', encoding='utf-8')
+            self._writer = csv.writer(self._file)
+            if self._file.tell() == 0:
+                self._writer.writerow(COLUMNS)
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        if self.backups <= 0:
+            os.remove(self.path)
+        else:
+            for number in range(self.backups - 1, 0, -1):
+                if os.path.exists(f'{self.path}.{number}'):
+                    os.replace(f'{self.path}.{number}', f'{self.path}.{number + 1}')
+            os.replace(self.path, f'{self.path}.1')
+        self.rotations += 1
+
+    def _save_segment(self, count=None):
+        count = len(self._segment) if count is None else count
+        rows, self._segment = self._segment[:count], self._segment[count:]
+        existing = segment_paths(self.path)
+        number = int(existing[-1][-10:-4]) + 1 if existing else 1
+        columns = {}
+        for index, column in enumerate(COLUMNS):
+            values = [row[index] for row in rows]
+            if column in NUMERIC:
+                columns[column] = np.array([_number(value) for value in values], dtype=np.float64)
+            else:
+                columns[column] = np.array(['' if value is None else str(value) for value in values])
+        np.savez_compressed(f'{os.path.splitext(self.path)[0]}-{number:06d}.npz', **columns)
+        self.segments += 1
+
+    def _finish(self):
+        try:
+            if self._segment:
+                self._save_segment()
+        except Exception as e:
+            line_number = (traceback.extract_tb(e.__traceback__))[-1][1]
+            if self.logger:
+                self.logger.warning(f'Ledger {type(e).__name__} occurred on line {line_number}: {e}')
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        '''
+        write everything recorded so far and stop the writer
+        '''
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def stats(self):
+        return {
+            'recorded': self.recorded,
+            'written': self.written,
+            'batches': self.batches,
+            'rotations': self.rotations,
+            'segments': self.segments
+        }
@@ -1,22 +1,22 @@
-import traceback, pickle, asyncio
+import traceback, asyncio
 
-import main
 from . import error
+from api.utils.trace import trace
 
 class Manager:
 
-    def __init__(self) -> None:
+    def __init__(self, context) -> None:
+        self.context = context
         self.update_vars()
 
     def update_vars(self):
-        self.config = main.config
-        self.logger = main.logger
-        self.variable_path = main.config.variable_path
-        self.frequency = main.config.frequency
-        self.wb = main.login()
-        self.auto_cancel_order = main.config.auto_cancel_order
-        with open(self.variable_path, 'rb') as file:
-            self.current_positions: list = pickle.load(file)
+        self.config = self.context.config
+        self.logger = self.context.logger
+        self.frequency = self.config.frequency
+        self.wb = self.context.client
+        self.wb.aio.manager = self
+        self.auto_cancel_order = self.config.auto_cancel_order
+        self.positions = self.context.positions
 
     async def mkt_order(self, ticker_id, action, quant, contract):
         await self.wb.place_order_option(
@@ -38,46 +38,53 @@ class Manager:
         )
 
     def new_position(self, ticker_id):
-        self.current_positions.append(ticker_id)
-        with open(self.variable_path, 'wb') as file:
-            pickle.dump(self.current_positions, file)
+        self.positions.add(ticker_id)
 
-        self.logger.debug(f'New position appended to monitor: {ticker_id}')
-        self.logger.debug(f'New current positions list: {self.current_positions}')
+        self.logger.debug('New position appended to monitor: %s', ticker_id)
+        self.logger.debug('New current positions list: %s', list(self.positions))
 
     def remove_position(self, ticker: int):
-        if ticker in self.current_positions:
-            self.current_positions.remove(ticker)
-            with open(self.variable_path, 'wb') as file:
-                pickle.dump(self.current_positions, file)
-
-            self.logger.debug(f'Position removed from monitor: {ticker}')
-            self.logger.debug(f'New current positions list: {self.current_positions}')
+        if self.positions.remove(ticker):
+            self.logger.debug('Position removed from monitor: %s', ticker)
+            self.logger.debug('New current positions list: %s', list(self.positions))
 
         else:   
             self.logger.warning(f'Position not found in monitor: {ticker}')
-            self.logger.warning(f'Current positions list: {self.current_positions}')
+            self.logger.warning(f'Current positions list: {self.positions.positions}')
 
     async def check_order(self, orderID, action, contract, tickerID):
+        events = self.wb.events
+        events.watch(orderID)
         try:
-            for i in range(self.frequency[1]):
-                await asyncio.sleep(self.frequency[0])
-                past = self.wb.get_history_orders(status='Filled', count=10, action=action)
-                for order in [o for o in past if o['orderId'] == int(orderID) and self.auto_cancel_order is True]:
-                    self.logger.info(f'''{action} order {orderID} filled
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            deadline = start + self.frequency[0] * self.frequency[1]
+            while (event := await events.wait(orderID, deadline - loop.time())) is not None:
+                if event.status == 'Partially Filled':
+                    self.logger.info('%s order %s partially filled: %s @ %s', action, orderID, event.filled_quantity, event.avg_price)
+                    continue
+
+                if event.status == 'Filled':
+                    trace.observe(f'order.fill.{event.source}', loop.time() - start)
+                    self.logger.info('''%s order %s filled
     ----------------
-    Contract: {contract}
-    Total value: {order['filledValue']}
-    Average fill: {round(float(order['avgFilledPrice']), 2)}
-    ----------------''')
-                    
-                    if orderID not in self.current_positions:
+    Contract: %s
+    Total value: %s
+    Average fill: %.2f
+    ----------------''', action, orderID, contract, event.filled_value, float(event.avg_price))
+
+                    if action == 'BUY':
                         self.new_position(tickerID)
                     else:
                         self.remove_position(tickerID)
                     return
 
-            if action == 'BUY' and self.wb.cancel_order(orderID) is True:
+                if event.terminal:
+                    self.logger.warning(f'{action} order {orderID} {event.status.lower()}: {contract}')
+                    return
+
+            if action == 'BUY' and self.auto_cancel_order is True and await self.wb.aio.cancel_order(orderID) is True:
+                events.cancelled(orderID)
                 raise error.OrderFailedError(f'Cancelling order {orderID} as it was not filled.')
             
         except error.OrderFailedError as e:
@@ -86,4 +93,6 @@ class Manager:
             return None, None
         except Exception as e:
             line_number = (traceback.extract_tb(e.__traceback__))[-1][1]
-            self.logger.error(f'{type(e).__name__} occurred on line {line_number}: {e}')
\ No newline at end of file
+            self.logger.error(f'{type(e).__name__} occurred on line {line_number}: {e}')
+        finally:
+            events.forget(orderID)
\ No newline at end of file
@@ -0,0 +1,161 @@
+import re, traceback
+from collections import deque
+from dataclasses import dataclass
+from datetime import date
+from functools import lru_cache
+
+DIGIT = re.compile(r'\d')
+LETTERS = re.compile(r'[a-zA-Z]')
+DATE = re.compile(r'(\d{1,2})/(\d{1,2})')
+
+def expiration(month, day, today=None):
+    '''
+    next expiration on month/day, a date already past this year is next year's
+    '''
+    today = today or date.today()
+    expiry = date(today.year, month, day)
+    if expiry < today:
+        expiry = date(today.year + 1, month, day)
+    return expiry
+
+@dataclass(frozen=True, slots=True)
+class Alert:
+    ticker: str = ''
+    direction: str = ''
+    exp_date: str = ''
+    strike_price: str = ''
+    lmt_price: float | str = ''
+    ticker_id: int | str = ''
+    trigger: str = ''
+
+class KeywordMatcher:
+    '''
+    Aho-Corasick automaton over a fixed set of words.
+    One pass over a text finds every word occurring anywhere in it, however many words there are.
+    '''
+
+    def __init__(self, words) -> None:
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [set()]
+        for word in words:
+            self.add(word)
+        self.build()
+
+    def add(self, word):
+        state = 0
+        for char in word:
+            if char not in self.goto[state]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append(set())
+                self.goto[state][char] = len(self.goto) - 1
+            state = self.goto[state][char]
+        self.out[state].add(word)
+
+    def build(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.out[child] |= self.out[self.fail[child]]
+
+    def find(self, text):
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            if self.out[state]:
+                found |= self.out[state]
+        return found
+
+class AlertParser:
+    '''
+    Alert parser compiled once from the configured tickers and trigger keywords.
+
+    Tickers and keywords are found with one automaton pass over the message, the
+    tokens with precompiled patterns. Results are cached, so a pasted alert that
+    comes in again is not parsed twice.
+
+    Matches the rules of the original parser: the first configured ticker contained
+    in the message, the first trigger with a keyword contained in the message, and
+    per token an expiration (m/d), a strike with c/p, a limit price or a tickerId.
+    '''
+
+    def __init__(self, tickers, keywords, offset, logger, cache_size=1024) -> None:
+        self.tickers = list(tickers)
+        self.keywords = dict(keywords)
+        self.offset = offset
+        self.logger = logger
+
+        # lower case word -> (priority, value), the lowest priority wins like the first hit of the old loops
+        self.ticker_words = {}
+        for i, ticker in enumerate(self.tickers):
+            self.ticker_words.setdefault(ticker.lower(), (i, ticker))
+        self.trigger_words = {}
+        self.default_trigger = ''
+        for i, (trigger, words) in enumerate(self.keywords.items()):
+            for word in words:
+                if word:
+                    self.trigger_words.setdefault(word, (i, trigger))
+                elif not self.default_trigger:
+                    # an empty keyword is in every message
+                    self.default_trigger = (i, trigger)
+
+        self.matcher = KeywordMatcher(set(self.ticker_words) | set(self.trigger_words))
+        self.parse = lru_cache(maxsize=cache_size)(self._parse)
+
+    def _first(self, found, words, default=''):
+        hits = [words[word] for word in found if word in words]
+        if default:
+            hits.append(default)
+        return min(hits)[1] if hits else ''
+
+    def _parse(self, content: str) -> Alert:
+        found = self.matcher.find(content)
+        ticker = self._first(found, self.ticker_words)
+        trigger = self._first(found, self.trigger_words, self.default_trigger)
+
+        direction = ''
+        exp_date = ''
+        strike_price = ''
+        lmt_price = ''
+        ticker_id = ''
+
+        for msg in content.split(' '):
+            if not DIGIT.search(msg):
+                continue
+            try:
+                if '/' in msg:
+                    match = DATE.fullmatch(msg)
+                    if not match:
+                        raise ValueError(f"time data '{msg}' does not match format '%m/%d'")
+                    exp_date = expiration(int(match[1]), int(match[2])).isoformat()
+
+                elif ('c' in msg or 'p' in msg) and not strike_price:
+                    strike_price = LETTERS.sub('', msg)
+                    if '.' in strike_price:
+                        strike_price = strike_price.rstrip('0').rstrip('.')
+                    direction = 'call' if 'c' in msg else 'put'
+
+                elif '.' in msg and not lmt_price:
+                    lmt_price = round(float(msg) + self.offset, 2)
+
+                elif msg.isdigit() and not ticker_id:
+                    ticker_id = int(msg)
+            except Exception as e:
+                line_number = (traceback.extract_tb(e.__traceback__))[-1][1]
+                self.logger.warning(f'{type(e).__name__} occured on line {line_number}: {e}')
+
+        return Alert(ticker, direction, exp_date, strike_price, lmt_price, ticker_id, trigger)
+
+    def stats(self):
+        info = self.parse.cache_info()
+        return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize}
@@ -0,0 +1,86 @@
+import asyncio, threading, time, traceback
+
+import main
+from .parser import Alert
+from api.utils.trace import trace, table
+
+class Pipeline:
+    '''
+    Reads alerts from stdin into a queue and handles them concurrently on one loop.
+
+    At most `workers` alerts are handled at the same time. Alerts for the same
+    contract run in the order they arrived. A trim/exit is keyed like the position the
+    handler sells: its tickerId, or else the last entry, so it never overtakes that entry.
+    A trim all/exit all waits for every alert dispatched before it.
+    '''
+
+    def __init__(self, handler, workers) -> None:
+        self.handler = handler
+        self.logger = main.logger
+        self.queue = asyncio.Queue()
+        self.slots = asyncio.Semaphore(workers)
+        self.tails = {}
+        self.last_key = None
+
+    def key(self, alert: Alert):
+        if alert.ticker_id:
+            return str(alert.ticker_id)
+        if alert.trigger != 'entry':
+            # a trim/exit without a ticker id sells the last placed position, whatever contract it names
+            return self.last_key
+        if alert.ticker and alert.strike_price and alert.direction:
+            return f'{alert.ticker} {alert.exp_date} {alert.strike_price}{alert.direction[0]}'
+        return self.last_key
+
+    def read_input(self, loop):
+        while True:
+            try:
+                line = input('> ')
+            except EOFError:
+                line = None
+            loop.call_soon_threadsafe(self.queue.put_nowait, line)
+            if line is None:
+                return
+
+    def dispatch(self, content: str):
+        alert = self.handler.parse_message(content)
+        if alert.trigger.endswith('_all'):
+            key = '*'
+            previous = list(self.tails.values())
+        else:
+            key = self.key(alert)
+            previous = [task for task in (self.tails.get(key), self.tails.get('*')) if task is not None]
+        if alert.trigger == 'entry':
+            self.last_key = key
+
+        task = asyncio.create_task(self.process(alert, previous))
+        self.tails[key] = task
+        task.add_done_callback(lambda done: self.tails.pop(key) if self.tails.get(key) is done else None)
+        return task
+
+    async def process(self, alert: Alert, previous=()):
+        start = time.perf_counter()
+        if previous:
+            await asyncio.wait(previous)
+
+        async with self.slots:
+            trace.observe('alert.wait', time.perf_counter() - start)
+            try:
+                with trace.span(f'alert.{alert.trigger or "unknown"}'):
+                    await self.handler.handle_alert(alert)
+            except Exception as e:
+                line_number = (traceback.extract_tb(e.__traceback__))[-1][1]
+                self.logger.error(f'{type(e).__name__} occurred on line {line_number}: {e}')
+
+    async def run(self):
+        threading.Thread(target=self.read_input, args=(asyncio.get_running_loop(),), daemon=True).start()
+
+        while (content := await self.queue.get()) is not None:
+            content = content.lower()
+            if content == 'metrics':
+                print(table(trace.snapshot()))
+            elif content:
+                self.dispatch(content)
+
+        if self.tails:
+            await asyncio.wait(list(self.tails.values()))
@@ -0,0 +1,92 @@
+import asyncio, traceback
+from datetime import datetime, time
+from pytz import timezone
+
+import main
+
+eastern = timezone('America/New_York')
+
+def market_open(now=None):
+    now = (now or datetime.now(eastern)).astimezone(eastern)
+    return now.weekday() < 5 and time(9, 30) <= now.time() <= time(16, 0)
+
+class Prefetcher:
+    '''
+    Keeps near-the-money option tickerIds of the configured tickers resolved in memory,
+    so an entry can go straight to the quote and order calls.
+    '''
+
+    def __init__(self, wb, tickers, settings, quotes=None) -> None:
+        self.wb = wb
+        self.quotes = quotes
+        self.logger = main.logger
+        self.tickers = tickers
+        self.expirations = settings['expirations']
+        self.strikes = settings['strikes']
+        self.interval = settings['interval']
+        self.market_hours_only = settings['market_hours_only']
+        self.contracts = {}
+        self.front = {}
+        self.warm = 0
+        self.cold = 0
+
+    def lookup(self, ticker, exp_date, strike, direction):
+        '''
+        option tickerId from the warm set, or None
+        '''
+        contracts = self.contracts.get(ticker, {})
+        try:
+            ticker_id = contracts.get((exp_date or self.front.get(ticker), float(strike), direction))
+        except ValueError:
+            ticker_id = None
+
+        if ticker_id is None:
+            self.cold += 1
+        else:
+            self.warm += 1
+        return ticker_id
+
+    def stats(self):
+        entries = self.warm + self.cold
+        return {
+            'entries': entries,
+            'warm': self.warm,
+            'cold': self.cold,
+            'warm_ratio': round(self.warm / entries, 4) if entries else 0.0,
+            'contracts': sum(len(c) for c in self.contracts.values())
+        }
+
+    async def refresh(self, ticker):
+        quote = await self.wb.aio.get_quote(stock=ticker)
+        price = float(quote.get('close') or quote.get('pPrice'))
+        dates = await self.wb.aio.get_options_expiration_dates(ticker)
+
+        contracts = {}
+        entries = []
+        for d in dates[:self.expirations]:
+            chain = await self.wb.aio.get_option_chain(ticker, str(d['date']))
+            for row in chain.nearest(price, self.strikes):
+                for direction in ('call', 'put'):
+                    if direction in row:
+                        contracts[(chain.expireDate, float(row['strikePrice']), direction)] = row[direction]['tickerId']
+                        entries.append(row[direction])
+
+        # swap whole dicts so lookups never see a half built set
+        self.contracts[ticker] = contracts
+        if dates:
+            self.front[ticker] = str(dates[0]['date'])
+
+        if self.quotes is not None:
+            self.quotes.seed(entries)
+            self.quotes.watch(ticker_id for contracts in self.contracts.values() for ticker_id in contracts.values())
+
+    async def run(self):
+        while True:
+            if not self.market_hours_only or market_open():
+                results = await asyncio.gather(*[self.refresh(ticker) for ticker in self.tickers], return_exceptions=True)
+                for ticker, result in zip(self.tickers, results):
+                    if isinstance(result, Exception):
+                        line_number = (traceback.extract_tb(result.__traceback__))[-1][1]
+                        self.logger.warning(f'Prefetch failed for {ticker}: {type(result).__name__} occurred on line {line_number}: {result}')
+                self.logger.debug('Prefetched contracts: %s', self.stats())
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,128 @@
+import asyncio, itertools, math, time, traceback
+
+def order_cost(order):
+    '''
+    cash still committed to an open order, in dollars
+    '''
+    cost = 0.0
+    for leg in order.get('orders') or [order]:
+        if leg.get('action', order.get('action')) != 'BUY':
+            continue
+        price = leg.get('lmtPrice', order.get('lmtPrice'))
+        if price in (None, ''):
+            continue
+        remaining = float(leg.get('totalQuantity') or leg.get('quantity') or 0) - float(leg.get('filledQuantity') or 0)
+        multiplier = 100 if (leg.get('tickerType') or order.get('tickerType') or 'OPTION') == 'OPTION' else 1
+        cost += max(0.0, remaining) * float(price) * multiplier
+    return cost
+
+class RiskEngine:
+    '''
+    Pre-trade buying power check answered from local state.
+
+    Buying power and the cash held by open buy orders are taken from every account
+    snapshot that is downloaded anyway. Entries placed since the last snapshot are
+    reserved here until a snapshot requested after they were placed takes them over,
+    so concurrent entries never spend the same buying power twice.
+    Until the first snapshot arrives every order is let through.
+    '''
+
+    def __init__(self, context) -> None:
+        self.context = context
+        self.buying_power = None
+        self.committed = 0.0
+        self.checks = 0
+        self.resized = 0
+        self.rejected = 0
+        self._reserved = {}
+        self._tokens = itertools.count()
+        self.update_vars()
+
+    def update_vars(self):
+        config = self.context.config
+        self.logger = self.context.logger
+        self.enabled = config.risk['enabled'] is True
+        self.reserve_open_orders = config.risk['reserve_open_orders'] is True
+        self.min_buying_power = config.risk['min_buying_power']
+        self.refresh_interval = config.risk['refresh_interval']
+        self.wb = self.context.client
+        self.wb.aio.snapshots.on_snapshot = self.sync
+        if self.on_order not in self.wb.aio.order_listeners:
+            self.wb.aio.order_listeners.append(self.on_order)
+
+    def sync(self, snapshot):
+        self.buying_power = snapshot.buying_power
+        self.committed = sum(order_cost(order) for order in snapshot.open_orders) if self.reserve_open_orders else 0.0
+        # entries placed before this snapshot was requested are part of it now
+        self._reserved = {token: entry for token, entry in self._reserved.items() if entry[1] is None or entry[1] >= snapshot.fetched}
+
+    def available(self):
+        if self.buying_power is None:
+            return math.inf
+        return self.buying_power - self.committed - sum(entry[0] for entry in self._reserved.values()) - self.min_buying_power
+
+    def size(self, lmt_price, quantity):
+        '''
+        largest quantity up to the requested one that the buying power covers
+        '''
+        self.checks += 1
+        if not self.enabled or self.buying_power is None or lmt_price <= 0:
+            return quantity
+        allowed = min(quantity, max(0, math.floor(self.available() / (lmt_price * 100))))
+        if allowed <= 0:
+            self.rejected += 1
+        elif allowed < quantity:
+            self.resized += 1
+        return allowed
+
+    def reserve(self, lmt_price, quantity, ticker_id=None):
+        '''
+        hold the cost of an entry about to be placed, returns a token for placed() / release()
+        '''
+        token = next(self._tokens)
+        self._reserved[token] = (lmt_price * quantity * 100, None, ticker_id)
+        return token
+
+    def placed(self, token):
+        '''
+        the order is with the broker, the next snapshot requested from now on contains it
+        '''
+        entry = self._reserved.get(token)
+        if entry is not None and entry[1] is None:
+            self._reserved[token] = (entry[0], time.monotonic(), entry[2])
+
+    def on_order(self, order):
+        '''
+        order listener of the api, marks the entry placed as soon as the order request
+        returned instead of after the fill wait, which can outlast several snapshots
+        '''
+        if order['action'] != 'BUY':
+            return
+        for token, entry in self._reserved.items():
+            if entry[1] is None and entry[2] is not None and str(entry[2]) == str(order['tickerId']):
+                return self.placed(token)
+
+    def release(self, token):
+        self._reserved.pop(token, None)
+
+    async def run(self):
+        '''
+        keep buying power current while nothing else reads the account
+        '''
+        while True:
+            try:
+                await self.wb.aio.get_snapshot(max_age=self.refresh_interval)
+            except Exception as e:
+                line_number = (traceback.extract_tb(e.__traceback__))[-1][1]
+                self.logger.warning(f'Buying power refresh {type(e).__name__} occurred on line {line_number}: {e}')
+            await asyncio.sleep(self.refresh_interval)
+
+    def stats(self):
+        return {
+            'buying_power': self.buying_power,
+            'committed': round(self.committed, 2),
+            'reserved': round(sum(entry[0] for entry in self._reserved.values()), 2),
+            'checks': self.checks,
+            'resized': self.resized,
+            'rejected': self.rejected
+        }
@@ -0,0 +1,152 @@
+import json, os, pickle, threading, zlib
+
+class PositionStore:
+    '''
+    Open positions (option tickerIds, oldest first) kept in memory and journaled to disk.
+
+    Every change is appended to the journal as one checksummed json line, so a fill
+    costs one small write instead of rewriting the whole list. After `compact_after`
+    appends the journal is rewritten as a single snapshot line, which keeps loading
+    proportional to the changes since the last compaction.
+
+    A line cut short by a crash fails its checksum; loading stops there and the
+    journal is truncated back to the last complete change.
+
+    path: journal file
+    fsync: flush every append to disk before returning
+    compact_after: appends before the journal is compacted, 0 never compacts
+    legacy_path: pickled list of a previous version, imported when there is no journal yet
+    '''
+
+    def __init__(self, path, fsync=True, compact_after=256, legacy_path=None) -> None:
+        self.path = path
+        self.fsync = fsync
+        self.compact_after = compact_after
+        self.positions = []
+        self.appended = 0
+        self._file = None
+        self._lock = threading.Lock()
+        self.load(legacy_path)
+
+    @classmethod
+    def from_config(cls, settings, legacy_path=None):
+        return cls(settings['path'], fsync=settings['fsync'], compact_after=settings['compact_after'], legacy_path=legacy_path)
+
+    def __contains__(self, ticker_id):
+        return ticker_id in self.positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __iter__(self):
+        return iter(list(self.positions))
+
+    def last(self):
+        return self.positions[-1] if self.positions else None
+
+    def add(self, ticker_id):
+        with self._lock:
+            self.positions.append(ticker_id)
+            self._append({'op': 'add', 'id': ticker_id})
+
+    def remove(self, ticker_id):
+        '''
+        False if the position was not open
+        '''
+        with self._lock:
+            if ticker_id not in self.positions:
+                return False
+            self.positions.remove(ticker_id)
+            self._append({'op': 'remove', 'id': ticker_id})
+            return True
+
+    @staticmethod
+    def _encode(record):
+        data = json.dumps(record, separators=(',', ':'))
+        return f'{zlib.crc32(data.encode("utf-8")):08x} {data}\n'.encode('utf-8')
+
+    @staticmethod
+    def _decode(line):
+        if not line.endswith(b'\n'):
+            return None
+        checksum, _, data = line.rstrip(b'\n').partition(b' ')
+        try:
+            if int(checksum, 16) != zlib.crc32(data):
+                return None
+            return json.loads(data)
+        except ValueError:
+            return None
+
+    def _apply(self, record):
+        if record['op'] == 'snapshot':
+            self.positions = list(record['positions'])
+        elif record['op'] == 'add':
+            self.positions.append(record['id'])
+        elif record['op'] == 'remove' and record['id'] in self.positions:
+            self.positions.remove(record['id'])
+
+    def load(self, legacy_path=None):
+        if not os.path.exists(self.path):
+            if legacy_path and os.path.exists(legacy_path):
+                with open(legacy_path, 'rb') as file:
+                    self.positions = list(pickle.load(file))
+            self.compact()
+            return
+
+        good = 0
+        with open(self.path, 'rb') as file:
+            for line in file:
+                record = self._decode(line)
+                if record is None:
+                    break
+                self._apply(record)
+                good += len(line)
+                self.appended += 1
+
+        # drop a torn tail so new appends start on a clean line
+        if good != os.path.getsize(self.path):
+            with open(self.path, 'r+b') as file:
+                file.truncate(good)
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, 'ab')
+        return self._file
+
+    def _append(self, record):
+        file = self._open()
+        file.write(self._encode(record))
+        file.flush()
+        if self.fsync:
+            os.fsync(file.fileno())
+        self.appended += 1
+        if self.compact_after and self.appended >= self.compact_after:
+            self._compact()
+
+    def compact(self):
+        with self._lock:
+            self._compact()
+
+    def _compact(self):
+        '''
+        Rewrite the journal as one snapshot, write then rename so a crash leaves either file whole
+        '''
+        self.close()
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(self._encode({'op': 'snapshot', 'positions': self.positions}))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.path)
+        if self.fsync and hasattr(os, 'O_DIRECTORY'):
+            fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        self.appended = 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,38 @@
+import unittest, asyncio
+
+class AsyncTestCase(unittest.TestCase):
+    def run_async(self, coro):
+        '''
+        run a scenario on a fresh loop, closed afterwards
+        '''
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            loop.close()
+
+class FakeClient:
+    '''
+    async_utils stand-in: serves `orders` as order history and a quote for any option id,
+    counts the requests in `calls` and records cancelled order ids in `cancels`
+    '''
+    def __init__(self, orders=None):
+        self.orders = orders or []
+        self.calls = 0
+        self.cancels = []
+
+    async def get_history_orders(self, status='All', count=20, action=''):
+        self.calls += 1
+        return self.orders
+
+    async def get_current_orders(self):
+        self.calls += 1
+        return []
+
+    async def get_option_quotes(self, optionIds, stock=None, tId=None, batch=50):
+        self.calls += 1
+        return {i: {'tickerId': i, 'bidList': [{'price': '1.00'}], 'askList': [{'price': '1.10'}], 'expireDate': '2023-12-01'} for i in optionIds}
+
+    async def cancel_order(self, order_id):
+        self.cancels.append(order_id)
+        return True
@@ -0,0 +1,95 @@
+import unittest, asyncio
+from helpers import AsyncTestCase, FakeClient
+from api.utils.orders import order_events
+from api.utils.push import fake_broker
+
+class TestOrderEvents(AsyncTestCase):
+    def test_push_wakes_waiter(self):
+        async def scenario():
+            client, broker = FakeClient(), fake_broker()
+            events = order_events(client, poll_interval=60)
+            self.assertTrue(await events.start(broker))
+            events.watch(101)
+
+            loop = asyncio.get_running_loop()
+            loop.call_later(0.01, broker.order, 101, 'Partially Filled', 1, 1.25)
+            loop.call_later(0.02, broker.order, 101, 'Filled', 2, 1.25)
+            partial = await events.wait(101, timeout=1)
+            filled = await events.wait(101, timeout=1)
+            events.forget(101)
+            await events.stop()
+            return client, partial, filled
+
+        client, partial, filled = self.run_async(scenario())
+        self.assertEqual(partial.status, 'Partially Filled')
+        self.assertEqual(filled.status, 'Filled')
+        self.assertTrue(filled.terminal)
+        self.assertEqual(client.calls, 0)
+
+    def test_event_before_watch(self):
+        async def scenario():
+            broker = fake_broker()
+            events = order_events(FakeClient(), poll_interval=60)
+            await events.start(broker)
+            broker.order(7, 'Cancelled', 0)
+            await asyncio.sleep(0)
+            events.watch(7)
+            return await events.wait(7, timeout=1)
+
+        self.assertEqual(self.run_async(scenario()).status, 'Cancelled')
+
+    def test_timeout(self):
+        async def scenario():
+            events = order_events(FakeClient(), poll_interval=60)
+            await events.start(fake_broker())
+            events.watch(8)
+            return await events.wait(8, timeout=0.01)
+
+        self.assertIsNone(self.run_async(scenario()))
+
+    def test_polling_fallback(self):
+        async def scenario():
+            client, broker = FakeClient(), fake_broker(connects=False)
+            client.orders = [{'orderId': 9, 'status': 'Filled', 'filledQuantity': 1, 'avgFilledPrice': 2.0, 'filledValue': 200}]
+            events = order_events(client, poll_interval=0.01, min_interval=0.01)
+            self.assertFalse(await events.start(broker))
+            events.watch(9)
+            return client, await events.wait(9, timeout=1)
+
+        client, event = self.run_async(scenario())
+        self.assertEqual(event.source, 'poll')
+        self.assertEqual(event.filled_value, 200)
+        self.assertEqual(client.calls, 1)
+
+    def test_one_poll_for_many_orders(self):
+        async def scenario():
+            client = FakeClient()
+            client.orders = [{'orderId': i, 'status': 'Filled', 'filledQuantity': 1} for i in range(5)]
+            events = order_events(client, poll_interval=0.05, min_interval=0.01)
+            await events.start(fake_broker(connects=False))
+            for i in range(5):
+                events.watch(i)
+            self.assertEqual(events.interval(), 0.01)
+            filled = await asyncio.gather(*[events.wait(i, timeout=1) for i in range(5)])
+            await asyncio.sleep(0.05)
+            return client, filled
+
+        client, filled = self.run_async(scenario())
+        self.assertTrue(all(event.status == 'Filled' for event in filled))
+        self.assertEqual(client.calls, 1)
+
+    def test_drop_starts_polling(self):
+        async def scenario():
+            client, broker = FakeClient(), fake_broker()
+            client.orders = [{'orderId': 10, 'status': 'Cancelled'}]
+            events = order_events(client, poll_interval=0.01, min_interval=0.01)
+            await events.start(broker)
+            events.watch(10)
+            broker.drop()
+            return await events.wait(10, timeout=1)
+
+        event = self.run_async(scenario())
+        self.assertEqual((event.status, event.source), ('Cancelled', 'poll'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest, asyncio, logging, time
+from modules.context import AccountContext
+from modules.error import ConfigError
+from modules.fanout import Fanout
+from modules.parser import Alert
+
+class handler:
+    '''
+    records calls, every entry takes the same time
+    '''
+    def __init__(self, calls):
+        self.calls = calls
+
+    async def resolve(self, alert):
+        self.calls.append(('resolve', self))
+        return 1234, 1.05, 'SPX 12/01 4550c'
+
+    async def entry(self, ticker_id, lmt_price, contract):
+        self.calls.append(('entry', self, ticker_id))
+        await asyncio.sleep(0.05)
+
+    async def handle_alert(self, alert):
+        self.calls.append((alert.trigger, self))
+
+class TestFanout(unittest.TestCase):
+    def test_entry_resolved_once_and_placed_together(self):
+        calls = []
+        handlers = [handler(calls) for _ in range(10)]
+        fanout = Fanout(handlers, logging.getLogger('test'))
+        start = time.perf_counter()
+        asyncio.run(fanout.handle_alert(Alert(trigger='entry')))
+        elapsed = time.perf_counter() - start
+        self.assertEqual([call for call in calls if call[0] == 'resolve'], [('resolve', handlers[0])])
+        self.assertEqual([call[1] for call in calls if call[0] == 'entry'], handlers)
+        # ten accounts take about as long as one
+        self.assertLess(elapsed, 0.25)
+
+    def test_exit_on_every_account(self):
+        calls = []
+        handlers = [handler(calls) for _ in range(3)]
+        asyncio.run(Fanout(handlers, logging.getLogger('test')).handle_alert(Alert(trigger='exit_all')))
+        self.assertEqual(calls, [('exit_all', each) for each in handlers])
+
+class TestAccountContext(unittest.TestCase):
+    def test_unknown_api_type_names_the_account(self):
+        with self.assertRaisesRegex(ConfigError, 'copy1'):
+            AccountContext({'name': 'copy1', 'api_type': 'demo'}, None)
+
+if __name__ == '__main__':
+    unittest.main()
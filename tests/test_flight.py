@@ -0,0 +1,77 @@
+import unittest, asyncio
+from helpers import AsyncTestCase
+from api.utils.flight import single_flight, coalesce
+from api.utils.async_transport import run_sync
+
+class FakeApi:
+    def __init__(self):
+        self.flights = single_flight()
+        self.requests = 0
+
+    @coalesce
+    async def get_option_quote(self, stock=None, tId=None, optionId=None):
+        self.requests += 1
+        await asyncio.sleep(0.01)
+        return {'data': [{'tickerId': optionId}]}
+
+class TestSingleFlight(AsyncTestCase):
+    def test_identical_calls_share_one_request(self):
+        async def scenario():
+            api = FakeApi()
+            results = await asyncio.gather(
+                *[api.get_option_quote(stock='SPX', optionId=1) for _ in range(5)],
+                api.get_option_quote('SPX', None, 1),
+                api.get_option_quote(stock='SPX', optionId=2)
+            )
+            # finished calls are not reused
+            await api.get_option_quote(stock='SPX', optionId=1)
+            return api, results
+
+        api, results = self.run_async(scenario())
+        self.assertEqual(api.requests, 3)
+        self.assertTrue(all(result is results[0] for result in results[:6]))
+        self.assertEqual(results[6]['data'][0]['tickerId'], 2)
+        self.assertEqual(api.flights.stats(), {'get_option_quote': {'calls': 3, 'saved': 5}})
+
+    def test_errors_reach_every_caller(self):
+        async def scenario():
+            flights = single_flight()
+            async def fail():
+                await asyncio.sleep(0.01)
+                raise ValueError('down')
+            return await asyncio.gather(*[flights.do(('quote', 1), fail) for _ in range(3)], return_exceptions=True), flights
+
+        results, flights = self.run_async(scenario())
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertFalse(flights.in_flight(('quote', 1)))
+
+    def test_drain_waits_for_abandoned_calls(self):
+        async def scenario():
+            api = FakeApi()
+            caller = asyncio.ensure_future(api.get_option_quote(stock='SPX', optionId=1))
+            await asyncio.sleep(0)
+            caller.cancel()
+            # the call keeps running without its caller
+            self.assertTrue(api.flights.in_flight(('get_option_quote', 'SPX', None, 1)))
+            await api.flights.drain()
+            return api
+
+        api = self.run_async(scenario())
+        self.assertFalse(api.flights.in_flight(('get_option_quote', 'SPX', None, 1)))
+        self.assertEqual(api.requests, 1)
+
+    def test_sync_bridge_does_not_share_across_loops(self):
+        async def scenario():
+            api = FakeApi()
+            pending = asyncio.ensure_future(api.get_option_quote(stock='SPX', optionId=1))
+            await asyncio.sleep(0)
+            # a blocking wrapper runs the same call on the bridge loop meanwhile
+            bridged = await asyncio.wait_for(asyncio.get_running_loop().run_in_executor(None, run_sync, api.get_option_quote(stock='SPX', optionId=1)), 1)
+            return api, await pending, bridged
+
+        api, result, bridged = self.run_async(scenario())
+        self.assertEqual(result, bridged)
+        self.assertEqual(api.requests, 2)
+
+if __name__ == '__main__':
+    unittest.main()
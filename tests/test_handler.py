@@ -0,0 +1,13 @@
+import unittest
+from modules.handler import trim_quantity
+
+class TestTrim(unittest.TestCase):
+    def test_half_of_the_position(self):
+        self.assertEqual(trim_quantity(10), 5)
+        self.assertEqual(trim_quantity(3), 2)
+
+    def test_at_least_one_contract(self):
+        self.assertEqual(trim_quantity(1), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest, asyncio
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+from api.utils.account import account
+from api.utils.session import tokens
+
+def logged_in():
+    # an account without the login requests
+    wb = object.__new__(account)
+    wb._headers = MappingProxyType({'User-Agent': 'test', 'lzone': 'dc_core_r001', 'did': 'device'})
+    wb._base_headers = None
+    wb._did = 'device'
+    wb._tokens = tokens('access-1', trade_token='trade-1')
+    wb.zone_var = 'dc_core_r002'
+    return wb
+
+class TestRequestHeaders(unittest.TestCase):
+    def test_concurrent_requests_keep_their_reqid(self):
+        wb = logged_in()
+
+        async def request(sent):
+            headers = wb.build_req_headers(include_trade_token=True, include_time=True)
+            reqid = headers['reqid']
+            # every other request builds its headers while this one waits on the network
+            await asyncio.sleep(0)
+            sent.append((reqid, headers['reqid']))
+
+        async def scenario():
+            sent = []
+            await asyncio.gather(*[request(sent) for _ in range(500)])
+            return sent
+
+        sent = asyncio.run(scenario())
+        self.assertTrue(all(before == after for before, after in sent))
+        self.assertEqual(len({reqid for reqid, _ in sent}), 500)
+
+        with ThreadPoolExecutor(8) as pool:
+            reqids = list(pool.map(lambda _: wb.build_req_headers()['reqid'], range(2000)))
+        self.assertEqual(len(set(reqids)), 2000)
+
+    def test_session_fields(self):
+        wb = logged_in()
+        headers = wb.build_req_headers(include_trade_token=True)
+        self.assertEqual((headers['access_token'], headers['t_token'], headers['lzone'], headers['did']), ('access-1', 'trade-1', 'dc_core_r002', 'device'))
+        self.assertNotIn('t_time', headers)
+        self.assertEqual(wb.build_req_headers(include_zone_var=False)['lzone'], 'dc_core_r001')
+
+        # changing a returned dict changes nothing else
+        headers['access_token'] = 'changed'
+        self.assertNotIn('reqid', wb._headers)
+        self.assertEqual(wb.build_req_headers()['access_token'], 'access-1')
+
+        # a refreshed session is picked up by the next request
+        wb._access_token = 'access-2'
+        self.assertEqual(wb.build_req_headers()['access_token'], 'access-2')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest, asyncio, logging, os, tempfile
+from types import SimpleNamespace
+from helpers import FakeClient
+from api.utils.orders import order_event, order_events
+from api.utils.push import fake_broker
+from modules.ledger import TradeLedger, load_ledger, segment_paths
+from modules.manager import Manager
+
+def order(order_id, ticker_id=1):
+    return {'orderId': order_id, 'tickerId': ticker_id, 'action': 'BUY', 'orderType': 'LMT', 'quantity': 2, 'lmtPrice': 1.5, 'contract': f'2x SPX {ticker_id}c', 'seconds': 0.01}
+
+class TestTradeLedger(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'trades.csv')
+
+    def test_order_and_fills(self):
+        ledger = TradeLedger(self.path, batch=4, flush_interval=0.05)
+        ledger.submitted(order(7))
+        ledger.on_event(order_event(7, 'Partially Filled', filled_quantity=1, avg_price='1.5'))
+        # the same change polled after it was pushed is recorded once
+        ledger.on_event(order_event(7, 'Partially Filled', filled_quantity=1, avg_price='1.5', source='poll'))
+        ledger.on_event(order_event(7, 'Filled', filled_quantity=2, avg_price='1.5'))
+        ledger.close()
+        trades = load_ledger(self.path)
+        self.assertEqual(list(trades.event), ['submit', 'Partially Filled', 'Filled'])
+        self.assertEqual(list(trades.order_id), ['7', '7', '7'])
+        self.assertEqual(trades.contract.iloc[-1], '2x SPX 1c')
+        self.assertGreaterEqual(trades.latency_ms.iloc[-1], 0)
+
+    def test_batching(self):
+        ledger = TradeLedger(self.path, batch=10, flush_interval=5)
+        for order_id in range(25):
+            ledger.submitted(order(order_id))
+        ledger.close()
+        self.assertEqual(ledger.stats()['written'], 25)
+        self.assertLessEqual(ledger.stats()['batches'], 4)
+
+    def test_rotation(self):
+        ledger = TradeLedger(self.path, batch=1, flush_interval=0, max_bytes=300, backups=2)
+        for order_id in range(40):
+            ledger.submitted(order(order_id))
+        ledger.close()
+        self.assertTrue(os.path.exists(f'{self.path}.2'))
+        self.assertFalse(os.path.exists(f'{self.path}.3'))
+        trades = load_ledger(self.path)
+        # the oldest rows rotated out, the rest is in order
+        self.assertEqual(list(trades.order_id), [str(order_id) for order_id in range(40 - len(trades), 40)])
+
+    def test_npz_segments(self):
+        ledger = TradeLedger(self.path, format='npz', batch=8, flush_interval=0.05, segment_rows=10)
+        for order_id in range(25):
+            ledger.submitted(order(order_id))
+        ledger.close()
+        self.assertEqual(len(segment_paths(self.path)), 3)
+        self.assertFalse(os.path.exists(self.path))
+        trades = load_ledger(self.path, format='npz')
+        self.assertEqual(list(trades.order_id), [str(order_id) for order_id in range(25)])
+        self.assertEqual(trades.price.dtype.kind, 'f')
+        self.assertTrue(trades.filled_quantity.isna().all())
+
+    def poll_unfilled(self, auto_cancel_order):
+        ledger = TradeLedger(self.path, flush_interval=0.05)
+        aio = FakeClient([{'orderId': 5, 'status': 'Working', 'filledQuantity': 0}])
+
+        async def scenario():
+            events = order_events(aio, poll_interval=0.01, min_interval=0.01)
+            events.listeners.append(ledger.on_event)
+            self.assertFalse(await events.start(fake_broker(connects=False)))
+            config = SimpleNamespace(frequency=[0.02, 3], auto_cancel_order=auto_cancel_order)
+            context = SimpleNamespace(config=config, logger=logging.getLogger('test'), client=SimpleNamespace(aio=aio, events=events), positions=None)
+            ledger.submitted(order(5))
+            await Manager(context).check_order('5', 'BUY', '2x SPX 1c', 1)
+            await events.stop()
+
+        asyncio.run(scenario())
+        ledger.close()
+        return load_ledger(self.path), aio.cancels
+
+    def test_auto_cancel_while_polling(self):
+        trades, cancels = self.poll_unfilled(True)
+        self.assertEqual(cancels, ['5'])
+        self.assertEqual(list(trades.event), ['submit', 'Working', 'Cancelled'])
+        self.assertEqual(trades.source.iloc[-1], 'cancel')
+
+    def test_unfilled_order_kept_without_auto_cancel(self):
+        trades, cancels = self.poll_unfilled(False)
+        self.assertEqual(cancels, [])
+        self.assertEqual(list(trades.event), ['submit', 'Working'])
+
+    def test_disabled(self):
+        ledger = TradeLedger(self.path, enabled=False)
+        ledger.submitted(order(1))
+        ledger.close()
+        self.assertFalse(os.path.exists(self.path))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest, logging, os, re
+from datetime import date, datetime
+from modules.parser import AlertParser, expiration
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks', 'alerts.txt')
+
+TICKERS = ['SPX', 'SPY', 'SP', 'QQQ', 'META', 'AAPL', 'TSLA', 'NVDA', 'NFLX', 'SNOW', 'GLD', 'IWM']
+KEYWORDS = {
+    'trim_all': ['trim all'],
+    'exit_all': ['exit all'],
+    'trim': ['trim'],
+    'exit': ['exit', 'stc'],
+    'entry': ['buy', 'bto', '']
+}
+
+MESSAGES = [
+    # overlapping tickers, the first configured one wins
+    'sp 4500c 12/1 @ 1.10',
+    'spy 455c 11/30 @ 0.52',
+    # overlapping keywords
+    'trim all spx',
+    'trim spx 4490p',
+    'exit all remaining spx 4500c',
+    'stc spx 4490p @ 2.40',
+    # no keyword, the empty entry keyword matches
+    'qqq 390c 12/1 @ .85',
+    # bad m/d tokens are skipped
+    'spx 4500c 13/45 @ 1.20',
+    'spx 4500c 12/1/23 @ 1.20',
+    'spx 4490.50p 12/1 1234567 @ 1.5',
+    '1234567 exit'
+]
+
+def legacy(content, tickers, keywords, offset):
+    '''
+    the original token loop, exp_date without its year
+    '''
+    ticker = direction = exp_date = strike_price = lmt_price = ticker_id = trigger = ''
+
+    for ticker in [t for t in tickers if t.lower() in content]:
+        break
+
+    for msg in content.split(" "):
+        try:
+            if "/" in msg and bool(re.search(r"\d", msg)):
+                exp_date = (datetime.strptime(msg, "%m/%d")).strftime("%m-%d")
+            elif ("c" in msg or "p" in msg) and bool(re.search(r"\d", msg)) and not strike_price:
+                strike_price = str(re.sub(r"[a-zA-Z]", "", msg)).rstrip('0').rstrip('.') if '.' in str(re.sub(r"[a-zA-Z]", "", msg)) else str(re.sub(r"[a-zA-Z]", "", msg))
+                direction = "call" if "c" in msg else "put"
+            elif "." in msg and bool(re.search(r"\d", msg)) and not lmt_price:
+                lmt_price = round(float(msg) + offset, 2)
+            elif msg.isdigit() and not ticker_id:
+                ticker_id = int(msg)
+        except Exception:
+            pass
+
+    for key, values in keywords.items():
+        if any(value in content for value in values):
+            trigger = key
+            break
+
+    return (ticker, direction, exp_date, strike_price, lmt_price, ticker_id, trigger)
+
+class TestAlertParser(unittest.TestCase):
+    def setUp(self):
+        self.logger = logging.getLogger('test.parser')
+        with open(CORPUS) as file:
+            self.corpus = [line.strip().lower() for line in file if line.strip()]
+
+    def assertLegacy(self, messages, keywords=KEYWORDS):
+        parser = AlertParser(TICKERS, keywords, 0.05, self.logger)
+        for content in messages:
+            alert = parser.parse(content)
+            parsed = (alert.ticker, alert.direction, alert.exp_date[5:], alert.strike_price, alert.lmt_price, alert.ticker_id, alert.trigger)
+            self.assertEqual(parsed, legacy(content, TICKERS, keywords, 0.05), content)
+
+    def test_same_as_legacy(self):
+        with self.assertLogs(self.logger, 'WARNING'):
+            self.assertLegacy(self.corpus + MESSAGES)
+
+    def test_empty_keyword_outranks_later_keywords(self):
+        keywords = {'entry': ['buy', ''], 'exit': ['exit']}
+        self.assertLegacy(['exit spx', 'spx 4500c @ 1.10'], keywords)
+
+    def test_without_default_trigger(self):
+        keywords = {'exit': ['exit'], 'entry': ['buy']}
+        self.assertLegacy(['exit spx', 'spx 4500c @ 1.10', 'buy spx 4500c @ 1.10'], keywords)
+
+    def test_bad_date_is_logged(self):
+        parser = AlertParser(TICKERS, KEYWORDS, 0, self.logger)
+        with self.assertLogs(self.logger, 'WARNING'):
+            alert = parser.parse('spx 4500c 13/45 @ 1.20')
+        self.assertEqual((alert.exp_date, alert.strike_price, alert.lmt_price), ('', '4500', 1.2))
+
+class TestExpiration(unittest.TestCase):
+    def test_year_end_rolls_over(self):
+        december = date(2026, 12, 30)
+        self.assertEqual(expiration(1, 2, december), date(2027, 1, 2))
+        self.assertEqual(expiration(12, 31, december), date(2026, 12, 31))
+
+    def test_same_day_is_this_year(self):
+        self.assertEqual(expiration(6, 5, date(2026, 6, 5)), date(2026, 6, 5))
+        self.assertEqual(expiration(6, 4, date(2026, 6, 5)), date(2027, 6, 4))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest, asyncio
+from modules.pipeline import Pipeline
+from modules.parser import Alert
+
+class handler:
+    '''
+    entries take a while, everything else returns at once
+    '''
+    def __init__(self, alerts):
+        self.alerts = alerts
+        self.calls = []
+
+    def parse_message(self, content):
+        return self.alerts[content]
+
+    async def handle_alert(self, alert):
+        if alert.trigger == 'entry':
+            await asyncio.sleep(0.05)
+        self.calls.append(alert)
+
+def run(alerts, messages):
+    async def main():
+        pipeline = Pipeline(handler(alerts), 4)
+        await asyncio.wait([pipeline.dispatch(message) for message in messages])
+        return pipeline.handler.calls
+    return asyncio.run(main())
+
+class TestPipeline(unittest.TestCase):
+    def test_exit_naming_a_contract_waits_for_last_entry(self):
+        # the handler sells the last position for an exit without a tickerId, whatever contract it names
+        entry = Alert(ticker='SPX', direction='call', exp_date='2023-12-01', strike_price='4550', trigger='entry')
+        exit = Alert(ticker='SPX', direction='put', exp_date='2023-12-01', strike_price='4500', trigger='exit')
+        self.assertEqual(run({'entry': entry, 'exit': exit}, ['entry', 'exit']), [entry, exit])
+
+    def test_exit_by_ticker_id_waits_for_its_entry(self):
+        entry = Alert(ticker_id=1234, trigger='entry')
+        exit = Alert(ticker_id=1234, trigger='exit')
+        self.assertEqual(run({'entry': entry, 'exit': exit}, ['entry', 'exit']), [entry, exit])
+
+    def test_other_ticker_id_does_not_wait(self):
+        entry = Alert(ticker_id=1234, trigger='entry')
+        exit = Alert(ticker_id=5678, trigger='exit')
+        self.assertEqual(run({'entry': entry, 'exit': exit}, ['entry', 'exit']), [exit, entry])
+
+    def test_exit_all_waits_for_everything(self):
+        first = Alert(ticker_id=1234, trigger='entry')
+        second = Alert(ticker_id=5678, trigger='entry')
+        exit_all = Alert(trigger='exit_all')
+        calls = run({'first': first, 'second': second, 'exit_all': exit_all}, ['first', 'second', 'exit_all'])
+        self.assertEqual(calls[-1], exit_all)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest, asyncio
+from helpers import AsyncTestCase, FakeClient
+from api.utils.quotes import quote, quote_stream
+from api.utils.push import replay_source
+
+def record(ticker_id, bid, ask, t=0.0):
+    return {'t': t, 'topic': {'tickerId': ticker_id, 'type': 105}, 'payload': {'tickerId': ticker_id, 'bidList': [{'price': str(bid), 'volume': 5}], 'askList': [{'price': str(ask), 'volume': 7}]}}
+
+class TestQuoteStream(AsyncTestCase):
+    def test_replay(self):
+        async def scenario():
+            stream = quote_stream(FakeClient())
+            source = replay_source([record(1, 1.00, 1.20), record(2, 0.50, 0.60), record(1, 1.10, 1.30)])
+            await stream.start(source)
+            stream.watch([1, 2])
+            source.join(1)
+            await stream.stop()
+            return stream, source
+
+        stream, source = self.run_async(scenario())
+        self.assertEqual(source.played, 3)
+        self.assertEqual(source.topics, [{'tickerIds': [1, 2], 'type': '105'}])
+        self.assertEqual(stream.get(1).mid, 1.2)
+        self.assertEqual(stream.get(2).mid, 0.55)
+        self.assertIsNone(stream.get(3))
+
+    def test_polling_fallback(self):
+        async def scenario():
+            client = FakeClient()
+            stream = quote_stream(client, poll_interval=60)
+            await stream.start()
+            stream.watch([4, 5])
+            await asyncio.sleep(0.01)
+            await stream.stop()
+            return client, stream
+
+        client, stream = self.run_async(scenario())
+        self.assertEqual(client.calls, 1)
+        self.assertEqual((stream.get(5).mid, stream.get(5).source, stream.get(5).expireDate), (1.05, 'poll', '2023-12-01'))
+
+    def test_stale(self):
+        stream = quote_stream(FakeClient(), max_age=1)
+        stream.table.put(quote(6, 1.0, 1, 1.2, 1, received=0))
+        self.assertIsNone(stream.get(6))
+        self.assertIsNotNone(stream.get(6, max_age=float('inf')))
+
+if __name__ == '__main__':
+    unittest.main()
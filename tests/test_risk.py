@@ -0,0 +1,67 @@
+import unittest, logging
+from types import SimpleNamespace
+from api.utils.snapshot import account_snapshot
+from modules.risk import RiskEngine, order_cost
+
+def context(**risk):
+    settings = {'enabled': True, 'reserve_open_orders': True, 'min_buying_power': 0, 'refresh_interval': 5}
+    settings.update(risk)
+    client = SimpleNamespace(aio=SimpleNamespace(snapshots=SimpleNamespace(on_snapshot=None), order_listeners=[]))
+    return SimpleNamespace(config=SimpleNamespace(risk=settings), logger=logging.getLogger('test'), client=client)
+
+def account(buying_power, open_orders=()):
+    return {'positions': [], 'openOrders': list(open_orders), 'accountMembers': [{'key': 'dayBuyingPower', 'value': str(buying_power)}]}
+
+class TestRiskEngine(unittest.TestCase):
+    def test_open_order_cost(self):
+        order = {'action': 'BUY', 'lmtPrice': '1.50', 'totalQuantity': 4, 'filledQuantity': 1, 'tickerType': 'OPTION'}
+        self.assertEqual(order_cost(order), 450.0)
+        self.assertEqual(order_cost({**order, 'action': 'SELL'}), 0.0)
+
+    def test_no_snapshot_lets_orders_through(self):
+        risk = RiskEngine(context())
+        self.assertEqual(risk.size(1.0, 7), 7)
+
+    def test_resize_and_reject(self):
+        ctx = context()
+        risk = RiskEngine(ctx)
+        ctx.client.aio.snapshots.on_snapshot(account_snapshot(account(1000, [{'action': 'BUY', 'lmtPrice': '1.00', 'totalQuantity': 2, 'filledQuantity': 0}])))
+        self.assertEqual(risk.available(), 800.0)
+        self.assertEqual(risk.size(1.0, 7), 7)
+        self.assertEqual(risk.size(2.0, 7), 4)
+        self.assertEqual(risk.size(9.0, 1), 0)
+        self.assertEqual((risk.resized, risk.rejected), (1, 1))
+
+    def test_reservations(self):
+        ctx = context(reserve_open_orders=False)
+        risk = RiskEngine(ctx)
+        risk.sync(account_snapshot(account(1000)))
+        first = risk.reserve(1.0, 6)
+        # a concurrent entry only gets what the first one left
+        self.assertEqual(risk.size(1.0, 7), 4)
+        second = risk.reserve(1.0, 4)
+        risk.release(second)
+        risk.placed(first)
+        # a snapshot requested before the order went out does not contain it yet
+        risk.sync(account_snapshot(account(1000), fetched=0))
+        self.assertEqual(risk.available(), 400.0)
+        # one requested after it does
+        risk.sync(account_snapshot(account(400)))
+        self.assertEqual(risk.available(), 400.0)
+        self.assertEqual(risk.stats()['reserved'], 0)
+
+    def test_open_order_while_waiting_for_fill(self):
+        ctx = context()
+        risk = RiskEngine(ctx)
+        risk.sync(account_snapshot(account(1000)))
+        risk.reserve(1.0, 4, ticker_id=11)
+        # the order request returned, the entry is still waiting for its fill
+        for listener in ctx.client.aio.order_listeners:
+            listener({'orderId': 1, 'tickerId': 11, 'action': 'BUY'})
+        # a snapshot requested now lists the order as open, it is counted once
+        risk.sync(account_snapshot(account(1000, [{'action': 'BUY', 'lmtPrice': '1.00', 'totalQuantity': 4, 'filledQuantity': 0}])))
+        self.assertEqual(risk.available(), 600.0)
+        self.assertEqual(risk.size(1.0, 7), 6)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest, os, stat, tempfile, time, asyncio
+from datetime import datetime, timezone
+from api.utils.session import expires_at, tokens, token_cache, session_refresher
+
+def expiry(seconds):
+    return datetime.fromtimestamp(time.time() + seconds, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000+0000')
+
+class FakeAccount:
+    def __init__(self, expires_in):
+        self._tokens = tokens('old-access', 'old-refresh', expiry(expires_in))
+        self.refreshed = 0
+
+    def refresh_session(self):
+        self.refreshed += 1
+        self._tokens = self._tokens.replace(access_token='new-access', token_expire=expiry(3600))
+        return True
+
+class TestSession(unittest.TestCase):
+    def test_expiry(self):
+        self.assertEqual(expires_at('2099-01-01T00:00:00.000+0000'), datetime(2099, 1, 1, tzinfo=timezone.utc).timestamp())
+        self.assertEqual(expires_at(4070908800000), 4070908800.0)
+        self.assertIsNone(expires_at('tomorrow'))
+        self.assertTrue(tokens('a', token_expire=expiry(600)).fresh(300))
+        self.assertFalse(tokens('a', token_expire=expiry(100)).fresh(300))
+        self.assertFalse(tokens('', token_expire=expiry(600)).fresh(300))
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = token_cache(os.path.join(directory, 'session.json'))
+            self.assertIsNone(cache.load('user@example.com'))
+            cache.save('user@example.com', False, tokens('live-access', trade_token='t', account_id='42'))
+            cache.save('user@example.com', True, tokens('paper-access'))
+            self.assertEqual(stat.S_IMODE(os.stat(cache.path).st_mode), 0o600)
+            with open(cache.path) as file:
+                self.assertNotIn('user@example.com', file.read())
+
+            restored = cache.load('user@example.com')
+            self.assertEqual((restored.access_token, restored.trade_token, restored.account_id), ('live-access', 't', '42'))
+            self.assertEqual(cache.load('user@example.com', True).access_token, 'paper-access')
+            cache.clear('user@example.com')
+            self.assertIsNone(cache.load('user@example.com'))
+
+    def test_refresh_before_expiry(self):
+        async def scenario():
+            account = FakeAccount(expires_in=300.05)
+            refresher = session_refresher(account, margin=300, retry=60)
+            old = account._tokens
+            task = asyncio.ensure_future(refresher.run())
+            await asyncio.sleep(0.3)
+            task.cancel()
+            return account, refresher, old
+
+        account, refresher, old = asyncio.run(scenario())
+        self.assertEqual((account.refreshed, refresher.refreshes), (1, 1))
+        self.assertEqual(account._tokens.access_token, 'new-access')
+        # the tokens a request already read are never changed
+        self.assertEqual(old.access_token, 'old-access')
+        self.assertGreater(refresher.due(), 3000)
+
+if __name__ == '__main__':
+    unittest.main()
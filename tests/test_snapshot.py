@@ -0,0 +1,67 @@
+import unittest, asyncio
+from helpers import AsyncTestCase
+from api.utils.snapshot import account_cache, account_snapshot
+from api.utils.orders import order_event
+
+ACCOUNT = {
+    'positions': [{'ticker': {'tickerId': 11, 'symbol': 'SPX'}, 'position': '2'}],
+    'openOrders': [{'orderId': 7, 'status': 'Working'}],
+    'accountMembers': [{'key': 'netLiquidation', 'value': '5000.00'}, {'key': 'dayBuyingPower', 'value': '1500.50'}]
+}
+
+class FakeAccount:
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.calls = 0
+
+    async def fetch(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return ACCOUNT
+
+class TestAccountCache(AsyncTestCase):
+    def test_accessors(self):
+        snapshot = account_snapshot(ACCOUNT)
+        self.assertEqual(snapshot.positions[0]['position'], '2')
+        self.assertEqual(snapshot.open_orders[0]['orderId'], 7)
+        self.assertEqual(snapshot.portfolio['netLiquidation'], '5000.00')
+        self.assertEqual(snapshot.buying_power, 1500.5)
+        self.assertEqual(snapshot.index.get('11')['position'], '2')
+        self.assertEqual(account_snapshot({'usableCash': '250'}).buying_power, 250.0)
+
+    def test_concurrent_reads_share_one_download(self):
+        async def scenario():
+            source = FakeAccount()
+            cache = account_cache(source.fetch, ttl=60)
+            snapshots = await asyncio.gather(*[cache.get() for _ in range(10)])
+            await cache.get()
+            return source, cache, snapshots
+
+        source, cache, snapshots = self.run_async(scenario())
+        self.assertEqual(source.calls, 1)
+        self.assertEqual(cache.shared, 9)
+        self.assertEqual(cache.hits, 1)
+        self.assertTrue(all(snapshot is snapshots[0] for snapshot in snapshots))
+
+    def test_invalidate(self):
+        async def scenario():
+            source = FakeAccount()
+            cache = account_cache(source.fetch, ttl=60)
+            first = asyncio.ensure_future(cache.get())
+            await asyncio.sleep(0)
+            # an order placed while the download is in flight, the next read does not reuse it
+            cache.invalidate()
+            second = await cache.get()
+            await first
+            cache.on_order_event(order_event(7, 'Working'))
+            third = await cache.get()
+            cache.on_order_event(order_event(7, 'Filled', 1))
+            await cache.get()
+            return source, second, third
+
+        source, second, third = self.run_async(scenario())
+        self.assertIs(second, third)
+        self.assertEqual(source.calls, 3)
+
+if __name__ == '__main__':
+    unittest.main()
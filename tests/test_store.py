@@ -0,0 +1,49 @@
+import unittest, os, pickle, tempfile
+from modules.store import PositionStore
+
+class TestPositionStore(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'positions.log')
+
+    def test_reload(self):
+        store = PositionStore(self.path, fsync=False)
+        for ticker_id in (1, 2, 3):
+            store.add(ticker_id)
+        store.remove(2)
+        store.close()
+        self.assertEqual(PositionStore(self.path).positions, [1, 3])
+
+    def test_compaction(self):
+        store = PositionStore(self.path, fsync=False, compact_after=4)
+        for ticker_id in range(10):
+            store.add(ticker_id)
+        store.close()
+        with open(self.path, 'rb') as file:
+            self.assertLess(len(file.readlines()), 4)
+        self.assertEqual(PositionStore(self.path).positions, list(range(10)))
+
+    def test_torn_write(self):
+        store = PositionStore(self.path, fsync=False)
+        store.add(1)
+        store.add(2)
+        store.close()
+        with open(self.path, 'ab') as file:
+            file.write(PositionStore._encode({'op': 'add', 'id': 3})[:-6])
+
+        store = PositionStore(self.path, fsync=False)
+        self.assertEqual(store.positions, [1, 2])
+        store.add(4)
+        store.close()
+        self.assertEqual(PositionStore(self.path).positions, [1, 2, 4])
+
+    def test_legacy_import(self):
+        legacy_path = os.path.join(self.dir, 'current_positions.pkl')
+        with open(legacy_path, 'wb') as file:
+            pickle.dump([5, 6], file)
+        self.assertEqual(PositionStore(self.path, legacy_path=legacy_path).positions, [5, 6])
+        os.remove(legacy_path)
+        self.assertEqual(PositionStore(self.path).positions, [5, 6])
+
+if __name__ == '__main__':
+    unittest.main()
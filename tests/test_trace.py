@@ -0,0 +1,25 @@
+import unittest, random
+from api.utils.trace import histogram
+
+class TestHistogram(unittest.TestCase):
+    def test_percentile_error_bound(self):
+        rng = random.Random(7)
+        values = [int(rng.lognormvariate(9, 2)) for _ in range(20000)] + [rng.randrange(1, 300) for _ in range(2000)]
+        h = histogram()
+        for value in values:
+            h.record(value)
+        ordered = sorted(values)
+        for quantile in (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 0.999):
+            exact = ordered[max(1, round(quantile * len(ordered))) - 1]
+            estimate = h.percentile(quantile)
+            self.assertGreaterEqual(estimate, exact)
+            self.assertLess(estimate - exact, 0.01 * exact + 1, quantile)
+
+    def test_every_bucket_within_one_percent(self):
+        for value in list(range(1, 5000)) + [2 ** shift + offset for shift in range(12, 40) for offset in (-1, 0, 1)]:
+            top = histogram.value(histogram.index(value))
+            self.assertGreaterEqual(top, value)
+            self.assertLess(top - value, 0.01 * value + 1, value)
+
+if __name__ == '__main__':
+    unittest.main()